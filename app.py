@@ -18,11 +18,18 @@ def main():
     cnt.infoAboutFrameFetcherAcquired.connect(view.onListOfCamerasReceived)
     cnt.frameSourceNotFound.connect(view.onNoFrameInputFound)
     cnt.soundDetectionErrorAppeared.connect(view.onSoundDetectionError)
+    cnt.layerTimingsReceived.connect(view.onLayerTimingsReceived)
+    cnt.objectDetectionModelLoading.connect(view.onObjectDetectionModelLoading)
+    cnt.objectDetectionModelReady.connect(view.onObjectDetectionModelReady)
+    cnt.objectDetectionModelErrorAppeared.connect(view.onObjectDetectionModelError)
+    cnt.recordingFinished.connect(view.onRecordingFinished)
     view.closingWindow.connect(cnt.onCloseSignalReceived)
     view.toogleShowPreviewFrames.connect(cnt.onPreviewFramesToggled)
     view.startFetchingCameraInfo.connect(cnt.onCameraInfoFetcherStart)
     view.toggleMovementDisplayType.connect(cnt.onToggledMovementDisplayType)
     view.toggleEmailNotifications.connect(cnt.onEmailNotificationEnabledToggled)
+    view.displayActiveToggled.connect(cnt.onDisplayActiveToggled)
+    view.layerTimingsDumpRequested.connect(cnt.onLayerTimingsDumpRequested)
     view.show()
     app.exit(app.exec_())
 
@@ -0,0 +1,237 @@
+import argparse
+import json
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+import cv2
+import imutils
+from frame_processors.cameraFrameFetcher import RESIZE_WIDTH
+from frame_processors.frameFetcher import NoVideoInputError
+from frame_processors.frameTransformator import FrameTransforamtorFactory, FrameTransformator
+from frame_processors.movementTracker import MovementTrackerParameters
+from frame_processors.objectDetector import ObjectDetectionSettings, ObjectDetector
+from logs import setup_logging
+from settingsManager import defaultSettings
+from utils import PointCoords, createFolderIfNoExisting
+
+logger = logging.getLogger(__name__)
+
+VIDEO_FILE_EXTENSIONS = (".avi", ".mp4", ".mkv", ".mov", ".wmv", ".mpg", ".mpeg")
+DEFAULT_VIDEO_FPS = 25.0
+
+@dataclass
+class BatchAnalysisParameters:
+    outputDir: str
+    movementTrackerParams: MovementTrackerParameters
+    loggingInterval: int
+    scalingWidth: int
+    detectObjects: bool = False
+    confidenceThreshold: float = 0.5
+
+@dataclass
+class MotionInterval:
+    start: float
+    end: float
+    detectedObjects: Dict[str, int] = field(default_factory=dict)
+
+class MotionIntervalTracker:
+    def __init__(self, params: MovementTrackerParameters) -> None:
+        self.presentThreshold = params.movementPresentThreshold / 1000
+        self.absenceThreshold = params.movementAbsenceThreshold / 1000
+        self.inactivityTolerance = params.inactivityToleranceThreshold / 1000
+        self.intervals: List[MotionInterval] = []
+        self.movementStart: Optional[float] = None
+        self.lastMovement: Optional[float] = None
+        self.currentInterval: Optional[MotionInterval] = None
+
+    def update(self, timestamp: float, movementPresent: bool) -> None:
+        if movementPresent:
+            if self.movementStart is None:
+                self.movementStart = timestamp
+            self.lastMovement = timestamp
+            if self.currentInterval is None and timestamp - self.movementStart >= self.presentThreshold:
+                self.currentInterval = MotionInterval(self.movementStart, timestamp)
+            return
+        if self.lastMovement is None:
+            return
+        if self.currentInterval is None:
+            if timestamp - self.lastMovement > self.inactivityTolerance:
+                self.movementStart = None
+                self.lastMovement = None
+        elif timestamp - self.lastMovement >= self.absenceThreshold:
+            self.closeCurrentInterval()
+
+    def isMovementContinouslyPresent(self) -> bool:
+        return self.currentInterval is not None
+
+    def addDetectedObjects(self, predictions: List[Dict]) -> None:
+        if self.currentInterval is None:
+            return
+        for prediction in predictions:
+            label = prediction["label"]
+            self.currentInterval.detectedObjects[label] = self.currentInterval.detectedObjects.get(label, 0) + 1
+
+    def closeCurrentInterval(self) -> None:
+        if self.currentInterval is not None and self.lastMovement is not None:
+            self.currentInterval.end = self.lastMovement
+            self.intervals.append(self.currentInterval)
+        self.currentInterval = None
+        self.movementStart = None
+        self.lastMovement = None
+
+class VideoFileAnalyzer:
+    def __init__(self, params: BatchAnalysisParameters) -> None:
+        self.params = params
+        self.frameTransformator: FrameTransformator = FrameTransforamtorFactory.get_frame_transformator(
+            defaultSettings["frameTransformatorSettings"]
+        )
+        self.objectDetector: Optional[ObjectDetector] = None
+        if params.detectObjects:
+            self.objectDetector = ObjectDetector(ObjectDetectionSettings(params.confidenceThreshold, True))
+            self.objectDetector.loadModel()
+            if not self.objectDetector.isModelLoaded():
+                raise FileNotFoundError("Object detection model could not be loaded")
+
+    def analyze(self, videoPath: str) -> Dict:
+        videoCapture = cv2.VideoCapture(videoPath)
+        if videoCapture is None or not videoCapture.isOpened():
+            raise NoVideoInputError(f"Could not open video file: {videoPath}")
+        fps = videoCapture.get(cv2.CAP_PROP_FPS) or DEFAULT_VIDEO_FPS
+        intervalTracker = MotionIntervalTracker(self.params.movementTrackerParams)
+        logEntries: List[str] = []
+        nextLogTimestamp = 0.0
+        lastMovementPos: Optional[PointCoords] = None
+        frameIndex = 0
+        framesWithMovement = 0
+        try:
+            while True:
+                isFrameCaptured, frame = videoCapture.read()
+                if not isFrameCaptured:
+                    break
+                timestamp = frameIndex / fps
+                frameIndex += 1
+                frame = imutils.resize(frame, RESIZE_WIDTH)
+                contourInfo, _ = self.frameTransformator.detectMovement(frame)
+                intervalTracker.update(timestamp, contourInfo is not None)
+                if contourInfo:
+                    framesWithMovement += 1
+                    lastMovementPos = self.scaleCoordinates(contourInfo.center_of_the_mass, frame.shape[1])
+                if self.objectDetector and intervalTracker.isMovementContinouslyPresent():
+                    intervalTracker.addDetectedObjects(self.objectDetector.get_prediction_for_frame(frame))
+                if timestamp >= nextLogTimestamp:
+                    if lastMovementPos:
+                        logEntries.append(f"video {lastMovementPos[0]} {lastMovementPos[1]} {formatVideoTimestamp(timestamp)} \n")
+                    lastMovementPos = None
+                    nextLogTimestamp = timestamp + self.params.loggingInterval / 1000
+        finally:
+            videoCapture.release()
+        intervalTracker.closeCurrentInterval()
+        return self.writeResults(videoPath, logEntries, intervalTracker.intervals, frameIndex, framesWithMovement, fps)
+
+    def scaleCoordinates(self, pointCoords: PointCoords, frameWidth: int) -> PointCoords:
+        scale = self.params.scalingWidth / frameWidth
+        return (int(pointCoords[0] * scale), int(pointCoords[1] * scale))
+
+    def writeResults(
+        self,
+        videoPath: str,
+        logEntries: List[str],
+        intervals: List[MotionInterval],
+        numOfFrames: int,
+        framesWithMovement: int,
+        fps: float
+        ) -> Dict:
+        baseName = os.path.splitext(os.path.basename(videoPath))[0]
+        logPath = os.path.join(self.params.outputDir, baseName + "_log.txt")
+        summaryPath = os.path.join(self.params.outputDir, baseName + "_summary.json")
+        with open(logPath, "w", encoding = "ascii") as f:
+            f.writelines(logEntries)
+        summary = {
+            "videoFile": videoPath,
+            "eventLog": logPath,
+            "fps": fps,
+            "numOfFrames": numOfFrames,
+            "duration": formatVideoTimestamp(numOfFrames / fps),
+            "framesWithMovement": framesWithMovement,
+            "motionIntervals": [
+                {
+                    "start": formatVideoTimestamp(interval.start),
+                    "end": formatVideoTimestamp(interval.end),
+                    "durationSeconds": round(interval.end - interval.start, 3),
+                    "detectedObjects": interval.detectedObjects
+                }
+                for interval in intervals
+            ]
+        }
+        with open(summaryPath, "w", encoding = "utf-8") as f:
+            json.dump(summary, f, indent = 2)
+        return summary
+
+def formatVideoTimestamp(seconds: float) -> str:
+    minutes, secs = divmod(seconds, 60)
+    hours, minutes = divmod(int(minutes), 60)
+    return f"{hours:02d}:{minutes:02d}:{secs:06.3f}"
+
+def analyzeVideoFile(videoPath: str, params: BatchAnalysisParameters) -> Dict:
+    cv2.setNumThreads(1)
+    try:
+        return VideoFileAnalyzer(params).analyze(videoPath)
+    except Exception as e:
+        logger.error("Error when analyzing video file: %s, error details: %s", videoPath, e)
+        return {"videoFile": videoPath, "error": str(e)}
+
+def findVideoFiles(inputDir: str) -> List[str]:
+    return sorted(
+        os.path.join(inputDir, fileName)
+        for fileName in os.listdir(inputDir)
+        if fileName.lower().endswith(VIDEO_FILE_EXTENSIONS)
+    )
+
+def runBatchAnalysis(videoFiles: List[str], params: BatchAnalysisParameters, numOfWorkers: Optional[int]) -> List[Dict]:
+    createFolderIfNoExisting(params.outputDir)
+    summaries = []
+    with ProcessPoolExecutor(max_workers = numOfWorkers) as executor:
+        futures = {executor.submit(analyzeVideoFile, videoFile, params): videoFile for videoFile in videoFiles}
+        for future in as_completed(futures):
+            summary = future.result()
+            if "error" not in summary:
+                logger.info("Analyzed %s, motion intervals found: %s", futures[future], len(summary["motionIntervals"]))
+            summaries.append(summary)
+    return sorted(summaries, key = lambda summary: summary["videoFile"])
+
+def parseArguments() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description = "Run motion detection over all video files in a directory")
+    parser.add_argument("inputDir", help = "Directory with recorded video files")
+    parser.add_argument("--output-dir", dest = "outputDir", default = None, help = "Directory for event logs and summaries (default: <inputDir>/analysis)")
+    parser.add_argument("--workers", type = int, default = os.cpu_count(), help = "Number of worker processes")
+    parser.add_argument("--detect-objects", dest = "detectObjects", action = "store_true", help = "Run object detection while continuous motion is present")
+    parser.add_argument("--confidence", type = float, default = defaultSettings["objectDetectionSettings"]["confidenceThreshold"], help = "Object detection confidence threshold")
+    return parser.parse_args()
+
+def main():
+    setup_logging()
+    args = parseArguments()
+    recorderSettings = defaultSettings["movementRecorderSettings"]
+    loggerSettings = defaultSettings["movementLoggerSettings"]
+    params = BatchAnalysisParameters(
+        args.outputDir or os.path.join(args.inputDir, "analysis"),
+        MovementTrackerParameters(
+            recorderSettings["movementPresentThreshold"],
+            recorderSettings["movementAbsenceThreshold"]
+        ),
+        loggerSettings["loggingInterval"],
+        loggerSettings["scalingWidth"],
+        args.detectObjects,
+        args.confidence
+    )
+    videoFiles = findVideoFiles(args.inputDir)
+    logger.info("Found %s video files in: %s", len(videoFiles), args.inputDir)
+    summaries = runBatchAnalysis(videoFiles, params, args.workers)
+    with open(os.path.join(params.outputDir, "batch_summary.json"), "w", encoding = "utf-8") as f:
+        json.dump(summaries, f, indent = 2)
+    logger.info("Batch analysis finished, results stored in: %s", params.outputDir)
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,20 @@
+from concurrent.futures import ThreadPoolExecutor
 import logging
 from typing import Dict, List, Optional
-from PyQt5.QtCore import QObject, pyqtSignal, pyqtSlot
-from PyQt5.QtGui import QImage
+from PyQt5.QtCore import QObject, Qt, pyqtSignal, pyqtSlot
 from cameraSelector import CameraInfoFetcher
+from displayFrameThrottler import DisplayFrameThrottler
 from emailSubscribersController import EmailSubscribersController, GifCreator
 from frame_processors.frameDrawer import FrameDrawer
 from frame_processors.frameFetcher import FrameFetcher, FrameFetcherSettings
 from frame_processors.frameFetcherFactory import FrameFetcherFactory
-from frameToNetworkStreamer import FrameToNetworkStreamer
+from frameStreamEncoder import FrameStreamEncoder
+from jpegEncoders import JPEG_ENCODING_WORKERS, ChromaSubsampling, JpegEncoderFactory, JpegEncoderType
+from h264StreamEncoder import H264StreamEncoder, H264StreamSettings, isH264EncodingAvailable
+from streamMetadata import StreamMetadataCollector
+from streamingHub import StreamingHub, StreamType
 from frame_processors.frameTransformator import ContoursInfo, FrameTransforamtorFactory, FrameTransformator
-from frame_processors.objectDetector import ObjectDetectionSettings, ObjectDetector
+from frame_processors.objectDetector import ObjectDetector
 from eventLogger import EventLogger, MovementLoggerFactory
 from movementRecorder import MovementRecorder
 from frame_processors.movementTracker import MovementTracker, MovementTrackerFactory
@@ -23,16 +28,22 @@ from workerThreadController import WorkerGroupInfo, WorkerThreadController
 logger = logging.getLogger(__name__)
 
 FRAME_FETCHING_GROUP = "FRAME_FETCHING_GROUP"
+OBJECT_DETECTION_GROUP = "OBJECT_DETECTION_GROUP"
 FRAME_RECORDING_GROUP = "FRAME_RECORDING_GROUP"
 SOUND_PROCESSING_GROUP = "SOUND_PROCESSING_GROUP"
 LOGGER_PROCESSING_GROUP = "LOGGER_PROCESSING_GROUP"
 FRAME_STREAMING_GROUP = "FRAME_STREAMING_GROUP"
+STREAM_ENCODING_GROUP = "STREAM_ENCODING_GROUP"
 CAMERA_INFO_FETCHER_GROUP = "CAMERA_INFO_FETCHER_GROUP"
+STREAMING_PORT = 9500
+METADATA_STREAMING_PORT = 9501
+HTTP_STREAMING_PORT = 8080
+H264_STREAMING_PORT = 9502
 EMAIL_SUBSCRIBERS_PROCESSING_GROUP = "EMAIL_SUBSCRIBERS_PROCESSING_GROUP"
 
 class Controller(QObject):
 
-    imageIsReadyForDisplay = pyqtSignal(QImage)
+    imageIsReadyForDisplay = pyqtSignal(Frame)
     previewImagesReadyForDisplay = pyqtSignal(dict)
     contoursReceivedFromTransforamtor = pyqtSignal(PointCoords)
     dataIsReadyForSocket = pyqtSignal()
@@ -46,6 +57,13 @@ class Controller(QObject):
     soundDetectionErrorAppeared = pyqtSignal(str)
     movementDisplayTypeToggled = pyqtSignal(MovementPresentationType, bool)
     emailNotificationToggled = pyqtSignal(bool)
+    layerTimingsDumpRequested = pyqtSignal()
+    layerTimingsReceived = pyqtSignal(list)
+    objectDetectionModelLoading = pyqtSignal()
+    objectDetectionModelReady = pyqtSignal(bool)
+    objectDetectionModelErrorAppeared = pyqtSignal(str)
+    recordingFinished = pyqtSignal(dict)
+    stopRecordingRequested = pyqtSignal()
 
     def __init__(
         self, 
@@ -60,22 +78,45 @@ class Controller(QObject):
             FrameFetcherSettings(self.settingsManager.getCameraSettings()["cameraIndex"]))
         self.frameTransforamtor: FrameTransformator = FrameTransforamtorFactory.get_frame_transformator(settingsManager.getFrameTransformationSettings())
         self.frameDrawer: FrameDrawer = FrameDrawer()
+        self.displayFrameThrottler = DisplayFrameThrottler(settingsManager.getDisplaySettings()["maxRefreshRate"])
         self.movementTracker: MovementTracker = MovementTrackerFactory.createMovementTracker(settingsManager.getMovementTrackerSettings())
         self.movementRecorder: MovementRecorder = MovementRecorder()
+        self.movementRecorder.onRecorderSettingsChanged(settingsManager.getMovementTrackerSettings())
         self.eventLogger: EventLogger = MovementLoggerFactory.createMovementLogger(settingsManager.getMovementLoggerSettingss())
         self.soundDetector:SoundDetector = SoundDetectorFactory.createSoundDetector(settingsManager.getSoundDetectionSettings())
-        self.tcpServer = TcpServer(9500)
+        self.tcpServer = TcpServer(STREAMING_PORT)
+        self.metadataTcpServer = TcpServer(METADATA_STREAMING_PORT)
+        self.streamMetadataCollector = StreamMetadataCollector()
+        streamingSettings = settingsManager.getStreamingSettings()
+        self.jpegEncodingPool = ThreadPoolExecutor(max_workers = JPEG_ENCODING_WORKERS, thread_name_prefix = "jpegEncoding")
+        jpegEncoder = JpegEncoderFactory.createJpegEncoder(
+            JpegEncoderType(streamingSettings["jpegEncoder"]),
+            ChromaSubsampling(streamingSettings["jpegChromaSubsampling"])
+        )
+        self.overlayStreamEncoder = FrameStreamEncoder(jpegEncoder, self.jpegEncodingPool)
+        self.rawStreamEncoder = FrameStreamEncoder(jpegEncoder, self.jpegEncodingPool)
+        self.h264StreamEncoder: Optional[H264StreamEncoder] = None
+        self.h264TcpServer: Optional[TcpServer] = None
+        if isH264EncodingAvailable():
+            self.h264StreamEncoder = H264StreamEncoder(H264StreamSettings(streamingSettings["h264BitrateKbps"], streamingSettings["h264Gop"]))
+            self.h264TcpServer = TcpServer(H264_STREAMING_PORT)
+        else:
+            logger.info("PyAV with libx264 is not available, H.264 streaming is disabled")
+        self.streamingHub = StreamingHub(
+            self.overlayStreamEncoder,
+            self.rawStreamEncoder,
+            self.streamMetadataCollector,
+            HTTP_STREAMING_PORT,
+            self.h264StreamEncoder,
+            streamingSettings["maxClientFrameRate"]
+        )
         self.objectDetector = ObjectDetector(
-            ObjectDetectionSettings(
-                self.settingsManager.getObjectDetectionSettings()["confidenceThreshold"],
-                self.settingsManager.getObjectDetectionSettings()["detectionEnabled"],
-            )
+            ObjectDetector.getDetectionSettingsFromDict(self.settingsManager.getObjectDetectionSettings())
         )
         self.cameraInfoFetcher = CameraInfoFetcher()
         self.emailSubsribersController = EmailSubscribersController()
         self.emailSubsribersController.loadSubscriberSettings(settingsManager.getEmailSubscriberSettings())
         self.gifCreator = GifCreator() 
-        self.subscribers: List[FrameToNetworkStreamer] = []
 
         self.connectFrameFetcherSignalAndSlots()
         self.connectFrameTransforamtorSignalAndSlots()
@@ -94,9 +135,9 @@ class Controller(QObject):
         self.startWorkerGroups()
         
     def connectFrameFetcherSignalAndSlots(self) -> None:
-        self.frameFetcher.frameFetched.connect(self.objectDetector.onFrameReceived)
+        self.frameFetcher.frameFetched.connect(self.objectDetector.onFrameReceived, Qt.DirectConnection)
         self.frameFetcher.frameFetched.connect(self.frameTransforamtor.onFrameReceived)
-        self.frameFetcher.frameFetched.connect(self.movementRecorder.onFrameReceived)
+        self.frameFetcher.nativeFrameFetched.connect(self.movementRecorder.onFrameReceived, Qt.DirectConnection)
         self.frameFetcher.frameFetched.connect(self.gifCreator.onFrameReceived)
         self.frameFetcher.frameFetched.connect(self.frameDrawer.onPrepareFrameForDisplay)
         self.frameFetcher.frameResolutionFetched.connect(self.frameTransforamtor.onFrameResolutionReceived)
@@ -107,19 +148,23 @@ class Controller(QObject):
     def connectFrameTransforamtorSignalAndSlots(self) -> None:
         self.frameTransforamtor.contoursFound.connect(self.frameDrawer.onContourDataReceived)
         self.frameTransforamtor.contoursFound.connect(self.onContoursReceivedFromTransformator)
+        self.frameTransforamtor.contoursFound.connect(self.objectDetector.onContoursReceived, Qt.DirectConnection)
+        self.frameTransforamtor.movementInFrameDetected.connect(self.objectDetector.onMovementPresentToggled, Qt.DirectConnection)
         self.frameTransforamtor.previewFramesReadyForDrawing.connect(self.frameDrawer.onPreparePreviewFramesForDisplay)
         self.frameTransforamtor.movementInFrameDetected.connect(self.movementTracker.onMovementPresentToggled)
         self.frameTransforamtor.resizedFrameDimensionInfoCalculated.connect(self.eventLogger.onOriginalFrameDimensionInfoReceived)
         self.toggleShowPreviewFrames.connect(self.frameTransforamtor.onShowPreviewFramesToggled)
         
     def connectFrameDrawerSignalAndSlots(self) -> None:
-        self.frameDrawer.frameReadyForDisplay.connect(self.onFrameReceivedFromDrawer)
+        self.frameDrawer.frameReadyForDisplay.connect(self.displayFrameThrottler.onFrameReceived, Qt.DirectConnection)
+        self.displayFrameThrottler.frameReadyForDisplay.connect(self.onFrameReceivedFromDrawer)
         self.frameDrawer.previewFramesReadyForDisplay.connect(self.onPreviewFramesReceivedFromDrawer)
         self.movementDisplayTypeToggled.connect(self.frameDrawer.onToggleShowMovementType)
 
     def connectSoundDetectorSignalAndSlots(self) -> None:
         self.soundDetector.soundAbowThresholdDetected.connect(self.frameDrawer.onSetIsSoundDetectedText)
         self.soundDetector.soundAbowThresholdDetected.connect(self.eventLogger.onSoundDetectedReceived)
+        self.soundDetector.soundAbowThresholdDetected.connect(self.streamMetadataCollector.onSoundDetected)
         self.soundDetector.errorOccured.connect(self.onErrorOccuredInSoundDetector)
 
     def connectMovementTrackerSignalAndSlots(self) -> None:
@@ -129,6 +174,9 @@ class Controller(QObject):
     
     def connectMovementRecorderSignalAndSlots(self) -> None:
         self.movementRecorder.toggleIsRecording.connect(self.frameDrawer.onSetIsRecordingText)
+        self.movementRecorder.recordingStatsReported.connect(self.onRecordingStatsReported)
+        # Blocks until the recorder thread has closed the file, so the recording is complete before the thread quits
+        self.stopRecordingRequested.connect(self.movementRecorder.onStopRecordingRequested, Qt.BlockingQueuedConnection)
         #self.movementRecorder.toggleIsRecording.connect(self.frameTransforamtor.onBroadcastingInitialFrameToggled)
     
     def connectMovementLoggerSignalAndSlots(self) -> None:
@@ -136,6 +184,16 @@ class Controller(QObject):
     
     def connectTcpServerSignalAndSlots(self) -> None:
         self.tcpServer.connectionToServerMade.connect(self.onSomeoneConnectedToServer)
+        self.metadataTcpServer.connectionToServerMade.connect(self.onSomeoneConnectedToMetadataServer)
+        self.frameDrawer.frameReadyForDisplay.connect(self.overlayStreamEncoder.onFrameReceived, Qt.DirectConnection)
+        self.frameFetcher.frameFetched.connect(self.rawStreamEncoder.onFrameReceived, Qt.DirectConnection)
+        if self.h264StreamEncoder:
+            self.h264TcpServer.connectionToServerMade.connect(self.onSomeoneConnectedToH264Server)
+            self.frameDrawer.frameReadyForDisplay.connect(self.h264StreamEncoder.onFrameReceived, Qt.DirectConnection)
+        self.frameTransforamtor.contoursFound.connect(self.streamMetadataCollector.onContoursReceived)
+        self.frameTransforamtor.movementInFrameDetected.connect(self.streamMetadataCollector.onMovementPresentToggled)
+        self.objectDetector.objectsInFrameDetected.connect(self.streamMetadataCollector.onObjectsDetected)
+        self.movementRecorder.toggleIsRecording.connect(self.streamMetadataCollector.onRecordingToggled)
 
     def connectSettingsManager(self) -> None:
         self.settingsManager.frameDetectionSettingsSet.connect(self.frameTransforamtor.onFrameTransformatorSettingsChanged)
@@ -145,11 +203,17 @@ class Controller(QObject):
         self.settingsManager.objectDetectionSettingsSet.connect(self.onObjectDetectionSettingsChanged)
         self.settingsManager.movementLoggerSettingsSet.connect(self.eventLogger.onSettingsChanged)
         self.settingsManager.cameraSettingsSet.connect(self.onCameraSettingsChanged)
+        self.settingsManager.displaySettingsSet.connect(self.onDisplaySettingsChanged)
         self.settingsManager.emailSubscriberAdded.connect(self.emailSubsribersController.onSubscriberAdded)
         self.settingsManager.emailNotificatioToggle.connect(self.emailSubsribersController.onEnableNotificationsToggled)
     
     def connectObjectDetector(self) -> None:
         self.objectDetector.objectsInFrameDetected.connect(self.frameDrawer.onObjectForDrawingReceived)
+        self.layerTimingsDumpRequested.connect(self.objectDetector.requestLayerTimingsDump)
+        self.objectDetector.layerTimingsDumped.connect(self.onLayerTimingsDumped)
+        self.objectDetector.modelLoadingStarted.connect(self.onObjectDetectionModelLoadingStarted)
+        self.objectDetector.modelReady.connect(self.onObjectDetectionModelReady)
+        self.objectDetector.modelLoadingFailed.connect(self.onObjectDetectionModelLoadingFailed)
 
     def connectCameraInfoFetcher(self) -> None:
         self.startFetchingCameraInfo.connect(self.cameraInfoFetcher.onStart)
@@ -172,9 +236,9 @@ class Controller(QObject):
         self.threadController.addWorkerToGroup(
             WorkerGroupInfo(
                 self.objectDetector,
-                FRAME_FETCHING_GROUP
-            ),
-            use_existing_thread=True
+                OBJECT_DETECTION_GROUP,
+                self.objectDetector.onStart
+            )
         )
         self.threadController.addWorkerToGroup(
             WorkerGroupInfo(
@@ -219,34 +283,76 @@ class Controller(QObject):
             ),
             True
         )
+        self.threadController.addWorkerToGroup(
+            WorkerGroupInfo(
+                self.streamingHub,
+                FRAME_STREAMING_GROUP,
+                self.streamingHub.onStart,
+                self.streamingHub.onStop
+            )
+        )
+        self.threadController.addWorkerToGroup(
+            WorkerGroupInfo(
+                self.overlayStreamEncoder,
+                STREAM_ENCODING_GROUP
+            )
+        )
+        self.threadController.addWorkerToGroup(
+            WorkerGroupInfo(
+                self.rawStreamEncoder,
+                STREAM_ENCODING_GROUP
+            )
+        )
+        if self.h264StreamEncoder:
+            self.threadController.addWorkerToGroup(
+                WorkerGroupInfo(
+                    self.h264StreamEncoder,
+                    STREAM_ENCODING_GROUP
+                )
+            )
 
     def startServer(self) -> None:
         self.tcpServer.startListening()
+        self.metadataTcpServer.startListening()
+        if self.h264TcpServer:
+            self.h264TcpServer.startListening()
     
     def startWorkerGroups(self) -> None:
         self.threadController.startWorkerGroup(FRAME_FETCHING_GROUP)
+        self.threadController.startWorkerGroup(OBJECT_DETECTION_GROUP)
         self.threadController.startWorkerGroup(FRAME_RECORDING_GROUP)
         if self.isSoundDetectorEnabled():
             self.threadController.startWorkerGroup(SOUND_PROCESSING_GROUP)
         self.threadController.startWorkerGroup(LOGGER_PROCESSING_GROUP)
         self.threadController.startWorkerGroup(CAMERA_INFO_FETCHER_GROUP)
         self.threadController.startWorkerGroup(EMAIL_SUBSCRIBERS_PROCESSING_GROUP)
+        self.threadController.startWorkerGroup(STREAM_ENCODING_GROUP)
+        self.threadController.startWorkerGroup(FRAME_STREAMING_GROUP)
 
     def isSoundDetectorEnabled(self) -> bool:
         return self.settingsManager.getSoundDetectionSettings()["soundDetectionEnabled"]
 
     @pyqtSlot(Frame)
     def onFrameReceivedFromDrawer(self, frame: Frame) -> None:
-        self.imageIsReadyForDisplay.emit(
-            convertCvFrameToQImage(frame)
-            )
+        # The drawn frame is handed over as is, the view wraps it without conversion
+        self.imageIsReadyForDisplay.emit(frame)
     
     @pyqtSlot(bool)
     def onPreviewFramesToggled(self, toggled:bool) -> None:
         self.toggleShowPreviewFrames.emit(toggled)
 
+    @pyqtSlot(bool)
+    def onDisplayActiveToggled(self, active: bool) -> None:
+        self.displayFrameThrottler.setDisplayActive(active)
+
+    @pyqtSlot(dict)
+    def onDisplaySettingsChanged(self, displaySettings: Dict) -> None:
+        self.displayFrameThrottler.setMaxRefreshRate(displaySettings["maxRefreshRate"])
+
     @pyqtSlot(PreviewFrames)
     def onPreviewFramesReceivedFromDrawer(self, previewFrames: PreviewFrames) -> None:
+        if not self.displayFrameThrottler.isDisplayActive():
+            return
         previewQImages = {
             "originalFrame":convertCvFrameToQImage(previewFrames.originalFrame),
             "grayAndBluredFrame":convertCvFrameToQImage(previewFrames.grayAndBluredFrame),
@@ -264,45 +370,33 @@ class Controller(QObject):
         self.frameFetcher.stopRunning()
         self.soundDetector.toggleRunning(False)
         self.threadController.stopWorkerGroup(FRAME_FETCHING_GROUP)
+        self.threadController.stopWorkerGroup(OBJECT_DETECTION_GROUP)
         self.threadController.stopWorkerGroup(SOUND_PROCESSING_GROUP)
+        self.stopRecordingRequested.emit()
         self.threadController.stopWorkerGroup(FRAME_RECORDING_GROUP)
         self.threadController.stopWorkerGroup(LOGGER_PROCESSING_GROUP)
         self.threadController.stopWorkerGroup(CAMERA_INFO_FETCHER_GROUP)
         self.threadController.stopWorkerGroup(EMAIL_SUBSCRIBERS_PROCESSING_GROUP)
         self.threadController.stopWorkerGroup(FRAME_STREAMING_GROUP)
+        self.threadController.stopWorkerGroup(STREAM_ENCODING_GROUP)
+        self.jpegEncodingPool.shutdown()
         self.settingsManager.saveSettings()
 
     @pyqtSlot(voidptr)
     def onSomeoneConnectedToServer(self, handle): 
-        socketWorker = FrameToNetworkStreamer(handle)
-        self.threadController.addWorkerToGroup(
-            WorkerGroupInfo(
-                socketWorker,
-                FRAME_STREAMING_GROUP,
-                socketWorker.onStart,
-                id = socketWorker.get_id()
-            )
-        )
-        #self.frameFetcher.frameFetched.connect(socketWorker.onFrameReceived)
-        self.frameDrawer.frameReadyForDisplay.connect(socketWorker.onFrameReceived)
-        socketWorker.connectionTerminated.connect(self.onSocketWorkerConnectionTerminated)
-        self.threadController.startWorkerGroup(FRAME_STREAMING_GROUP)
-        self.subscribers.append(socketWorker)
+        self.streamingHub.clientConnectionReceived.emit(int(handle), StreamType.OVERLAY)
 
-    @pyqtSlot(str)
-    def onSocketWorkerConnectionTerminated(self, worker_id:str) -> None:
-        index = 0
-        worker_found = False
-        for worker in self.subscribers:
-            id_of_worker = worker.get_id()
-            if id_of_worker == worker_id:
-                logger.info("Found subsriber by id: %s", worker_id)
-                self.threadController.deleteObjectByIdFromWorkerGroup(worker_id, FRAME_STREAMING_GROUP)
-                worker_found = True   
-                break
-            index += 1 
-        if worker_found:
-            del self.subscribers[index] 
+    @pyqtSlot(voidptr)
+    def onSomeoneConnectedToMetadataServer(self, handle):
+        # Metadata clients get frames without overlays, drawn elements are sent alongside each frame
+        self.streamingHub.clientConnectionReceived.emit(int(handle), StreamType.METADATA)
+
+    @pyqtSlot(voidptr)
+    def onSomeoneConnectedToH264Server(self, handle):
+        self.streamingHub.clientConnectionReceived.emit(int(handle), StreamType.H264)
+
+    def getStreamingClientStats(self) -> Dict[str, Dict]:
+        return self.streamingHub.getClientStats()
 
     @pyqtSlot(dict)
     def onSoundDetectedSettingsChanged(self, new_settings: Dict) -> None:
@@ -349,16 +443,37 @@ class Controller(QObject):
     
     @pyqtSlot(dict)
     def onObjectDetectionSettingsChanged(self, objectDetectionSettings: dict) -> None:
-        newObjDetectionSettings = ObjectDetectionSettings(
-            objectDetectionSettings["confidenceThreshold"],
-            objectDetectionSettings["detectionEnabled"]
-        )
+        newObjDetectionSettings = ObjectDetector.getDetectionSettingsFromDict(objectDetectionSettings)
         self.objectDetector.setDetectionParams(newObjDetectionSettings)
     
     @pyqtSlot(bool)
     def onObjectDetectionToggled(self, toggled: bool) -> None:
         self.objectDetector.setDetectionTriggered(toggled)
 
+    @pyqtSlot()
+    def onLayerTimingsDumpRequested(self) -> None:
+        self.layerTimingsDumpRequested.emit()
+
+    @pyqtSlot(list)
+    def onLayerTimingsDumped(self, layerTimings: list) -> None:
+        self.layerTimingsReceived.emit(layerTimings)
+
+    @pyqtSlot()
+    def onObjectDetectionModelLoadingStarted(self) -> None:
+        self.objectDetectionModelLoading.emit()
+
+    @pyqtSlot(bool)
+    def onObjectDetectionModelReady(self, ready: bool) -> None:
+        self.objectDetectionModelReady.emit(ready)
+
+    @pyqtSlot(str)
+    def onObjectDetectionModelLoadingFailed(self, msg: str) -> None:
+        self.objectDetectionModelErrorAppeared.emit(msg)
+
+    @pyqtSlot(dict)
+    def onRecordingStatsReported(self, stats: dict) -> None:
+        self.recordingFinished.emit(stats)
+
     @pyqtSlot()
     def onNoInputFoundFromFrameFetcher(self) -> None:
         self.frameSourceNotFound.emit()
@@ -0,0 +1,62 @@
+import math
+import time
+from typing import Optional
+from PyQt5.QtCore import QMutex, QMutexLocker, QObject, QTimer, Qt, pyqtSignal, pyqtSlot
+from utils import Frame
+
+class DisplayFrameThrottler(QObject):
+    frameReadyForDisplay = pyqtSignal(Frame)
+    newFrameAvailable = pyqtSignal()
+
+    def __init__(self, maxRefreshRate: float) -> None:
+        super().__init__()
+        self.latestFrameMutex = QMutex()
+        self.latestFrame: Optional[Frame] = None
+        self.displayActive = True
+        self.lastDisplayTimestamp = 0.0
+        self.minFrameInterval = 0.0
+        self.refreshTimer = QTimer(self)
+        self.refreshTimer.setSingleShot(True)
+        self.refreshTimer.timeout.connect(self.onNewFrameAvailable)
+        self.newFrameAvailable.connect(self.onNewFrameAvailable, Qt.QueuedConnection)
+        self.setMaxRefreshRate(maxRefreshRate)
+
+    def setMaxRefreshRate(self, maxRefreshRate: float) -> None:
+        self.minFrameInterval = 1 / maxRefreshRate if maxRefreshRate > 0 else 0.0
+
+    def setDisplayActive(self, active: bool) -> None:
+        with QMutexLocker(self.latestFrameMutex):
+            self.displayActive = active
+            if not active:
+                self.latestFrame = None
+
+    def isDisplayActive(self) -> bool:
+        with QMutexLocker(self.latestFrameMutex):
+            return self.displayActive
+
+    @pyqtSlot(Frame)
+    def onFrameReceived(self, frame: Frame) -> None:
+        # Called directly from the drawing thread, frames waiting for the GUI thread are replaced by newer ones
+        with QMutexLocker(self.latestFrameMutex):
+            if not self.displayActive:
+                return
+            displayPending = self.latestFrame is not None
+            self.latestFrame = frame
+        if not displayPending:
+            self.newFrameAvailable.emit()
+
+    @pyqtSlot()
+    def onNewFrameAvailable(self) -> None:
+        now = time.monotonic()
+        remaining = self.minFrameInterval - (now - self.lastDisplayTimestamp)
+        if remaining > 0:
+            if not self.refreshTimer.isActive():
+                self.refreshTimer.start(math.ceil(1000 * remaining))
+            return
+        with QMutexLocker(self.latestFrameMutex):
+            frame = self.latestFrame
+            self.latestFrame = None
+        if frame is None:
+            return
+        self.lastDisplayTimestamp = now
+        self.frameReadyForDisplay.emit(frame)
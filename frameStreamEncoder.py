@@ -0,0 +1,178 @@
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+import time
+from typing import Dict, List, Optional
+import cv2
+from PyQt5.QtCore import QMutex, QMutexLocker, QObject, Qt, pyqtSignal, pyqtSlot
+from jpegEncoders import JpegEncoder
+from utils import Frame
+
+DEFAULT_JPEG_QUALITY = 95
+# Older frames mean the source stalled, snapshots are refused instead of showing them
+SNAPSHOT_MAX_FRAME_AGE = 1.0
+
+@dataclass(frozen=True)
+class StreamProfile:
+    name: str
+    # 0 keeps the width of the source frame
+    maxWidth: int
+    # 0 encodes every frame
+    maxFrameRate: float
+    jpegQuality: int
+
+STREAM_PROFILES = {
+    profile.name: profile for profile in [
+        StreamProfile("main", 0, 0, DEFAULT_JPEG_QUALITY),
+        StreamProfile("sub", 640, 15, 80),
+        StreamProfile("thumbnail", 320, 5, 70)
+    ]
+}
+DEFAULT_STREAM_PROFILE = "main"
+
+@dataclass(frozen=True)
+class StreamQuality:
+    jpegQuality: int = DEFAULT_JPEG_QUALITY
+    scale: float = 1.0
+    maxWidth: int = 0
+    maxFrameRate: float = 0
+
+@dataclass(frozen=True)
+class EncodedFrame:
+    quality: StreamQuality
+    width: int
+    height: int
+    timestamp: float
+    sequence: int
+    # Shared as is by every subscriber of the quality
+    jpeg: bytes
+
+class FrameStreamEncoder(QObject):
+    frameEncoded = pyqtSignal(EncodedFrame)
+    newFrameAvailable = pyqtSignal()
+
+    def __init__(self, jpegEncoder: JpegEncoder, encodingPool: ThreadPoolExecutor) -> None:
+        super().__init__()
+        self.jpegEncoder = jpegEncoder
+        # The pool is shared by all stream encoders, which bounds the number of encoding threads
+        self.encodingPool = encodingPool
+        self.latestFrameMutex = QMutex()
+        self.latestFrame: Optional[Frame] = None
+        self.latestFrameTimestamp = 0.0
+        # Kept even without subscribers, so snapshots can be encoded on request
+        self.snapshotFrame: Optional[Frame] = None
+        self.snapshotFrameTimestamp = 0.0
+        self.frameSequence = 0
+        self.subscribersMutex = QMutex()
+        self.subscribersPerQuality: Dict[StreamQuality, int] = {}
+        self.nextEncodingTimestamps: Dict[StreamQuality, float] = {}
+        # Snapshots reuse the newest frame encoded for their quality when no newer frame has arrived
+        self.lastEncodedFramesMutex = QMutex()
+        self.lastEncodedFrames: Dict[StreamQuality, EncodedFrame] = {}
+        self.newFrameAvailable.connect(self.onNewFrameAvailable, Qt.QueuedConnection)
+
+    def subscribe(self, quality: StreamQuality) -> None:
+        with QMutexLocker(self.subscribersMutex):
+            self.subscribersPerQuality[quality] = self.subscribersPerQuality.get(quality, 0) + 1
+
+    def unsubscribe(self, quality: StreamQuality) -> None:
+        with QMutexLocker(self.subscribersMutex):
+            self.subscribersPerQuality[quality] -= 1
+            if self.subscribersPerQuality[quality] <= 0:
+                del self.subscribersPerQuality[quality]
+                self.nextEncodingTimestamps.pop(quality, None)
+
+    def getSnapshot(self, quality: StreamQuality) -> Optional[EncodedFrame]:
+        with QMutexLocker(self.latestFrameMutex):
+            frame = self.snapshotFrame
+            timestamp = self.snapshotFrameTimestamp
+            sequence = self.frameSequence
+        if frame is None or time.time() - timestamp > SNAPSHOT_MAX_FRAME_AGE:
+            return None
+        with QMutexLocker(self.lastEncodedFramesMutex):
+            encodedFrame = self.lastEncodedFrames.get(quality)
+        if encodedFrame is not None and encodedFrame.timestamp >= timestamp:
+            return encodedFrame
+        # Encoded on the calling thread, a single frame does not need the pool
+        scale = getEffectiveScale(quality, frame.shape[1])
+        if scale != 1.0:
+            frame = scaleFrame(frame, scale)
+        jpeg = self.jpegEncoder.encode(frame, quality.jpegQuality)
+        if not jpeg:
+            return None
+        height, width = frame.shape[:2]
+        return EncodedFrame(quality, width, height, timestamp, sequence, jpeg)
+
+    def getSubscribedQualities(self) -> List[StreamQuality]:
+        with QMutexLocker(self.subscribersMutex):
+            return list(self.subscribersPerQuality)
+
+    @pyqtSlot(Frame)
+    def onFrameReceived(self, frame: Frame) -> None:
+        # Called directly from the producing thread, only the newest frame waits for encoding
+        timestamp = time.time()
+        hasSubscribers = bool(self.getSubscribedQualities())
+        with QMutexLocker(self.latestFrameMutex):
+            self.snapshotFrame = frame
+            self.snapshotFrameTimestamp = timestamp
+            if not hasSubscribers:
+                return
+            encodingPending = self.latestFrame is not None
+            self.latestFrame = frame
+            self.latestFrameTimestamp = timestamp
+        if not encodingPending:
+            self.newFrameAvailable.emit()
+
+    @pyqtSlot()
+    def onNewFrameAvailable(self) -> None:
+        with QMutexLocker(self.latestFrameMutex):
+            frame = self.latestFrame
+            timestamp = self.latestFrameTimestamp
+            self.latestFrame = None
+        if frame is None:
+            return
+        self.frameSequence += 1
+        qualities = self.getQualitiesDueForEncoding()
+        if not qualities:
+            return
+        frameWidth = frame.shape[1]
+        qualityScales = {quality: getEffectiveScale(quality, frameWidth) for quality in qualities}
+        scales = list({scale for scale in qualityScales.values() if scale != 1.0})
+        scaledFrames = {1.0: frame}
+        scaledFrames.update(zip(scales, self.encodingPool.map(lambda scale: scaleFrame(frame, scale), scales)))
+        encodedQualities = self.encodingPool.map(
+            lambda quality: self.jpegEncoder.encode(scaledFrames[qualityScales[quality]], quality.jpegQuality),
+            qualities
+        )
+        for quality, jpeg in zip(qualities, encodedQualities):
+            if jpeg:
+                height, width = scaledFrames[qualityScales[quality]].shape[:2]
+                encodedFrame = EncodedFrame(quality, width, height, timestamp, self.frameSequence, jpeg)
+                with QMutexLocker(self.lastEncodedFramesMutex):
+                    self.lastEncodedFrames[quality] = encodedFrame
+                self.frameEncoded.emit(encodedFrame)
+
+    def getQualitiesDueForEncoding(self) -> List[StreamQuality]:
+        # Rate limited qualities are encoded on a fixed schedule, so the frames skipped in between cost nothing
+        now = time.monotonic()
+        qualities = []
+        with QMutexLocker(self.subscribersMutex):
+            for quality in self.subscribersPerQuality:
+                if quality.maxFrameRate <= 0:
+                    qualities.append(quality)
+                    continue
+                nextEncodingTimestamp = self.nextEncodingTimestamps.get(quality, now)
+                if now < nextEncodingTimestamp:
+                    continue
+                interval = 1 / quality.maxFrameRate
+                fellBehind = now - nextEncodingTimestamp >= interval
+                self.nextEncodingTimestamps[quality] = now + interval if fellBehind else nextEncodingTimestamp + interval
+                qualities.append(quality)
+        return qualities
+
+def getEffectiveScale(quality: StreamQuality, frameWidth: int) -> float:
+    if quality.maxWidth and quality.maxWidth < frameWidth:
+        return quality.scale * quality.maxWidth / frameWidth
+    return quality.scale
+
+def scaleFrame(frame: Frame, scale: float) -> Frame:
+    return cv2.resize(frame, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
@@ -1,78 +1,171 @@
-from asyncio.log import logger
-import struct
-from typing import Any, Optional, Union
-from PyQt5.QtCore import QObject, pyqtSignal, pyqtSlot, QTimer, QThread
-import cv2
-from PyQt5.QtNetwork import QTcpSocket
-from utils import Frame
-import uuid
+import math
+import time
+from typing import Any, Dict, Optional
+from PyQt5.QtCore import QMutexLocker, QObject, QTimer, pyqtSlot
+from frameStreamEncoder import DEFAULT_STREAM_PROFILE, STREAM_PROFILES, EncodedFrame, FrameStreamEncoder, StreamProfile, StreamQuality
+from networkStreamingClient import MAX_PENDING_BYTES, NetworkStreamingClient
+from streamMetadata import StreamMetadataCollector
+from streamProtocol import MessageType, encodeJsonPayload
 import logging
 
-FRAME_SENDING_INTERVAL = 1/30
+RECOVERED_PENDING_BYTES = 64 * 1024
+QUALITY_LADDER = [
+    StreamQuality(95, 1.0),
+    StreamQuality(80, 1.0),
+    StreamQuality(65, 1.0),
+    StreamQuality(60, 0.75),
+    StreamQuality(50, 0.5)
+]
+SKIPPED_FRAMES_BEFORE_STEP_DOWN = 3
+SENT_FRAMES_BEFORE_STEP_UP = 90
 
 logger = logging.getLogger(__name__)
 
-class FrameToNetworkStreamer(QObject):
-    connectionTerminated = pyqtSignal(str)
-
-    def __init__(self, client_socket_handle: Any) -> None:
-        super().__init__()
-        self.client_socket: Optional[QTcpSocket] = None
-        self.current_frame: Optional[Frame] = None
-        self.sendingTimer: Optional[QTimer] = None
-        self.client_socket_handle = client_socket_handle
-        self.id = str(uuid.uuid4())
-          
-    def onStart(self) -> None:
-        self.initializeSendingTimer()
-        self.sendingTimer.start()
-        self.client_socket = QTcpSocket(self)
-        self.client_socket.setSocketDescriptor(self.client_socket_handle)
-        self.client_socket.disconnected.connect(self.onConnectionTerminated)
-    
-    def initializeSendingTimer(self) -> None:
-        self.sendingTimer = QTimer()
-        self.sendingTimer.setInterval(int(FRAME_SENDING_INTERVAL * 1000))
-        self.sendingTimer.timeout.connect(self.sendFrame)
-    
-    def initializeClientSocket(self) -> None:
-        self.client_socket = QTcpSocket()
-        self.client_socket.setSocketDescriptor(self.client_socket_handle)
+class FrameToNetworkStreamer(NetworkStreamingClient):
+    def __init__(
+        self,
+        client_socket_handle: Any,
+        streamEncoder: FrameStreamEncoder,
+        metadataCollector: Optional[StreamMetadataCollector] = None,
+        parent: Optional[QObject] = None,
+        maxFrameRate: float = 0
+        ) -> None:
+        super().__init__(client_socket_handle, parent)
+        self.streamEncoder = streamEncoder
+        self.minFrameInterval = 0.0
+        self.lastFrameSentTimestamp = 0.0
+        self.isWaitingForSocket = False
+        self.rateLimitTimer: Optional[QTimer] = None
+        self.setMaxFrameRate(maxFrameRate)
+        self.profile: StreamProfile = STREAM_PROFILES[DEFAULT_STREAM_PROFILE]
+        self.qualityLevel = 0
+        self.consecutiveSkips = 0
+        self.consecutiveSends = 0
+        # With a metadata collector the client receives raw frames and draws the overlays itself
+        self.metadataCollector = metadataCollector
+        self.current_frame: Optional[EncodedFrame] = None
 
+    def onStart(self) -> bool:
+        self.rateLimitTimer = QTimer(self)
+        self.rateLimitTimer.setSingleShot(True)
+        self.rateLimitTimer.timeout.connect(self.sendFrame)
+        return super().onStart()
+
+    def hasMetadata(self) -> bool:
+        return self.metadataCollector is not None
+
+    def startStreaming(self) -> None:
+        self.streamEncoder.subscribe(self.getStreamQuality())
+        self.isStreaming = True
+
+    def stopStreaming(self) -> None:
+        if self.isStreaming:
+            self.isStreaming = False
+            self.current_frame = None
+            self.streamEncoder.unsubscribe(self.getStreamQuality())
+
+    def setMaxFrameRate(self, maxFrameRate: float) -> None:
+        self.minFrameInterval = 1 / maxFrameRate if maxFrameRate > 0 else 0.0
+
+    def getStreamQuality(self) -> StreamQuality:
+        # The backpressure ladder only ever lowers the quality of the selected profile
+        step = QUALITY_LADDER[self.qualityLevel]
+        return StreamQuality(min(step.jpegQuality, self.profile.jpegQuality), step.scale, self.profile.maxWidth, self.profile.maxFrameRate)
+
+    def getStreamDescription(self) -> Dict:
+        quality = self.getStreamQuality()
+        return {
+            "codec": "jpeg",
+            "profile": self.profile.name,
+            "jpegQuality": quality.jpegQuality,
+            "scale": quality.scale,
+            "maxWidth": quality.maxWidth,
+            "maxFrameRate": quality.maxFrameRate
+        }
+
+    def selectProfile(self, profileName: str) -> None:
+        if profileName not in STREAM_PROFILES:
+            logger.warning("Streaming client: %s requested unknown stream profile: %s", self.id, profileName)
+            return
+        wasStreaming = self.isStreaming
+        self.stopStreaming()
+        self.profile = STREAM_PROFILES[profileName]
+        self.qualityLevel = 0
+        self.consecutiveSkips = 0
+        self.consecutiveSends = 0
+        logger.info("Streaming client: %s selected stream profile: %s", self.id, profileName)
+        # The new hello tells the client from which point on frames belong to the selected profile
+        self.sendHello()
+        if wasStreaming:
+            self.startStreaming()
+
+    @pyqtSlot()
     def sendFrame(self) -> None:
-        if self.current_frame is None:
+        if self.current_frame is None or not self.isStreaming:
+            return
+        pendingBytes = self.updatePendingBytes()
+        # A congested client is retried once the socket has written some of its backlog
+        self.isWaitingForSocket = pendingBytes > MAX_PENDING_BYTES
+        if self.isWaitingForSocket:
             return
-        encoded_frame = self.get_encoded_frame(self.current_frame)
-        self.writeDataToSocket(encoded_frame)
+        remaining = self.minFrameInterval - (time.monotonic() - self.lastFrameSentTimestamp)
+        if remaining > 0:
+            if self.rateLimitTimer and not self.rateLimitTimer.isActive():
+                self.rateLimitTimer.start(math.ceil(1000 * remaining))
+            return
+        bytes_written = self.writeEncodedFrame(self.current_frame)
         self.current_frame = None
-    
-    def writeDataToSocket(self, content:Union[bytes, bytearray]) -> None:
-        bytes_written = self.client_socket.write(content)
-
-    def get_encoded_frame(self, frame: Frame) -> bytearray:
-        img_encoded = cv2.imencode('.jpg', frame)[1].tobytes()
-        res = struct.pack("I", len(img_encoded))
-        frame_bytes_with_size = bytearray(res)
-        frame_bytes_with_size.extend(img_encoded)
-        return frame_bytes_with_size
-        
-    @pyqtSlot(Frame)
-    def onFrameReceived(self, frame:Frame) -> None:
-        self.current_frame = frame
-    
-    @pyqtSlot()
-    def onConnectionTerminated(self) -> None:
-        logger.info("Connection with remote client, client_id: %s is terminated !", self.id)
-        self.connectionTerminated.emit(self.id)
-    
-    def get_id(self) -> str:
-        return self.id
+        self.lastFrameSentTimestamp = time.monotonic()
+        self.onFrameSent(bytes_written)
 
-        
+    @pyqtSlot("qint64")
+    def onBytesWritten(self, bytes_count: int) -> None:
+        if self.isWaitingForSocket:
+            self.sendFrame()
 
+    def writeEncodedFrame(self, encodedFrame: EncodedFrame) -> int:
+        bytes_written = 0
+        if self.metadataCollector:
+            # Metadata shares the sequence number of the frame it describes
+            metadata = self.metadataCollector.getMetadata(encodedFrame.width, encodedFrame.height)
+            bytes_written += self.writeMessage(MessageType.METADATA, encodedFrame.sequence, encodedFrame.timestamp, encodeJsonPayload(metadata))
+        bytes_written += self.writeMessage(MessageType.FRAME, encodedFrame.sequence, encodedFrame.timestamp, encodedFrame.jpeg)
+        return bytes_written
 
-    
+    def onFrameSkipped(self) -> None:
+        # The frame stays as current and is replaced by a newer one, the client gets only what it can take
+        self.consecutiveSends = 0
+        self.consecutiveSkips += 1
+        self.countSkippedFrame()
+        if self.consecutiveSkips >= SKIPPED_FRAMES_BEFORE_STEP_DOWN and self.qualityLevel < len(QUALITY_LADDER) - 1:
+            self.changeQualityLevel(self.qualityLevel + 1)
 
+    def onFrameSent(self, bytes_written: int) -> None:
+        self.consecutiveSkips = 0
+        if self.getSocket().bytesToWrite() <= RECOVERED_PENDING_BYTES:
+            self.consecutiveSends += 1
+        else:
+            self.consecutiveSends = 0
+        if self.consecutiveSends >= SENT_FRAMES_BEFORE_STEP_UP and self.qualityLevel > 0:
+            self.changeQualityLevel(self.qualityLevel - 1)
+        self.countSentFrame(bytes_written)
 
+    def changeQualityLevel(self, qualityLevel: int) -> None:
+        self.streamEncoder.unsubscribe(self.getStreamQuality())
+        self.qualityLevel = qualityLevel
+        self.streamEncoder.subscribe(self.getStreamQuality())
+        self.consecutiveSkips = 0
+        self.consecutiveSends = 0
+        with QMutexLocker(self.statsMutex):
+            self.stats.qualityChanges += 1
+        quality = self.getStreamQuality()
+        logger.info("Streaming client: %s switched to jpeg quality %s at scale %s", self.id, quality.jpegQuality, quality.scale)
 
-    
\ No newline at end of file
+    def onFrameEncoded(self, encodedFrame: EncodedFrame) -> None:
+        # Frames are pushed as soon as they are encoded, a frame still waiting is replaced by the newer one
+        if encodedFrame.quality != self.getStreamQuality():
+            return
+        if self.current_frame is not None and self.isWaitingForSocket:
+            self.onFrameSkipped()
+        self.current_frame = encodedFrame
+        self.sendFrame()
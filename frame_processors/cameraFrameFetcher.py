@@ -26,6 +26,7 @@ class CameraFrameFetcher(FrameFetcher):
             while self.isRunning():
                 frame = self.captureSingleFrame()
                 if not frame is None:
+                    self.nativeFrameFetched.emit(frame)
                     frame = imutils.resize(frame, RESIZE_WIDTH)
                     self.frameFetched.emit(frame)
                     continue
@@ -0,0 +1,102 @@
+from contextlib import contextmanager, nullcontext
+import bisect
+import time
+from typing import ContextManager, Dict, Iterator, List
+import cv2
+from PyQt5.QtCore import QMutex, QMutexLocker
+
+PROFILED_STAGES = ["blobFromImage", "forward", "decode", "NMSBoxes"]
+HISTOGRAM_BUCKETS_MS = [0.5, 1, 2, 5, 10, 20, 50, 100, 200, 500]
+
+class StageHistogram:
+    def __init__(self) -> None:
+        self.bucketCounts = [0] * (len(HISTOGRAM_BUCKETS_MS) + 1)
+        self.count = 0
+        self.totalMs = 0.0
+        self.maxMs = 0.0
+
+    def add(self, durationMs: float) -> None:
+        self.bucketCounts[bisect.bisect_left(HISTOGRAM_BUCKETS_MS, durationMs)] += 1
+        self.count += 1
+        self.totalMs += durationMs
+        self.maxMs = max(self.maxMs, durationMs)
+
+    def getPercentile(self, percentile: float) -> float:
+        # Upper bound of the bucket containing the percentile, the last bucket is bounded by the max
+        if self.count == 0:
+            return 0.0
+        rank = percentile / 100 * self.count
+        accumulated = 0
+        for index, bucketCount in enumerate(self.bucketCounts):
+            accumulated += bucketCount
+            if accumulated >= rank:
+                return min(HISTOGRAM_BUCKETS_MS[index], self.maxMs) if index < len(HISTOGRAM_BUCKETS_MS) else self.maxMs
+        return self.maxMs
+
+    def toDict(self) -> Dict:
+        buckets = {f"<={bound}ms": count for bound, count in zip(HISTOGRAM_BUCKETS_MS, self.bucketCounts)}
+        buckets[f">{HISTOGRAM_BUCKETS_MS[-1]}ms"] = self.bucketCounts[-1]
+        return {
+            "count": self.count,
+            "avgMs": self.totalMs / self.count if self.count else 0.0,
+            "p50Ms": self.getPercentile(50),
+            "p95Ms": self.getPercentile(95),
+            "maxMs": self.maxMs,
+            "buckets": buckets
+        }
+
+class DetectionProfiler:
+    def __init__(self, enabled: bool = False) -> None:
+        self.enabled = enabled
+        self.mutex = QMutex()
+        self.histograms: Dict[str, StageHistogram] = {}
+        self.reset()
+
+    def reset(self) -> None:
+        with QMutexLocker(self.mutex):
+            self.histograms = {stage: StageHistogram() for stage in PROFILED_STAGES}
+
+    def setEnabled(self, enabled: bool) -> None:
+        if enabled and not self.enabled:
+            self.reset()
+        self.enabled = enabled
+
+    def measure(self, stage: str) -> ContextManager:
+        # Disabled profiling costs one attribute check and an empty context manager
+        if not self.enabled:
+            return nullcontext()
+        return self.measureStage(stage)
+
+    @contextmanager
+    def measureStage(self, stage: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.addTiming(stage, 1000 * (time.perf_counter() - start))
+
+    def addTiming(self, stage: str, durationMs: float) -> None:
+        with QMutexLocker(self.mutex):
+            self.histograms.setdefault(stage, StageHistogram()).add(durationMs)
+
+    def getSummary(self) -> Dict[str, Dict]:
+        with QMutexLocker(self.mutex):
+            return {stage: histogram.toDict() for stage, histogram in self.histograms.items()}
+
+def formatProfilingSummary(summary: Dict[str, Dict]) -> str:
+    return ", ".join(
+        f"{stage} avg {timings['avgMs']:.1f} / p95 {timings['p95Ms']:.1f} / max {timings['maxMs']:.1f} ms"
+        for stage, timings in summary.items()
+    )
+
+def getOpenCVLayerTimings(net: cv2.dnn_Net) -> List[Dict]:
+    # Timings of the last forward pass, as measured by OpenCV itself
+    totalTicks, layerTicks = net.getPerfProfile()
+    tickFrequency = cv2.getTickFrequency()
+    layerNames = net.getLayerNames()
+    timings = [
+        {"layer": layerName, "timeMs": 1000 * float(ticks) / tickFrequency}
+        for layerName, ticks in zip(layerNames, layerTicks.reshape(-1))
+    ]
+    timings.sort(key = lambda timing: timing["timeMs"], reverse = True)
+    return [{"layer": "total", "timeMs": 1000 * float(totalTicks) / tickFrequency}] + timings
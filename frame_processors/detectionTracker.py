@@ -0,0 +1,66 @@
+from typing import Dict, List, Optional, Tuple
+import math
+from utils import Region
+
+MAX_BLOB_JUMP_DISTANCE = 80
+
+def getRegionCenter(region: Region) -> Tuple[float, float]:
+    x, y, w, h = region
+    return (x + w / 2, y + h / 2)
+
+def getOverlapArea(a: Region, b: Region) -> int:
+    overlapWidth = min(a[0] + a[2], b[0] + b[2]) - max(a[0], b[0])
+    overlapHeight = min(a[1] + a[3], b[1] + b[3]) - max(a[1], b[1])
+    if overlapWidth <= 0 or overlapHeight <= 0:
+        return 0
+    return overlapWidth * overlapHeight
+
+class TrackedDetection:
+    def __init__(self, detection: Dict, blobCenter: Optional[Tuple[float, float]]) -> None:
+        self.detection = dict(detection)
+        self.blobCenter = blobCenter
+
+class MotionBlobBoxTracker:
+    def __init__(self, maxBlobJumpDistance: int = MAX_BLOB_JUMP_DISTANCE) -> None:
+        self.maxBlobJumpDistance = maxBlobJumpDistance
+        self.trackedDetections: List[TrackedDetection] = []
+
+    def reset(self, detections: List[Dict], motionRegions: List[Region]) -> None:
+        self.trackedDetections = [
+            TrackedDetection(detection, self.findOverlappingBlobCenter(detection, motionRegions))
+            for detection in detections
+        ]
+
+    def update(self, motionRegions: List[Region]) -> List[Dict]:
+        blobCenters = [getRegionCenter(region) for region in motionRegions]
+        for tracked in self.trackedDetections:
+            if tracked.blobCenter is None:
+                continue
+            newCenter = self.findNearestBlobCenter(tracked.blobCenter, blobCenters)
+            if newCenter is None:
+                continue
+            tracked.detection["x"] += int(round(newCenter[0] - tracked.blobCenter[0]))
+            tracked.detection["y"] += int(round(newCenter[1] - tracked.blobCenter[1]))
+            tracked.blobCenter = newCenter
+        return [dict(tracked.detection) for tracked in self.trackedDetections]
+
+    def findOverlappingBlobCenter(self, detection: Dict, motionRegions: List[Region]) -> Optional[Tuple[float, float]]:
+        box = (detection["x"], detection["y"], detection["w"], detection["h"])
+        bestOverlap = 0
+        bestRegion: Optional[Region] = None
+        for region in motionRegions:
+            overlap = getOverlapArea(box, region)
+            if overlap > bestOverlap:
+                bestOverlap = overlap
+                bestRegion = region
+        return getRegionCenter(bestRegion) if bestRegion else None
+
+    def findNearestBlobCenter(self, center: Tuple[float, float], blobCenters: List[Tuple[float, float]]) -> Optional[Tuple[float, float]]:
+        nearest = None
+        nearestDistance = float(self.maxBlobJumpDistance)
+        for blobCenter in blobCenters:
+            distance = math.hypot(blobCenter[0] - center[0], blobCenter[1] - center[1])
+            if distance <= nearestDistance:
+                nearest = blobCenter
+                nearestDistance = distance
+        return nearest
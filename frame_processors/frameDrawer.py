@@ -2,6 +2,7 @@ from PyQt5.QtCore import QObject, pyqtSignal, pyqtSlot
 import cv2
 from typing import Any, Dict, List, Optional, Tuple
 from frame_processors.frameTransformator import ContoursInfo
+from frame_processors.overlayLayer import OverlayLayer
 from utils import Contour, Frame, PointCoords, PreviewFrames, TextToPutOnFrameType, MovementPresentationType
 from dataclasses import dataclass
 
@@ -33,6 +34,7 @@ class FrameDrawer(QObject):
         self.contoursForDrawing: Optional[List[Contour]] = None
         self.centerOfTheMass: Optional[PointCoords] = None
         self.msgTypesForDrawing: List[TextToPutOnFrameType] = []
+        self.overlay = OverlayLayer()
     
 
     @pyqtSlot(list)
@@ -50,8 +52,14 @@ class FrameDrawer(QObject):
 
     @pyqtSlot(Frame)
     def onPrepareFrameForDisplay(self, frame: Frame) -> None:
+        self.overlay.prepare(frame.shape)
+        self.drawElementsOnOverlay(self.overlay)
+        if self.overlay.isEmpty():
+            self.frameReadyForDisplay.emit(frame)
+            return
+        # The fetched frame is shared with the recorder and detector, the overlay is composed on a copy
         frameForDrawing = frame.copy()
-        self.drawElementsOnFrame(frameForDrawing)
+        self.overlay.composeOnto(frameForDrawing)
         self.frameReadyForDisplay.emit(frameForDrawing)
     
     @pyqtSlot(bool)
@@ -90,56 +98,56 @@ class FrameDrawer(QObject):
         elif shapeType == MovementPresentationType.RECTANGLE:
             self.showRectangles = toggle
     
-    def drawElementsOnFrame(self, frame:Frame) -> None:
-        self.drawObjects(frame)
-        self.drawContours(frame)
-        self.drawTextMessages(frame)
+    def drawElementsOnOverlay(self, overlay: OverlayLayer) -> None:
+        self.drawObjects(overlay)
+        self.drawContours(overlay)
+        self.drawTextMessages(overlay)
         self.clear_qeues()
     
-    def drawObjects(self, frame: Frame) -> None:
+    def drawObjects(self, overlay: OverlayLayer) -> None:
         if not self.objectsForDrawing:
             return
         for info in self.objectsForDrawing:
-            cv2.rectangle(frame, (info["x"], info["y"]), (info["x"] + info["w"], info["y"] + info["h"]), info["color"], 2)
+            overlay.drawRectangle((info["x"], info["y"]), (info["x"] + info["w"], info["y"] + info["h"]), info["color"], 2)
             text = "{}: {:.4f}".format(info["label"], info["confidence"])
-            cv2.putText(frame, text, (info["x"], info["y"] - 2), cv2.FONT_HERSHEY_SIMPLEX, 0.7, info["color"], 1,cv2.LINE_AA)       
+            overlay.drawText(text, (info["x"], info["y"] - 2), 0.7, 1, info["color"])
         self.objectsForDrawing = None
 
-    def drawContours(self, frame:Frame) -> None:
+    def drawContours(self, overlay: OverlayLayer) -> None:
         if self.showRectangles:
-            self.drawRectanglesAroundContours(frame)
+            self.drawRectanglesAroundContours(overlay)
         if self.showConturShapes:
-            self.drawContourShape(frame)
+            self.drawContourShape(overlay)
         if self.drawContourCrosshair and self.centerOfTheMass:
-            self.drawContourCrosshair(frame)
+            self.drawContourCrosshair(overlay)
 
-    def drawRectanglesAroundContours(self, frame: Frame) ->  None:
+    def drawRectanglesAroundContours(self, overlay: OverlayLayer) ->  None:
         if self.contoursForDrawing:
             for contour in self.contoursForDrawing:
                 x,y,w,h = cv2.boundingRect(contour)
                 rx = x+int(w/2)
                 ry = y+int(h/2)
-                cv2.circle(frame,(rx,ry),2,(0,255,0),2)
-                cv2.rectangle(frame,(x,y),(x+w,y+h),(0,255,0),2)
+                overlay.drawCircle((rx,ry),2,(0,255,0),2)
+                overlay.drawRectangle((x,y),(x+w,y+h),(0,255,0),2)
 
-    def drawContourShape(self, frame: Frame) -> None:
+    def drawContourShape(self, overlay: OverlayLayer) -> None:
         if self.contoursForDrawing:
             for contour in self.contoursForDrawing:
                 M = cv2.moments(contour)
                 cx = int(M['m10']/M['m00'])
                 cy = int(M['m01']/M['m00'])   
-                cv2.circle(frame,(cx,cy),2,(0,0,255),2)
-                cv2.drawContours(frame,[contour], 0, (0,0,255), 2)
+                overlay.drawCircle((cx,cy),2,(0,0,255),2)
+                overlay.drawContour(contour, (0,0,255), 2)
     
-    def drawContourCrosshair(self, frame: Frame) -> None:
+    def drawContourCrosshair(self, overlay: OverlayLayer) -> None:
         if not self.centerOfTheMass:
             raise BaseException("No Ceneter of the mass received for drawing Crossahir")
         tr  = 30
-        cv2.circle(frame,self.centerOfTheMass,tr,(0,0,255,0),2)
-        cv2.line(frame,(self.centerOfTheMass[0]-tr,self.centerOfTheMass[1]),(self.centerOfTheMass[0]+tr,self.centerOfTheMass[1]),(0,0,255,0),2)
-        cv2.line(frame,(self.centerOfTheMass[0],self.centerOfTheMass[1]-tr),(self.centerOfTheMass[0],self.centerOfTheMass[1]+tr),(0,0,255,0),2)
+        overlay.drawCircle(self.centerOfTheMass,tr,(0,0,255,0),2)
+        overlay.drawLine((self.centerOfTheMass[0]-tr,self.centerOfTheMass[1]),(self.centerOfTheMass[0]+tr,self.centerOfTheMass[1]),(0,0,255,0),2)
+        overlay.drawLine((self.centerOfTheMass[0],self.centerOfTheMass[1]-tr),(self.centerOfTheMass[0],self.centerOfTheMass[1]+tr),(0,0,255,0),2)
     
-    def drawTextMessages(self, frame: Frame) -> None:
+    def drawTextMessages(self, overlay: OverlayLayer) -> None:
         if self.centerOfTheMass:
             text_msg_params = TextImageParameters(
                 f"Center of the mass: {self.centerOfTheMass[0]} x {self.centerOfTheMass[1]}",
@@ -148,7 +156,7 @@ class FrameDrawer(QObject):
                 1,
                 (255,0,0)
                 )
-            self.drawText(frame, text_msg_params)
+            self.drawText(overlay, text_msg_params)
         if self.showIsRecording:
             text_msg_params = TextImageParameters(
                 f"Recording Frames",
@@ -157,7 +165,7 @@ class FrameDrawer(QObject):
                 1,
                 (255,0,0)
                 )
-            self.drawText(frame, text_msg_params)
+            self.drawText(overlay, text_msg_params)
         if self.showSoundDetected:
             text_msg_params = TextImageParameters(
                 f"Sound Detected...",
@@ -166,11 +174,11 @@ class FrameDrawer(QObject):
                 1,
                 (0,255,0)
                 )
-            self.drawText(frame, text_msg_params)
+            self.drawText(overlay, text_msg_params)
 
 
-    def drawText(self, frame: Frame, text_params: TextImageParameters) -> None:
-        cv2.putText(frame, text_params.text, text_params.position,  cv2.FONT_HERSHEY_SIMPLEX, text_params.fontScale, text_params.color, text_params.thickness, cv2.LINE_AA)
+    def drawText(self, overlay: OverlayLayer, text_params: TextImageParameters) -> None:
+        overlay.drawText(text_params.text, text_params.position, text_params.fontScale, text_params.thickness, text_params.color)
 
     def clear_qeues(self) -> None:
         self.contoursForDrawing = None
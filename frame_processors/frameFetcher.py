@@ -16,6 +16,7 @@ class FrameFetcherSettings:
 
 class FrameFetcher(QObject):
     frameFetched = pyqtSignal(np.ndarray)
+    nativeFrameFetched = pyqtSignal(np.ndarray)
     frameResolutionFetched = pyqtSignal(tuple)
     noInputFoundError = pyqtSignal()
     frameFetchingRunntimeError = pyqtSignal(str)
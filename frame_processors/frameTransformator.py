@@ -281,25 +281,28 @@ class FrameTransformator(QObject):
         if not self.transforamtorEnabled:
             logger.info("Droping received frame !")
             return
-        grayed_frame = self.frameProcessor.transformImageToGrayscale(frame)
-        blured_frame = self.frameProcessor.applyGaussianBlurToImage(grayed_frame, self.settings.gausianBlurParams)
-        binarized_frame = self.backgroundSubstractor.applyBackgroundSubstraction(blured_frame)
-        eroded_frame = self.frameProcessor.applyErrosionToImage(binarized_frame, self.settings.erosionParams)
-        dilated_frame = self.frameProcessor.applyDilationToImage(eroded_frame, self.settings.dilationParams)
-        contour_info = self.contourCalculator.extractContours(dilated_frame, self.settings.min_contour_area)
+        contour_info, preview_frames = self.detectMovement(frame)
         movement_detected = False
         if contour_info:
             self.contoursFound.emit(contour_info)
             movement_detected = True
         self.movementInFrameDetected.emit(movement_detected)
         if self.sendPreviewFrames:
-            self.previewFramesReadyForDrawing.emit(
-                PreviewFrames(
-                    frame,
-                    blured_frame,
-                    binarized_frame,
-                    dilated_frame
-                ))
+            self.previewFramesReadyForDrawing.emit(preview_frames)
+
+    def detectMovement(self, frame: Frame) -> Tuple[Optional[ContoursInfo], PreviewFrames]:
+        grayed_frame = self.frameProcessor.transformImageToGrayscale(frame)
+        blured_frame = self.frameProcessor.applyGaussianBlurToImage(grayed_frame, self.settings.gausianBlurParams)
+        binarized_frame = self.backgroundSubstractor.applyBackgroundSubstraction(blured_frame)
+        eroded_frame = self.frameProcessor.applyErrosionToImage(binarized_frame, self.settings.erosionParams)
+        dilated_frame = self.frameProcessor.applyDilationToImage(eroded_frame, self.settings.dilationParams)
+        contour_info = self.contourCalculator.extractContours(dilated_frame, self.settings.min_contour_area)
+        return contour_info, PreviewFrames(
+            frame,
+            blured_frame,
+            binarized_frame,
+            dilated_frame
+        )
 
     # @pyqtSlot(bool)
     # def onBroadcastingInitialFrameToggled(self, broadcast_init_frame: bool) -> None:
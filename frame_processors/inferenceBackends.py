@@ -0,0 +1,222 @@
+import argparse
+import enum
+import logging
+import os
+import time
+from typing import Dict, List, Type
+from typing_extensions import Protocol
+import cv2
+import numpy as np
+
+try:
+    import onnxruntime
+except ImportError:
+    onnxruntime = None
+
+try:
+    from openvino.runtime import Core as OpenVinoCore
+except ImportError:
+    OpenVinoCore = None
+
+logger = logging.getLogger(__name__)
+
+# ONNX and OpenVINO models are expected to be exports of yolov4-tiny with a dynamic input size
+# and outputs in the same row layout as the darknet region layers: cx, cy, w, h, objectness, class scores.
+# Models with another layout are rejected when the backend is created.
+LABELS_PATH = "yolo/labels.txt"
+DARKNET_WEIGHTS_PATH = "yolo/yolov4-tiny.weights"
+DARKNET_CONFIG_PATH = "yolo/yolov4-tiny.cfg"
+ONNX_MODEL_PATH = "yolo/yolov4-tiny.onnx"
+ONNX_INT8_MODEL_PATH = "yolo/yolov4-tiny-int8.onnx"
+OPENVINO_MODEL_PATH = "yolo/yolov4-tiny.xml"
+
+SUPPORTED_INPUT_SIZES = [256, 320, 416]
+BENCHMARK_WARMUP_RUNS = 2
+BENCHMARK_RUNS = 10
+
+class UnsupportedModelError(Exception):
+    pass
+
+class InferenceBackendType(enum.Enum):
+    AUTO = "auto"
+    OPENCV_DNN = "opencv"
+    ONNX_RUNTIME = "onnxruntime"
+    ONNX_RUNTIME_INT8 = "onnxruntime_int8"
+    OPENVINO = "openvino"
+
+class InferenceBackend(Protocol):
+    name: str
+    inputSize: int
+
+    def __init__(self, inputSize: int) -> None:
+        ...
+
+    @classmethod
+    def isAvailable(cls) -> bool:
+        ...
+
+    def forward(self, blob: np.ndarray) -> List[np.ndarray]:
+        ...
+
+class OpenCVDnnBackend:
+    name = InferenceBackendType.OPENCV_DNN.value
+
+    def __init__(self, inputSize: int) -> None:
+        self.inputSize = inputSize
+        self.net = cv2.dnn.readNet(DARKNET_WEIGHTS_PATH, DARKNET_CONFIG_PATH)
+        self.net.setPreferableBackend(cv2.dnn.DNN_BACKEND_OPENCV)
+        self.net.setPreferableTarget(cv2.dnn.DNN_TARGET_CPU)
+        layerNames = self.net.getLayerNames()
+        self.outputLayers = [layerNames[i - 1] for i in np.asarray(self.net.getUnconnectedOutLayers()).reshape(-1)]
+
+    @classmethod
+    def isAvailable(cls) -> bool:
+        return os.path.exists(DARKNET_WEIGHTS_PATH) and os.path.exists(DARKNET_CONFIG_PATH)
+
+    def forward(self, blob: np.ndarray) -> List[np.ndarray]:
+        self.net.setInput(blob)
+        return self.net.forward(self.outputLayers)
+
+class OnnxRuntimeBackend:
+    name = InferenceBackendType.ONNX_RUNTIME.value
+    modelPath = ONNX_MODEL_PATH
+
+    def __init__(self, inputSize: int) -> None:
+        self.inputSize = inputSize
+        sessionOptions = onnxruntime.SessionOptions()
+        sessionOptions.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = onnxruntime.InferenceSession(self.modelPath, sessionOptions, providers = ["CPUExecutionProvider"])
+        self.inputName = self.session.get_inputs()[0].name
+        validateOutputLayout(self)
+
+    @classmethod
+    def isAvailable(cls) -> bool:
+        return onnxruntime is not None and os.path.exists(cls.modelPath)
+
+    def forward(self, blob: np.ndarray) -> List[np.ndarray]:
+        return self.session.run(None, {self.inputName: blob})
+
+class OnnxRuntimeInt8Backend(OnnxRuntimeBackend):
+    name = InferenceBackendType.ONNX_RUNTIME_INT8.value
+    modelPath = ONNX_INT8_MODEL_PATH
+
+class OpenVinoBackend:
+    name = InferenceBackendType.OPENVINO.value
+
+    def __init__(self, inputSize: int) -> None:
+        self.inputSize = inputSize
+        core = OpenVinoCore()
+        model = core.read_model(self.getModelPath())
+        # Dynamic batch dimension, motion regions are passed through the network as one batch
+        model.reshape([-1, 3, inputSize, inputSize])
+        self.compiledModel = core.compile_model(model, "CPU")
+        validateOutputLayout(self)
+
+    @classmethod
+    def getModelPath(cls) -> str:
+        return OPENVINO_MODEL_PATH if os.path.exists(OPENVINO_MODEL_PATH) else ONNX_MODEL_PATH
+
+    @classmethod
+    def isAvailable(cls) -> bool:
+        return OpenVinoCore is not None and os.path.exists(cls.getModelPath())
+
+    def forward(self, blob: np.ndarray) -> List[np.ndarray]:
+        results = self.compiledModel([blob])
+        return [results[output] for output in self.compiledModel.outputs]
+
+class InferenceBackendFactory:
+
+    backends: Dict[InferenceBackendType, Type[InferenceBackend]] = {
+        InferenceBackendType.OPENCV_DNN: OpenCVDnnBackend,
+        InferenceBackendType.ONNX_RUNTIME: OnnxRuntimeBackend,
+        InferenceBackendType.ONNX_RUNTIME_INT8: OnnxRuntimeInt8Backend,
+        InferenceBackendType.OPENVINO: OpenVinoBackend
+    }
+
+    @classmethod
+    def getAvailableBackendTypes(cls) -> List[InferenceBackendType]:
+        return [backendType for backendType, backend in cls.backends.items() if backend.isAvailable()]
+
+    @classmethod
+    def createBackend(cls, backendType: InferenceBackendType, inputSize: int) -> InferenceBackend:
+        if backendType == InferenceBackendType.AUTO:
+            return cls.createFastestBackend(inputSize)
+        backend = cls.backends[backendType]
+        if not backend.isAvailable():
+            logger.warning("Inference backend %s is not available, falling back to %s", backendType.value, InferenceBackendType.OPENCV_DNN.value)
+            return OpenCVDnnBackend(inputSize)
+        try:
+            return backend(inputSize)
+        except UnsupportedModelError as e:
+            logger.warning("Inference backend %s rejected, falling back to %s: %s", backendType.value, InferenceBackendType.OPENCV_DNN.value, e)
+            return OpenCVDnnBackend(inputSize)
+
+    @classmethod
+    def createFastestBackend(cls, inputSize: int) -> InferenceBackend:
+        benchmarkResults = cls.benchmarkBackends(inputSize)
+        if not benchmarkResults:
+            return OpenCVDnnBackend(inputSize)
+        fastest = min(benchmarkResults, key = lambda backendType: benchmarkResults[backendType]["medianMs"])
+        logger.info("Selected inference backend: %s (%.1f ms per frame)", fastest.value, benchmarkResults[fastest]["medianMs"])
+        return benchmarkResults[fastest]["backend"]
+
+    @classmethod
+    def benchmarkBackends(cls, inputSize: int) -> Dict[InferenceBackendType, Dict]:
+        results = {}
+        blob = np.random.uniform(0, 1, size = (1, 3, inputSize, inputSize)).astype(np.float32)
+        for backendType in cls.getAvailableBackendTypes():
+            try:
+                backend = cls.backends[backendType](inputSize)
+                results[backendType] = {"backend": backend, "medianMs": measureForwardTime(backend, blob)}
+                logger.info("Inference backend %s: %.1f ms per frame at %sx%s", backendType.value, results[backendType]["medianMs"], inputSize, inputSize)
+            except UnsupportedModelError as e:
+                logger.warning("Inference backend %s rejected: %s", backendType.value, e)
+            except Exception as e:
+                logger.warning("Benchmark of inference backend %s failed, error details: %s", backendType.value, e)
+        return results
+
+def loadLabels() -> List[str]:
+    with open(LABELS_PATH) as labelsFile:
+        return labelsFile.read().strip().split("\n")
+
+def getExpectedOutputSize() -> int:
+    return 5 + len(loadLabels())
+
+def validateOutputLayout(backend: InferenceBackend) -> None:
+    # Output shapes of exported models are often dynamic, so they are checked on a real forward pass
+    blob = np.zeros((1, 3, backend.inputSize, backend.inputSize), dtype = np.float32)
+    outputSizes = [out.shape[-1] for out in backend.forward(blob)]
+    expectedSize = getExpectedOutputSize()
+    if any(size != expectedSize for size in outputSizes):
+        raise UnsupportedModelError(
+            f"model outputs end with {outputSizes} values per row, expected {expectedSize} "
+            f"(cx, cy, w, h, objectness and one score per label in {LABELS_PATH})"
+        )
+
+def measureForwardTime(backend: InferenceBackend, blob: np.ndarray) -> float:
+    for _ in range(BENCHMARK_WARMUP_RUNS):
+        backend.forward(blob)
+    timings = []
+    for _ in range(BENCHMARK_RUNS):
+        start = time.perf_counter()
+        backend.forward(blob)
+        timings.append(1000 * (time.perf_counter() - start))
+    return float(np.median(timings))
+
+def quantizeOnnxModel(sourcePath: str = ONNX_MODEL_PATH, destinationPath: str = ONNX_INT8_MODEL_PATH) -> None:
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    quantize_dynamic(sourcePath, destinationPath, weight_type = QuantType.QInt8)
+    logger.info("Quantized model stored in: %s", destinationPath)
+
+def main():
+    logging.basicConfig(level = logging.INFO)
+    parser = argparse.ArgumentParser(description = "Benchmark the available object detection backends")
+    parser.add_argument("--quantize", action = "store_true", help = f"Create {ONNX_INT8_MODEL_PATH} from {ONNX_MODEL_PATH} before benchmarking")
+    args = parser.parse_args()
+    if args.quantize:
+        quantizeOnnxModel()
+    for inputSize in SUPPORTED_INPUT_SIZES:
+        InferenceBackendFactory.benchmarkBackends(inputSize)
+
+if __name__ == "__main__":
+    main()
@@ -1,92 +1,408 @@
-from dataclasses import dataclass
-from typing import Dict, List
+from dataclasses import dataclass, field
+import time
+from typing import Dict, List, Optional, Tuple
 import cv2
 import numpy as np
-from utils import Frame
+from frame_processors.frameTransformator import ContoursInfo
+from frame_processors.detectionProfiler import DetectionProfiler, formatProfilingSummary, getOpenCVLayerTimings
+from frame_processors.detectionTracker import MotionBlobBoxTracker
+from frame_processors.inferenceBackends import InferenceBackend, InferenceBackendFactory, InferenceBackendType, OpenCVDnnBackend, loadLabels
+from utils import Frame, Region
 import logging
-from PyQt5.QtCore import QObject, pyqtSignal, pyqtSlot, QMutex, QMutexLocker
+from PyQt5.QtCore import QObject, Qt, pyqtSignal, pyqtSlot, QMutex, QMutexLocker
 
 logger = logging.getLogger(__name__)
 
+STATS_REPORT_INTERVAL = 10
+ROI_PADDING = 30
+ROI_FULL_FRAME_AREA_RATIO = 0.6
+LAYER_TIMINGS_LOGGED = 15
+
 @dataclass
 class ObjectDetectionSettings:
     confidenceThreshold:float = 0.5
     detectionEnabled:bool = False
+    roiInferenceEnabled:bool = False
+    detectionInterval:int = 1
+    maxDetectionRate:float = 0
+    inferenceBackend:InferenceBackendType = InferenceBackendType.OPENCV_DNN
+    inputSize:int = 320
+    allowedLabels:List[str] = field(default_factory=list)
+    classConfidenceThresholds:Dict[str, float] = field(default_factory=dict)
+    profilingEnabled:bool = False
+
+def mergeMotionRegions(regions: List[Region], padding: int, frameWidth: int, frameHeight: int) -> List[Region]:
+    merged = []
+    for x, y, w, h in regions:
+        merged.append([max(x - padding, 0), max(y - padding, 0), min(x + w + padding, frameWidth), min(y + h + padding, frameHeight)])
+    mergeHappened = True
+    while mergeHappened:
+        mergeHappened = False
+        for i in range(len(merged)):
+            for j in range(i + 1, len(merged)):
+                a, b = merged[i], merged[j]
+                if a[0] <= b[2] and b[0] <= a[2] and a[1] <= b[3] and b[1] <= a[3]:
+                    merged[i] = [min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3])]
+                    del merged[j]
+                    mergeHappened = True
+                    break
+            if mergeHappened:
+                break
+    return [(x1, y1, x2 - x1, y2 - y1) for x1, y1, x2, y2 in merged]
+
+class DetectionStats:
+    def __init__(self) -> None:
+        self.reset()
+
+    def reset(self) -> None:
+        self.periodStart = time.monotonic()
+        self.framesReceived = 0
+        self.framesSkipped = 0
+        self.inferencesDone = 0
+        self.framesTracked = 0
+        self.inferenceTimeSum = 0.0
+        self.queueAgeSum = 0.0
+        self.queueAgeMax = 0.0
+
+    def addInference(self, queueAge: float, inferenceTime: float) -> None:
+        self.inferencesDone += 1
+        self.inferenceTimeSum += inferenceTime
+        self.queueAgeSum += queueAge
+        self.queueAgeMax = max(self.queueAgeMax, queueAge)
+
+    def isReportDue(self) -> bool:
+        return time.monotonic() - self.periodStart >= STATS_REPORT_INTERVAL
+
+    def toDict(self) -> Dict:
+        elapsed = max(time.monotonic() - self.periodStart, 1e-6)
+        inferences = max(self.inferencesDone, 1)
+        return {
+            "inferenceFps": self.inferencesDone / elapsed,
+            "avgInferenceTimeMs": 1000 * self.inferenceTimeSum / inferences,
+            "avgQueueAgeMs": 1000 * self.queueAgeSum / inferences,
+            "maxQueueAgeMs": 1000 * self.queueAgeMax,
+            "framesTracked": self.framesTracked,
+            "framesReceived": self.framesReceived,
+            "framesSkipped": self.framesSkipped
+        }
 
 class ObjectDetector(QObject):
     objectsInFrameDetected = pyqtSignal(list)
+    detectionStatsUpdated = pyqtSignal(dict)
+    newFrameAvailable = pyqtSignal()
+    modelLoadingToggled = pyqtSignal(bool)
+    modelLoadingStarted = pyqtSignal()
+    modelReady = pyqtSignal(bool)
+    modelLoadingFailed = pyqtSignal(str)
+    layerTimingsDumped = pyqtSignal(list)
     def __init__(self, detectionParams: ObjectDetectionSettings):
         super().__init__()
         self.detectionParams = detectionParams
         self.detectionTriggered = False
         self.__nmsThreshold = 0.4
-        self.__labels = open("yolo/labels.txt").read().strip().split("\n")
-        self.__colors = np.random.uniform(0, 255, size=(len(self.__labels), 3))
-        self.net = cv2.dnn.readNet("yolo/yolov4-tiny.weights", "yolo/yolov4-tiny.cfg")
-        self.__ln = self.net.getLayerNames()
-        self.__ln = [self.__ln[i[0] - 1] for i in self.net.getUnconnectedOutLayers()]
+        self.__labels: List[str] = []
+        self.__colors: Optional[np.ndarray] = None
+        self.backend: Optional[InferenceBackend] = None
+        self.classFilterKey: Optional[Tuple[ObjectDetectionSettings, Tuple[str, ...]]] = None
+        self.classFilter: Tuple[np.ndarray, np.ndarray] = (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32))
         self.detectionParamsMutex = QMutex()
         self.detectionTriggeredMutex = QMutex()
+        self.latestFrameMutex = QMutex()
+        self.latestFrame: Optional[Frame] = None
+        self.latestFrameTimestamp = 0.0
+        self.stats = DetectionStats()
+        self.profiler = DetectionProfiler(detectionParams.profilingEnabled)
+        self.layerTimingsDumpRequested = False
+        self.motionRegionsMutex = QMutex()
+        self.motionRegions: List[Region] = []
+        self.boxTracker = MotionBlobBoxTracker()
+        self.inferenceRequired = True
+        self.framesSinceInference = 0
+        self.lastInferenceTimestamp = 0.0
+        self.newFrameAvailable.connect(self.onNewFrameAvailable, Qt.QueuedConnection)
+        self.modelLoadingToggled.connect(self.onModelLoadingToggled, Qt.QueuedConnection)
+
+    @pyqtSlot()
+    def onStart(self) -> None:
+        if self.getDetectionParams().detectionEnabled:
+            self.loadModel()
+
+    @pyqtSlot(bool)
+    def onModelLoadingToggled(self, load: bool) -> None:
+        if load:
+            self.loadModel()
+        else:
+            self.unloadModel()
+
+    def loadModel(self) -> None:
+        if self.isModelLoaded():
+            return
+        params = self.getDetectionParams()
+        logger.info("Loading object detection model, backend: %s, input size: %s", params.inferenceBackend.value, params.inputSize)
+        self.modelLoadingStarted.emit()
+        loadingStart = time.monotonic()
+        try:
+            self.__labels = loadLabels()
+            self.__colors = np.random.uniform(0, 255, size=(len(self.__labels), 3))
+            self.classFilterKey = None
+            backend = InferenceBackendFactory.createBackend(params.inferenceBackend, params.inputSize)
+        except Exception as e:
+            logger.error("Could not load object detection model, error details: %s", e)
+            self.modelReady.emit(False)
+            self.modelLoadingFailed.emit(str(e))
+            return
+        self.backend = backend
+        logger.info("Object detection model loaded in %.2f s, using backend: %s", time.monotonic() - loadingStart, backend.name)
+        self.modelReady.emit(True)
+
+    def unloadModel(self) -> None:
+        if not self.isModelLoaded():
+            return
+        self.backend = None
+        self.boxTracker.reset([], [])
+        logger.info("Object detection model unloaded")
+        self.modelReady.emit(False)
+
+    def isModelLoaded(self) -> bool:
+        return self.backend is not None
     
     def get_prediction_for_frame(self, frame: Frame, filter_labels = None) -> List[Dict]:
         height, width, channels = frame.shape
-        # Detecting objects
-        blob = cv2.dnn.blobFromImage(frame, 0.00392, (320, 320), (0, 0, 0), True, crop=False)
-        self.net.setInput(blob)
-        outs = self.net.forward(self.__ln)
-        class_ids = []
-        confidences = []
-        boxes = []
-        confidence_threshold = self.getDetectionParams().confidenceThreshold
-        for out in outs:
-            for detection in out:
-                scores = detection[5:]
-                class_id = np.argmax(scores)
-                confidence = scores[class_id]
-                if confidence > confidence_threshold:
-                    # Object detected
-                    center_x = int(detection[0] * width)
-                    center_y = int(detection[1] * height)
-                    w = int(detection[2] * width)
-                    h = int(detection[3] * height)
-                    # Rectangle coordinates
-                    x = int(center_x - w / 2)
-                    y = int(center_y - h / 2)
-                    boxes.append([x, y, w, h])
-                    confidences.append(float(confidence))
-                    class_ids.append(class_id)
-        idxs = cv2.dnn.NMSBoxes(boxes, confidences, confidence_threshold, self.__nmsThreshold)
+        return self.get_prediction_for_regions(frame, [(0, 0, width, height)], filter_labels)
+
+    def get_prediction_for_regions(self, frame: Frame, regions: List[Region], filter_labels = None) -> List[Dict]:
+        # Detecting objects, all regions are passed through the network as a single batch
+        crops = [frame[y:y + h, x:x + w] for x, y, w, h in regions]
+        inputSize = self.backend.inputSize
+        with self.profiler.measure("blobFromImage"):
+            blob = cv2.dnn.blobFromImages(crops, 0.00392, (inputSize, inputSize), (0, 0, 0), True, crop=False)
+        with self.profiler.measure("forward"):
+            outs = self.backend.forward(blob)
+        if self.layerTimingsDumpRequested:
+            self.dumpLayerTimings()
+        with self.profiler.measure("decode"):
+            allowed_class_ids, class_thresholds = self.get_class_filter(filter_labels)
+            decoded = []
+            for index, (x, y, w, h) in enumerate(regions):
+                region_outs = [self.get_outputs_for_image(out, index, len(regions)) for out in outs]
+                boxes, confidences, class_ids = self.decode_outputs(region_outs, w, h, allowed_class_ids, class_thresholds)
+                boxes[:, :2] += (x, y)
+                decoded.append((boxes, confidences, class_ids))
+            boxes = np.concatenate([d[0] for d in decoded])
+            confidences = np.concatenate([d[1] for d in decoded])
+            class_ids = np.concatenate([d[2] for d in decoded])
+        if len(boxes) == 0:
+            return []
+        # Confidences are already thresholded per class during decoding
+        with self.profiler.measure("NMSBoxes"):
+            idxs = cv2.dnn.NMSBoxes(boxes.tolist(), confidences.tolist(), 0.0, self.__nmsThreshold)
         detected_objs = []
-        for i in range(len(boxes)):
-            if i in idxs:
-                x, y, w, h = boxes[i]
-                label = str(self.__labels[class_ids[i]])
-                color = self.__colors[i]
-                detected_objs.append({
-                    "x":x,
-                    "y":y,
-                    "w":w,
-                    "h":h,
-                    "color": color,
-                    "label": label,
-                    "confidence": confidences[i]
-                })
+        for i in np.asarray(idxs, dtype=np.int64).reshape(-1):
+            x, y, w, h = boxes[i].tolist()
+            detected_objs.append({
+                "x":x,
+                "y":y,
+                "w":w,
+                "h":h,
+                "color": self.__colors[class_ids[i]],
+                "label": str(self.__labels[class_ids[i]]),
+                "confidence": float(confidences[i])
+            })
         return detected_objs
+
+    @pyqtSlot()
+    def requestLayerTimingsDump(self) -> None:
+        # Layer timings are read from the network after the next forward pass, on the detection thread
+        self.layerTimingsDumpRequested = True
+
+    def dumpLayerTimings(self) -> None:
+        self.layerTimingsDumpRequested = False
+        if not isinstance(self.backend, OpenCVDnnBackend):
+            logger.warning("Layer timings are available only for the %s inference backend", InferenceBackendType.OPENCV_DNN.value)
+            self.layerTimingsDumped.emit([])
+            return
+        layerTimings = getOpenCVLayerTimings(self.backend.net)
+        logger.info(
+            "OpenCV layer timings (slowest %s): %s",
+            LAYER_TIMINGS_LOGGED, ", ".join(f"{timing['layer']} {timing['timeMs']:.2f} ms" for timing in layerTimings[:LAYER_TIMINGS_LOGGED + 1])
+        )
+        self.layerTimingsDumped.emit(layerTimings)
+
+    def getProfilingSummary(self) -> Dict[str, Dict]:
+        return self.profiler.getSummary()
+
+    def get_outputs_for_image(self, out: np.ndarray, image_index: int, num_of_images: int) -> np.ndarray:
+        if out.ndim == 3:
+            return out[image_index]
+        return np.array_split(out, num_of_images)[image_index]
+
+    def get_class_filter(self, filter_labels: Optional[List[str]] = None) -> Tuple[np.ndarray, np.ndarray]:
+        params = self.getDetectionParams()
+        allowed_labels = tuple(filter_labels if filter_labels is not None else params.allowedLabels)
+        if self.classFilterKey is None or self.classFilterKey[0] is not params or self.classFilterKey[1] != allowed_labels:
+            class_ids = [i for i, label in enumerate(self.__labels) if not allowed_labels or label in allowed_labels]
+            unknown_labels = [label for label in allowed_labels if label not in self.__labels]
+            if unknown_labels:
+                logger.warning("Object classes not known to the model are ignored by the class filter: %s", ", ".join(unknown_labels))
+            if allowed_labels and not class_ids:
+                logger.warning("Class filter contains no known object classes, nothing will be detected")
+            thresholds = [params.classConfidenceThresholds.get(self.__labels[i], params.confidenceThreshold) for i in class_ids]
+            self.classFilter = (np.array(class_ids, dtype=np.int64), np.array(thresholds, dtype=np.float32))
+            self.classFilterKey = (params, allowed_labels)
+        return self.classFilter
+
+    def decode_outputs(self, outs: List[np.ndarray], width: int, height: int, allowed_class_ids: np.ndarray, class_thresholds: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        detections = np.concatenate([out.reshape(-1, out.shape[-1]) for out in outs])
+        if len(allowed_class_ids) == 0:
+            return np.empty((0, 4), dtype=np.int32), np.empty(0, dtype=np.float32), allowed_class_ids
+        # Only the columns of allowed classes take part in thresholding and NMS
+        scores = detections[:, 5:][:, allowed_class_ids]
+        best_columns = np.argmax(scores, axis=1)
+        confidences = scores[np.arange(len(scores)), best_columns]
+        mask = confidences > class_thresholds[best_columns]
+        detections = detections[mask]
+        # Rectangle coordinates from relative center, width and height
+        sizes = detections[:, 2:4] * (width, height)
+        top_left = detections[:, 0:2] * (width, height) - sizes / 2
+        boxes = np.hstack((top_left, sizes)).astype(np.int32)
+        return boxes, confidences[mask].astype(np.float32), allowed_class_ids[best_columns[mask]]
     
     @pyqtSlot(Frame)
     def onFrameReceived(self, frame:Frame) -> None:
-        if not self.getDetectionParams().detectionEnabled or not self.getDetectionTriggered():
+        # Called directly from the frame fetching thread, only the newest frame is kept for detection
+        if not self.getDetectionParams().detectionEnabled or not self.getDetectionTriggered() or not self.isModelLoaded():
             return
-        predictions = self.get_prediction_for_frame(frame)
+        with QMutexLocker(self.latestFrameMutex):
+            processingPending = self.latestFrame is not None
+            self.stats.framesReceived += 1
+            if processingPending:
+                self.stats.framesSkipped += 1
+            self.latestFrame = frame
+            self.latestFrameTimestamp = time.monotonic()
+        if not processingPending:
+            self.newFrameAvailable.emit()
+
+    @pyqtSlot()
+    def onNewFrameAvailable(self) -> None:
+        frame, frameTimestamp = self.takeLatestFrame()
+        if frame is None or not self.isModelLoaded():
+            return
+        inferenceStart = time.monotonic()
+        if not self.isInferenceDue(inferenceStart):
+            self.framesSinceInference += 1
+            self.objectsInFrameDetected.emit(self.boxTracker.update(self.getMotionRegions()))
+            with QMutexLocker(self.latestFrameMutex):
+                self.stats.framesTracked += 1
+            return
+        self.inferenceRequired = False
+        self.framesSinceInference = 0
+        self.lastInferenceTimestamp = inferenceStart
+        if self.getDetectionParams().roiInferenceEnabled:
+            regions = self.getInferenceRegions(frame)
+            if not regions:
+                self.boxTracker.reset([], [])
+                return
+            predictions = self.get_prediction_for_regions(frame, regions)
+        else:
+            predictions = self.get_prediction_for_frame(frame)
+        self.boxTracker.reset(predictions, self.getMotionRegions())
         self.objectsInFrameDetected.emit(predictions)
+        self.updateStats(inferenceStart - frameTimestamp, time.monotonic() - inferenceStart)
+
+    def isInferenceDue(self, now: float) -> bool:
+        params = self.getDetectionParams()
+        if self.inferenceRequired:
+            return True
+        if self.framesSinceInference + 1 < params.detectionInterval:
+            return False
+        if params.maxDetectionRate > 0 and now - self.lastInferenceTimestamp < 1 / params.maxDetectionRate:
+            return False
+        return True
+
+    def getMotionRegions(self) -> List[Region]:
+        with QMutexLocker(self.motionRegionsMutex):
+            return list(self.motionRegions)
+
+    def getInferenceRegions(self, frame: Frame) -> List[Region]:
+        height, width, channels = frame.shape
+        regions = mergeMotionRegions(self.getMotionRegions(), ROI_PADDING, width, height)
+        if sum(w * h for _, _, w, h in regions) >= ROI_FULL_FRAME_AREA_RATIO * width * height:
+            return [(0, 0, width, height)]
+        return regions
+
+    @pyqtSlot(ContoursInfo)
+    def onContoursReceived(self, contours_info: ContoursInfo) -> None:
+        regions = [cv2.boundingRect(contour) for contour in contours_info.contour_list]
+        with QMutexLocker(self.motionRegionsMutex):
+            self.motionRegions = regions
+
+    @pyqtSlot(bool)
+    def onMovementPresentToggled(self, movementPresent: bool) -> None:
+        if movementPresent:
+            return
+        with QMutexLocker(self.motionRegionsMutex):
+            self.motionRegions = []
+
+    def takeLatestFrame(self) -> Tuple[Optional[Frame], float]:
+        with QMutexLocker(self.latestFrameMutex):
+            frame, frameTimestamp = self.latestFrame, self.latestFrameTimestamp
+            self.latestFrame = None
+            return frame, frameTimestamp
+
+    def updateStats(self, queueAge: float, inferenceTime: float) -> None:
+        with QMutexLocker(self.latestFrameMutex):
+            self.stats.addInference(queueAge, inferenceTime)
+            if not self.stats.isReportDue():
+                return
+            stats = self.stats.toDict()
+            self.stats.reset()
+        logger.info(
+            "Object detection: %.1f inferences/s, avg inference %.1f ms, avg queue age %.1f ms, skipped %s of %s frames",
+            stats["inferenceFps"], stats["avgInferenceTimeMs"], stats["avgQueueAgeMs"], stats["framesSkipped"], stats["framesReceived"]
+        )
+        if self.profiler.enabled:
+            stats["stageTimings"] = self.profiler.getSummary()
+            self.profiler.reset()
+            logger.info("Object detection stages: %s", formatProfilingSummary(stats["stageTimings"]))
+        self.detectionStatsUpdated.emit(stats)
+
+    def getDetectionStats(self) -> Dict:
+        with QMutexLocker(self.latestFrameMutex):
+            return self.stats.toDict()
     
+    @classmethod
+    def getDetectionSettingsFromDict(cls, detectionSettings: Dict) -> ObjectDetectionSettings:
+        return ObjectDetectionSettings(
+            detectionSettings["confidenceThreshold"],
+            detectionSettings["detectionEnabled"],
+            detectionSettings["roiInferenceEnabled"],
+            detectionSettings["detectionInterval"],
+            detectionSettings["maxDetectionRate"],
+            InferenceBackendType(detectionSettings["inferenceBackend"]),
+            detectionSettings["inputSize"],
+            detectionSettings["allowedLabels"],
+            detectionSettings["classConfidenceThresholds"],
+            detectionSettings["profilingEnabled"]
+        )
+
     def getDetectionParams(self) -> ObjectDetectionSettings:
         with QMutexLocker(self.detectionParamsMutex):
             return self.detectionParams
     
     def setDetectionParams(self, detectionParams: ObjectDetectionSettings) -> None:
         with QMutexLocker(self.detectionParamsMutex):
+            detectionToggled = self.detectionParams.detectionEnabled != detectionParams.detectionEnabled
+            modelChanged = (
+                self.detectionParams.inferenceBackend != detectionParams.inferenceBackend or
+                self.detectionParams.inputSize != detectionParams.inputSize
+            )
             self.detectionParams = detectionParams
+        self.profiler.setEnabled(detectionParams.profilingEnabled)
+        if detectionToggled:
+            self.modelLoadingToggled.emit(detectionParams.detectionEnabled)
+        elif modelChanged and detectionParams.detectionEnabled:
+            self.modelLoadingToggled.emit(False)
+            self.modelLoadingToggled.emit(True)
     
     def getDetectionTriggered(self) -> bool:
         with QMutexLocker(self.detectionTriggeredMutex):
@@ -95,5 +411,7 @@ class ObjectDetector(QObject):
     def setDetectionTriggered(self, detectionTriggered: bool) -> None:
         with QMutexLocker(self.detectionTriggeredMutex):
             self.detectionTriggered = detectionTriggered
+            if detectionTriggered:
+                self.inferenceRequired = True
 
 
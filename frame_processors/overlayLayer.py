@@ -0,0 +1,100 @@
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import List, Tuple
+import cv2
+import numpy as np
+from utils import Contour, Frame, PointCoords, Region
+
+TEXT_FONT = cv2.FONT_HERSHEY_SIMPLEX
+TEXT_SPRITE_CACHE_SIZE = 256
+
+@dataclass(frozen=True)
+class TextSprite:
+    # Color premultiplied by the anti-aliased glyph alpha, and 255 - alpha, both cached with the sprite
+    premultipliedImage: np.ndarray
+    inverseAlpha: np.ndarray
+    baselineOffset: int
+
+@lru_cache(maxsize=TEXT_SPRITE_CACHE_SIZE)
+def renderTextSprite(text: str, fontScale: float, thickness: int, color: Tuple[int, ...]) -> TextSprite:
+    (w, h), baseline = cv2.getTextSize(text, TEXT_FONT, fontScale, thickness)
+    spriteHeight = h + baseline + thickness
+    alpha = np.zeros((spriteHeight, w + thickness), dtype=np.uint8)
+    cv2.putText(alpha, text, (0, h), TEXT_FONT, fontScale, 255, thickness, cv2.LINE_AA)
+    alpha = alpha[..., None].astype(np.uint16)
+    premultipliedImage = alpha * np.array(color[:3], dtype=np.uint16)
+    return TextSprite(premultipliedImage, 255 - alpha, h)
+
+def clipRegion(region: Region, frameWidth: int, frameHeight: int) -> Region:
+    x, y, w, h = region
+    x1, y1 = max(x, 0), max(y, 0)
+    x2, y2 = min(x + w, frameWidth), min(y + h, frameHeight)
+    return (x1, y1, max(x2 - x1, 0), max(y2 - y1, 0))
+
+class OverlayLayer:
+    def __init__(self) -> None:
+        self.shapes = np.zeros((0, 0, 3), dtype=np.uint8)
+        self.shapesMask = np.zeros((0, 0), dtype=np.uint8)
+        self.dirtyRegions: List[Region] = []
+        self.sprites: List[Tuple[TextSprite, PointCoords]] = []
+
+    def prepare(self, frameShape: Tuple[int, ...]) -> None:
+        if self.shapes.shape[:2] != frameShape[:2]:
+            self.shapes = np.zeros(frameShape[:2] + (3,), dtype=np.uint8)
+            self.shapesMask = np.zeros(frameShape[:2], dtype=np.uint8)
+            self.dirtyRegions.clear()
+
+    def isEmpty(self) -> bool:
+        return not self.dirtyRegions and not self.sprites
+
+    def drawRectangle(self, topLeft: PointCoords, bottomRight: PointCoords, color: Tuple[int, ...], thickness: int) -> None:
+        cv2.rectangle(self.shapes, topLeft, bottomRight, color, thickness)
+        cv2.rectangle(self.shapesMask, topLeft, bottomRight, 255, thickness)
+        self.markDirty(topLeft[0], topLeft[1], bottomRight[0] - topLeft[0], bottomRight[1] - topLeft[1], thickness)
+
+    def drawCircle(self, center: PointCoords, radius: int, color: Tuple[int, ...], thickness: int) -> None:
+        cv2.circle(self.shapes, center, radius, color, thickness)
+        cv2.circle(self.shapesMask, center, radius, 255, thickness)
+        self.markDirty(center[0] - radius, center[1] - radius, 2 * radius, 2 * radius, thickness)
+
+    def drawLine(self, start: PointCoords, end: PointCoords, color: Tuple[int, ...], thickness: int) -> None:
+        cv2.line(self.shapes, start, end, color, thickness)
+        cv2.line(self.shapesMask, start, end, 255, thickness)
+        self.markDirty(min(start[0], end[0]), min(start[1], end[1]), abs(end[0] - start[0]), abs(end[1] - start[1]), thickness)
+
+    def drawContour(self, contour: Contour, color: Tuple[int, ...], thickness: int) -> None:
+        cv2.drawContours(self.shapes, [contour], 0, color, thickness)
+        cv2.drawContours(self.shapesMask, [contour], 0, 255, thickness)
+        self.markDirty(*cv2.boundingRect(contour), thickness)
+
+    def drawText(self, text: str, position: PointCoords, fontScale: float, thickness: int, color: Tuple[int, ...]) -> None:
+        self.sprites.append((renderTextSprite(text, fontScale, thickness, tuple(color)), position))
+
+    def markDirty(self, x: int, y: int, w: int, h: int, thickness: int) -> None:
+        self.dirtyRegions.append((x - thickness, y - thickness, w + 2 * thickness + 1, h + 2 * thickness + 1))
+
+    def composeOnto(self, frame: Frame) -> None:
+        # Only the dirty regions are blended into the frame and cleared for the next one
+        frameHeight, frameWidth = frame.shape[:2]
+        for region in self.dirtyRegions:
+            x, y, w, h = clipRegion(region, frameWidth, frameHeight)
+            if w == 0 or h == 0:
+                continue
+            mask = self.shapesMask[y:y + h, x:x + w]
+            np.copyto(frame[y:y + h, x:x + w], self.shapes[y:y + h, x:x + w], where = mask[..., None] > 0)
+            mask[:] = 0
+        for sprite, (textX, textY) in self.sprites:
+            self.blitSprite(frame, sprite, textX, textY - sprite.baselineOffset)
+        self.dirtyRegions.clear()
+        self.sprites.clear()
+
+    def blitSprite(self, frame: Frame, sprite: TextSprite, x: int, y: int) -> None:
+        spriteHeight, spriteWidth = sprite.inverseAlpha.shape[:2]
+        cx, cy, w, h = clipRegion((x, y, spriteWidth, spriteHeight), frame.shape[1], frame.shape[0])
+        if w == 0 or h == 0:
+            return
+        sx, sy = cx - x, cy - y
+        # Alpha blended over the bounding box of the text only, which keeps the glyph edges anti-aliased
+        background = frame[cy:cy + h, cx:cx + w]
+        blended = sprite.premultipliedImage[sy:sy + h, sx:sx + w] + background * sprite.inverseAlpha[sy:sy + h, sx:sx + w]
+        background[:] = (blended + 127) // 255
@@ -0,0 +1,48 @@
+import logging
+from typing import Any, Dict, Optional
+from PyQt5.QtCore import QObject
+from h264StreamEncoder import EncodedPacket, H264StreamEncoder
+from networkStreamingClient import MAX_PENDING_BYTES, NetworkStreamingClient
+from streamProtocol import MessageFlag, MessageType
+
+logger = logging.getLogger(__name__)
+
+class H264NetworkStreamer(NetworkStreamingClient):
+    def __init__(self, client_socket_handle: Any, streamEncoder: H264StreamEncoder, parent: Optional[QObject] = None) -> None:
+        super().__init__(client_socket_handle, parent)
+        self.streamEncoder = streamEncoder
+        self.waitingForKeyframe = True
+
+    def startStreaming(self) -> None:
+        self.waitingForKeyframe = True
+        self.streamEncoder.subscribe()
+        self.isStreaming = True
+
+    def stopStreaming(self) -> None:
+        if self.isStreaming:
+            self.isStreaming = False
+            self.streamEncoder.unsubscribe()
+
+    def getStreamDescription(self) -> Dict:
+        return self.streamEncoder.getStreamDescription()
+
+    def selectProfile(self, profileName: str) -> None:
+        logger.warning("Streaming client: %s requested stream profile: %s, the H.264 stream has a single profile", self.id, profileName)
+
+    def onPacketEncoded(self, encodedPacket: EncodedPacket) -> None:
+        # Packets depend on each other, so they are written as soon as they are encoded and never rate limited
+        if not self.isStreaming:
+            return
+        if self.waitingForKeyframe and not encodedPacket.isKeyframe:
+            self.countSkippedFrame()
+            return
+        if self.updatePendingBytes() > MAX_PENDING_BYTES:
+            # Dropping a packet breaks the references of the following ones, the client resumes from the next keyframe
+            self.waitingForKeyframe = True
+            self.streamEncoder.requestKeyframe()
+            self.countSkippedFrame()
+            return
+        self.waitingForKeyframe = False
+        flags = MessageFlag.KEYFRAME if encodedPacket.isKeyframe else MessageFlag.NONE
+        bytes_written = self.writeMessage(MessageType.FRAME, encodedPacket.sequence, encodedPacket.timestamp, encodedPacket.payload, flags)
+        self.countSentFrame(bytes_written)
@@ -0,0 +1,146 @@
+from dataclasses import dataclass
+import fractions
+import logging
+import time
+from typing import Dict, Optional
+from PyQt5.QtCore import QMutex, QMutexLocker, QObject, Qt, pyqtSignal, pyqtSlot
+from utils import Frame
+
+try:
+    import av
+except ImportError:
+    av = None
+
+logger = logging.getLogger(__name__)
+
+H264_CODEC_NAME = "libx264"
+H264_PRESET = "ultrafast"
+H264_FRAME_RATE = 30
+# Frame timestamps are passed to the encoder in milliseconds
+H264_TIME_BASE = fractions.Fraction(1, 1000)
+
+def isH264EncodingAvailable() -> bool:
+    if av is None:
+        return False
+    try:
+        av.codec.Codec(H264_CODEC_NAME, "w")
+    except Exception:
+        return False
+    return True
+
+@dataclass
+class H264StreamSettings:
+    bitrateKbps: int
+    gop: int
+
+@dataclass(frozen=True)
+class EncodedPacket:
+    width: int
+    height: int
+    timestamp: float
+    sequence: int
+    isKeyframe: bool
+    # Annex-B byte stream of one frame, keyframes carry SPS and PPS in band
+    payload: bytes
+
+class H264StreamEncoder(QObject):
+    packetEncoded = pyqtSignal(EncodedPacket)
+    newFrameAvailable = pyqtSignal()
+
+    def __init__(self, settings: H264StreamSettings) -> None:
+        super().__init__()
+        self.settings = settings
+        self.latestFrameMutex = QMutex()
+        self.latestFrame: Optional[Frame] = None
+        self.latestFrameTimestamp = 0.0
+        self.frameSequence = 0
+        self.subscribersMutex = QMutex()
+        self.subscribers = 0
+        self.keyframeRequested = False
+        self.codecContext = None
+        self.startTimestamp = 0.0
+        self.newFrameAvailable.connect(self.onNewFrameAvailable, Qt.QueuedConnection)
+
+    def subscribe(self) -> None:
+        with QMutexLocker(self.subscribersMutex):
+            self.subscribers += 1
+            # A new client can only start decoding from a keyframe
+            self.keyframeRequested = True
+
+    def unsubscribe(self) -> None:
+        with QMutexLocker(self.subscribersMutex):
+            self.subscribers = max(self.subscribers - 1, 0)
+
+    def hasSubscribers(self) -> bool:
+        with QMutexLocker(self.subscribersMutex):
+            return self.subscribers > 0
+
+    def requestKeyframe(self) -> None:
+        with QMutexLocker(self.subscribersMutex):
+            self.keyframeRequested = True
+
+    def takeKeyframeRequest(self) -> bool:
+        with QMutexLocker(self.subscribersMutex):
+            keyframeRequested = self.keyframeRequested
+            self.keyframeRequested = False
+            return keyframeRequested
+
+    def getStreamDescription(self) -> Dict:
+        return {"codec": "h264", "targetBitrateKbps": self.settings.bitrateKbps, "gop": self.settings.gop}
+
+    @pyqtSlot(Frame)
+    def onFrameReceived(self, frame: Frame) -> None:
+        # Called directly from the producing thread, only the newest frame waits for encoding
+        if not self.hasSubscribers():
+            return
+        with QMutexLocker(self.latestFrameMutex):
+            encodingPending = self.latestFrame is not None
+            self.latestFrame = frame
+            self.latestFrameTimestamp = time.time()
+        if not encodingPending:
+            self.newFrameAvailable.emit()
+
+    @pyqtSlot()
+    def onNewFrameAvailable(self) -> None:
+        with QMutexLocker(self.latestFrameMutex):
+            frame = self.latestFrame
+            timestamp = self.latestFrameTimestamp
+            self.latestFrame = None
+        if frame is None:
+            return
+        if not self.hasSubscribers():
+            # The encoder is released while nobody watches, the next client starts a fresh stream
+            self.codecContext = None
+            return
+        # yuv420p needs even dimensions
+        height, width = frame.shape[0] & ~1, frame.shape[1] & ~1
+        frame = frame[:height, :width]
+        if self.codecContext is None or (self.codecContext.width, self.codecContext.height) != (width, height):
+            self.openCodecContext(width, height, timestamp)
+        videoFrame = av.VideoFrame.from_ndarray(frame, format = "bgr24")
+        videoFrame.pts = int(1000 * (timestamp - self.startTimestamp))
+        if self.takeKeyframeRequest():
+            videoFrame.pict_type = av.video.frame.PictureType.I
+        try:
+            packets = self.codecContext.encode(videoFrame)
+        except Exception as e:
+            logger.warning("Frame could not be encoded for H.264 streaming, error details: %s", e)
+            self.codecContext = None
+            return
+        for packet in packets:
+            self.frameSequence += 1
+            self.packetEncoded.emit(EncodedPacket(width, height, timestamp, self.frameSequence, packet.is_keyframe, bytes(packet)))
+
+    def openCodecContext(self, width: int, height: int, startTimestamp: float) -> None:
+        self.codecContext = av.CodecContext.create(H264_CODEC_NAME, "w")
+        self.codecContext.width = width
+        self.codecContext.height = height
+        self.codecContext.pix_fmt = "yuv420p"
+        self.codecContext.time_base = H264_TIME_BASE
+        self.codecContext.framerate = fractions.Fraction(H264_FRAME_RATE, 1)
+        self.codecContext.bit_rate = 1000 * self.settings.bitrateKbps
+        self.codecContext.gop_size = self.settings.gop
+        self.codecContext.options = {"preset": H264_PRESET, "tune": "zerolatency"}
+        self.startTimestamp = startTimestamp
+        self.requestKeyframe()
+        logger.info("Opened H.264 stream encoder at %sx%s, %s kbps, GOP %s", width, height, self.settings.bitrateKbps, self.settings.gop)
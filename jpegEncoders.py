@@ -0,0 +1,104 @@
+import enum
+import logging
+import os
+from typing import Dict, List, Type
+from typing_extensions import Protocol
+import cv2
+from utils import Frame
+
+try:
+    from turbojpeg import TJPF_BGR, TJSAMP_420, TJSAMP_422, TJSAMP_444, TurboJPEG
+except ImportError:
+    TurboJPEG = None
+
+logger = logging.getLogger(__name__)
+
+# cv2.imencode and libjpeg-turbo release the GIL, so encoding scales with the number of cores
+JPEG_ENCODING_WORKERS = min(4, os.cpu_count() or 1)
+
+class JpegEncoderType(enum.Enum):
+    OPENCV = "opencv"
+    TURBOJPEG = "turbojpeg"
+
+class ChromaSubsampling(enum.Enum):
+    SUBSAMPLING_444 = "444"
+    SUBSAMPLING_422 = "422"
+    SUBSAMPLING_420 = "420"
+
+class JpegEncoder(Protocol):
+    name: str
+
+    def __init__(self, chromaSubsampling: ChromaSubsampling) -> None:
+        ...
+
+    @classmethod
+    def isAvailable(cls) -> bool:
+        ...
+
+    def encode(self, frame: Frame, jpegQuality: int) -> bytes:
+        ...
+
+class OpenCVJpegEncoder:
+    name = JpegEncoderType.OPENCV.value
+
+    def __init__(self, chromaSubsampling: ChromaSubsampling) -> None:
+        self.extraParams: List[int] = []
+        # Chroma subsampling can only be chosen with OpenCV 4.7 and newer, older versions always use 4:2:0
+        if hasattr(cv2, "IMWRITE_JPEG_SAMPLING_FACTOR"):
+            samplingFactors = {
+                ChromaSubsampling.SUBSAMPLING_444: cv2.IMWRITE_JPEG_SAMPLING_FACTOR_444,
+                ChromaSubsampling.SUBSAMPLING_422: cv2.IMWRITE_JPEG_SAMPLING_FACTOR_422,
+                ChromaSubsampling.SUBSAMPLING_420: cv2.IMWRITE_JPEG_SAMPLING_FACTOR_420
+            }
+            self.extraParams = [cv2.IMWRITE_JPEG_SAMPLING_FACTOR, samplingFactors[chromaSubsampling]]
+
+    @classmethod
+    def isAvailable(cls) -> bool:
+        return True
+
+    def encode(self, frame: Frame, jpegQuality: int) -> bytes:
+        isEncoded, encoded = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, jpegQuality] + self.extraParams)
+        if not isEncoded:
+            logger.warning("Frame could not be encoded for streaming")
+            return b""
+        return encoded.tobytes()
+
+class TurboJpegEncoder:
+    name = JpegEncoderType.TURBOJPEG.value
+
+    def __init__(self, chromaSubsampling: ChromaSubsampling) -> None:
+        self.turboJpeg = TurboJPEG()
+        self.subsampling = {
+            ChromaSubsampling.SUBSAMPLING_444: TJSAMP_444,
+            ChromaSubsampling.SUBSAMPLING_422: TJSAMP_422,
+            ChromaSubsampling.SUBSAMPLING_420: TJSAMP_420
+        }[chromaSubsampling]
+
+    @classmethod
+    def isAvailable(cls) -> bool:
+        if TurboJPEG is None:
+            return False
+        try:
+            TurboJPEG()
+        except Exception:
+            return False
+        return True
+
+    def encode(self, frame: Frame, jpegQuality: int) -> bytes:
+        return self.turboJpeg.encode(frame, quality = jpegQuality, pixel_format = TJPF_BGR, jpeg_subsample = self.subsampling)
+
+class JpegEncoderFactory:
+
+    encoders: Dict[JpegEncoderType, Type[JpegEncoder]] = {
+        JpegEncoderType.OPENCV: OpenCVJpegEncoder,
+        JpegEncoderType.TURBOJPEG: TurboJpegEncoder
+    }
+
+    @classmethod
+    def createJpegEncoder(cls, encoderType: JpegEncoderType, chromaSubsampling: ChromaSubsampling) -> JpegEncoder:
+        encoder = cls.encoders[encoderType]
+        if not encoder.isAvailable():
+            logger.warning("JPEG encoder %s is not available, falling back to %s", encoderType.value, JpegEncoderType.OPENCV.value)
+            encoder = OpenCVJpegEncoder
+        logger.info("Using JPEG encoder %s with %s chroma subsampling", encoder.name, chromaSubsampling.value)
+        return encoder(chromaSubsampling)
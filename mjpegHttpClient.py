@@ -0,0 +1,106 @@
+from email.utils import formatdate
+import logging
+from typing import Any, Optional
+from urllib.parse import parse_qs, urlsplit
+from PyQt5.QtCore import QObject, pyqtSlot
+from frameStreamEncoder import STREAM_PROFILES, EncodedFrame, FrameStreamEncoder
+from frameToNetworkStreamer import FrameToNetworkStreamer
+from streamMetadata import StreamEvent
+
+logger = logging.getLogger(__name__)
+
+MJPEG_BOUNDARY = b"frame"
+MJPEG_STREAM_PATHS = ["/", "/stream.mjpg"]
+SNAPSHOT_PATH = "/snapshot.jpg"
+MAX_REQUEST_HEADER_SIZE = 8192
+
+class MjpegHttpClient(FrameToNetworkStreamer):
+    def __init__(
+        self,
+        client_socket_handle: Any,
+        streamEncoder: FrameStreamEncoder,
+        parent: Optional[QObject] = None,
+        maxFrameRate: float = 0
+        ) -> None:
+        super().__init__(client_socket_handle, streamEncoder, parent = parent, maxFrameRate = maxFrameRate)
+        self.requestData = b""
+        self.requestReceived = False
+
+    def sendHello(self) -> None:
+        pass
+
+    def sendEvent(self, event: StreamEvent) -> None:
+        pass
+
+    def startStreaming(self) -> None:
+        # Nothing is sent before the HTTP request tells what the client wants
+        pass
+
+    @pyqtSlot()
+    def onDataReceived(self) -> None:
+        if self.requestReceived:
+            self.getSocket().readAll()
+            return
+        self.requestData += bytes(self.getSocket().readAll())
+        if b"\r\n\r\n" not in self.requestData:
+            if len(self.requestData) > MAX_REQUEST_HEADER_SIZE:
+                self.requestReceived = True
+                self.writeErrorResponse(b"431 Request Header Fields Too Large")
+            return
+        self.requestReceived = True
+        requestLine = self.requestData.split(b"\r\n", 1)[0].decode("latin-1").split()
+        if len(requestLine) < 2 or requestLine[0] != "GET":
+            self.writeErrorResponse(b"405 Method Not Allowed")
+            return
+        url = urlsplit(requestLine[1])
+        path = url.path
+        profileNames = parse_qs(url.query).get("profile")
+        if profileNames:
+            if profileNames[0] not in STREAM_PROFILES:
+                self.writeErrorResponse(b"404 Not Found")
+                return
+            self.profile = STREAM_PROFILES[profileNames[0]]
+        if path in MJPEG_STREAM_PATHS:
+            self.writeDataToSocket(
+                b"HTTP/1.1 200 OK\r\n"
+                b"Cache-Control: no-cache, no-store\r\n"
+                b"Connection: close\r\n"
+                b"Content-Type: multipart/x-mixed-replace; boundary=" + MJPEG_BOUNDARY + b"\r\n\r\n"
+            )
+        elif path == SNAPSHOT_PATH:
+            self.writeSnapshot()
+            return
+        else:
+            self.writeErrorResponse(b"404 Not Found")
+            return
+        super().startStreaming()
+
+    def writeSnapshot(self) -> None:
+        encodedFrame = self.streamEncoder.getSnapshot(self.getStreamQuality())
+        if encodedFrame is None:
+            self.writeErrorResponse(b"503 Service Unavailable")
+            return
+        self.writeDataToSocket(
+            b"HTTP/1.1 200 OK\r\n"
+            b"Cache-Control: no-cache, no-store\r\n"
+            b"Connection: close\r\n"
+            b"Content-Type: image/jpeg\r\n"
+            b"Last-Modified: " + formatdate(encodedFrame.timestamp, usegmt = True).encode() + b"\r\n"
+            b"Content-Length: " + str(len(encodedFrame.jpeg)).encode() + b"\r\n\r\n"
+        )
+        self.writeDataToSocket(encodedFrame.jpeg)
+        self.getSocket().disconnectFromHost()
+
+    def writeEncodedFrame(self, encodedFrame: EncodedFrame) -> int:
+        bytes_written = self.writeDataToSocket(
+            b"--" + MJPEG_BOUNDARY + b"\r\n"
+            b"Content-Type: image/jpeg\r\n"
+            b"Content-Length: " + str(len(encodedFrame.jpeg)).encode() + b"\r\n\r\n"
+        )
+        bytes_written += self.writeDataToSocket(encodedFrame.jpeg)
+        bytes_written += self.writeDataToSocket(b"\r\n")
+        return bytes_written
+
+    def writeErrorResponse(self, status: bytes) -> None:
+        self.writeDataToSocket(b"HTTP/1.1 " + status + b"\r\nContent-Length: 0\r\nConnection: close\r\n\r\n")
+        self.getSocket().disconnectFromHost()
@@ -1,28 +1,91 @@
 from datetime import datetime
-from typing import Dict, Optional
-from PyQt5.QtCore import QObject, pyqtSignal, pyqtSlot
+import time
+from typing import Dict, Optional, Tuple
+from PyQt5.QtCore import QMutex, QMutexLocker, QObject, Qt, pyqtSignal, pyqtSlot
 import os
-import cv2
+from preEventBuffer import PreEventBuffer
+from recordingWriters import BackgroundRecordingWriter, RecordingCodec, RecordingWriterFactory
 from utils import Frame
 import logging
 
-RECORDING_FPS = 20
-RECORDING_RESOLUTION = (1080, 720) 
+# Used until the capture frame rate has been measured
+DEFAULT_RECORDING_FPS = 20
+MIN_RECORDING_FPS = 1
+MAX_RECORDING_FPS = 60
+FRAME_INTERVAL_SMOOTHING = 0.1
+# Used only when the recording starts before the first frame arrived
+DEFAULT_RECORDING_RESOLUTION = (640, 480)
 
 logger = logging.getLogger(__name__)
 
 class MovementRecorder(QObject):
     toggleIsRecording = pyqtSignal(bool)
+    recordingStatsReported = pyqtSignal(dict)
+    newFrameAvailable = pyqtSignal()
+
     def __init__(self):
         super().__init__()
         self.recording = False
-        self.frame_writer: Optional[cv2.VideoWriter] = None
+        self.frame_writer: Optional[BackgroundRecordingWriter] = None
         self.recordingFolder = os.path.join(os.getcwd(),'recordings')
+        self.recordingCodec = RecordingCodec.MJPG
+        self.preEventBuffer = PreEventBuffer(0, 0)
+        self.recordingWidth = 0
+        self.frameSize: Optional[Tuple[int, int]] = None
+        self.lastFrameTimestamp: Optional[float] = None
+        self.frameInterval: Optional[float] = None
+        self.latestFrameMutex = QMutex()
+        self.latestFrame: Optional[Frame] = None
+        self.latestFrameTimestamp = 0.0
+        self.framesSkipped = 0
+        self.preEventBufferStats: Dict = {}
+        self.newFrameAvailable.connect(self.onNewFrameAvailable, Qt.QueuedConnection)
+
+    def getRecordingResolution(self) -> Tuple[int, int]:
+        if self.frameSize is None:
+            return DEFAULT_RECORDING_RESOLUTION
+        frameWidth, frameHeight = self.frameSize
+        if self.recordingWidth <= 0 or self.recordingWidth == frameWidth:
+            return self.frameSize
+        # Height follows the camera aspect ratio, most codecs need even dimensions
+        width = self.recordingWidth & ~1
+        height = int(round(frameHeight * width / frameWidth)) & ~1
+        return width, height
+
+    def getRecordingFps(self) -> float:
+        if not self.frameInterval:
+            return DEFAULT_RECORDING_FPS
+        return min(max(round(1 / self.frameInterval), MIN_RECORDING_FPS), MAX_RECORDING_FPS)
+
+    def updateFrameInterval(self, timestamp: float) -> None:
+        if self.lastFrameTimestamp is not None:
+            interval = timestamp - self.lastFrameTimestamp
+            if self.frameInterval is None:
+                self.frameInterval = interval
+            else:
+                self.frameInterval += FRAME_INTERVAL_SMOOTHING * (interval - self.frameInterval)
+        self.lastFrameTimestamp = timestamp
 
     def prepareWriter(self) -> None:
-        recName = datetime.now().strftime("%b_%d_%Y_%H_%M_%S")+".avi"
+        writer = RecordingWriterFactory.createRecordingWriter(self.recordingCodec)
+        recName = datetime.now().strftime("%b_%d_%Y_%H_%M_%S") + writer.extension
         fullPath = os.path.join(self.recordingFolder, recName)
-        self.frame_writer = cv2.VideoWriter(fullPath, cv2.VideoWriter_fourcc('I','4','2','0'), RECORDING_FPS, RECORDING_RESOLUTION)
+        # Taken on the recorder thread, which is the only one touching the buffer
+        bufferStats = self.preEventBufferStats = self.getPreEventBufferStats()
+        if bufferStats["frames"]:
+            logger.info(
+                "Adding %s pre-event frames (%.1f s, %.1f MB) to the recording",
+                bufferStats["frames"], bufferStats["durationSec"], bufferStats["memoryUsageBytes"] / 1024 / 1024
+            )
+        resolution = self.getRecordingResolution()
+        fps = self.getRecordingFps()
+        logger.info("Recording at %sx%s, %s fps, camera frames are %s", resolution[0], resolution[1], fps, self.frameSize)
+        # Encoding and disk writes happen on the writer thread, the recording slot only queues frames
+        self.frame_writer = BackgroundRecordingWriter(
+            writer, fullPath, fps, resolution, self.preEventBuffer.drain(), self.preEventBuffer.maxMemoryBytes
+        )
+        if not self.frame_writer.start():
+            self.frame_writer = None
 
     @pyqtSlot(bool)
     def onRecordingToggled(self, isRecording:bool) -> None:
@@ -33,20 +96,54 @@ class MovementRecorder(QObject):
         else:
             self.recording = False
             if self.frame_writer:
-                self.frame_writer.release()
+                stats = self.frame_writer.stop()
+                stats["preEventBuffer"] = self.preEventBufferStats
+                self.recordingStatsReported.emit(stats)
             self.frame_writer = None
             self.toggleIsRecording.emit(False)
+
+    @pyqtSlot()
+    def onStopRecordingRequested(self) -> None:
+        if self.recording:
+            self.onRecordingToggled(False)
     
     @pyqtSlot(Frame)
     def onFrameReceived(self, frame: Frame) -> None:
+        # Called directly from the camera thread, native frames never pile up while buffering is slower than the camera
+        with QMutexLocker(self.latestFrameMutex):
+            processingPending = self.latestFrame is not None
+            if processingPending:
+                self.framesSkipped += 1
+            self.latestFrame = frame
+            self.latestFrameTimestamp = time.time()
+        if not processingPending:
+            self.newFrameAvailable.emit()
+
+    @pyqtSlot()
+    def onNewFrameAvailable(self) -> None:
+        with QMutexLocker(self.latestFrameMutex):
+            frame = self.latestFrame
+            timestamp = self.latestFrameTimestamp
+            self.latestFrame = None
+        if frame is None:
+            return
+        self.frameSize = (frame.shape[1], frame.shape[0])
+        self.updateFrameInterval(timestamp)
         if not self.recording:
+            self.preEventBuffer.addFrame(frame, timestamp)
             return
-        if not self.frame_writer:
-            raise Exception("No frame writter provided")
-        resized_frame = cv2.resize(frame, RECORDING_RESOLUTION, cv2.INTER_AREA)
-        self.frame_writer.write(resized_frame)
+        if self.frame_writer:
+            self.frame_writer.addFrame(frame, timestamp)
+
+    def getPreEventBufferStats(self) -> Dict:
+        stats = self.preEventBuffer.getStats()
+        with QMutexLocker(self.latestFrameMutex):
+            stats["framesSkipped"] = self.framesSkipped
+        return stats
     
     @pyqtSlot(dict)
     def onRecorderSettingsChanged(self, settings: Dict) -> None:
         self.recordingFolder = settings["recordingsDir"]
-        
\ No newline at end of file
+        self.recordingCodec = RecordingCodec(settings["recordingCodec"])
+        self.recordingWidth = settings["recordingWidth"]
+        self.preEventBuffer.configure(settings["preEventBufferSeconds"], settings["preEventBufferMaxMemoryMb"] * 1024 * 1024)
@@ -0,0 +1,214 @@
+import logging
+import time
+import uuid
+from typing import Any, Dict, Optional, Union
+from PyQt5.QtCore import QMutex, QMutexLocker, QObject, pyqtSignal, pyqtSlot
+from PyQt5.QtNetwork import QTcpSocket
+from streamMetadata import StreamEvent
+from streamProtocol import (
+    HEADER_SIZE,
+    PROTOCOL_VERSION,
+    MessageFlag,
+    MessageType,
+    ProtocolError,
+    decodeJsonPayload,
+    encodeJsonPayload,
+    packHeader,
+    unpackHeader
+)
+
+# Frames are skipped while more than this is still waiting in the socket buffer
+MAX_PENDING_BYTES = 512 * 1024
+# Clients only send short control messages like the profile selection
+MAX_CLIENT_MESSAGE_SIZE = 64 * 1024
+STATS_REPORT_INTERVAL = 10
+
+logger = logging.getLogger(__name__)
+
+class StreamingClientStats:
+    def __init__(self) -> None:
+        self.connectedSince = time.time()
+        self.framesSent = 0
+        self.framesSkipped = 0
+        self.bytesSent = 0
+        self.qualityChanges = 0
+        self.pendingBytes = 0
+        self.periodStart = time.monotonic()
+        self.periodFramesSent = 0
+        self.periodBytesSent = 0
+
+    def isReportDue(self) -> bool:
+        return time.monotonic() - self.periodStart >= STATS_REPORT_INTERVAL
+
+    def toDict(self, streamDescription: Dict) -> Dict:
+        elapsed = max(time.monotonic() - self.periodStart, 1e-6)
+        stats = {
+            "connectedSince": self.connectedSince,
+            "framesSent": self.framesSent,
+            "framesSkipped": self.framesSkipped,
+            "bytesSent": self.bytesSent,
+            "qualityChanges": self.qualityChanges,
+            "pendingBytes": self.pendingBytes,
+            "fps": self.periodFramesSent / elapsed,
+            "bitrateKbps": 8 * self.periodBytesSent / elapsed / 1000
+        }
+        stats.update(streamDescription)
+        return stats
+
+    def startNewPeriod(self) -> None:
+        self.periodStart = time.monotonic()
+        self.periodFramesSent = 0
+        self.periodBytesSent = 0
+
+class NetworkStreamingClient(QObject):
+    # Socket handling, protocol messages and stats shared by the JPEG and H.264 stream clients,
+    # which each bring their own encoder and payload type
+    connectionTerminated = pyqtSignal(str)
+    statsUpdated = pyqtSignal(str, dict)
+
+    def __init__(self, client_socket_handle: Any, parent: Optional[QObject] = None) -> None:
+        super().__init__(parent)
+        self.receivedData = b""
+        self.stats = StreamingClientStats()
+        self.statsMutex = QMutex()
+        self.client_socket: Optional[QTcpSocket] = None
+        self.isStreaming = False
+        self.isTerminated = False
+        self.client_socket_handle = client_socket_handle
+        self.id = str(uuid.uuid4())
+
+    def onStart(self) -> bool:
+        self.client_socket = QTcpSocket(self)
+        if not self.client_socket.setSocketDescriptor(self.client_socket_handle):
+            logger.warning("Could not open socket for streaming client: %s, error details: %s", self.id, self.client_socket.errorString())
+            return False
+        self.client_socket.disconnected.connect(self.onConnectionTerminated)
+        self.client_socket.bytesWritten.connect(self.onBytesWritten)
+        self.client_socket.readyRead.connect(self.onDataReceived)
+        self.sendHello()
+        self.startStreaming()
+        return True
+
+    def startStreaming(self) -> None:
+        raise NotImplementedError
+
+    def stopStreaming(self) -> None:
+        raise NotImplementedError
+
+    def getStreamDescription(self) -> Dict:
+        raise NotImplementedError
+
+    def selectProfile(self, profileName: str) -> None:
+        raise NotImplementedError
+
+    def hasMetadata(self) -> bool:
+        return False
+
+    def sendHello(self) -> None:
+        hello = {"protocolVersion": PROTOCOL_VERSION, "clientId": self.id, "metadata": self.hasMetadata()}
+        hello.update(self.getStreamDescription())
+        self.writeMessage(MessageType.HELLO, 0, time.time(), encodeJsonPayload(hello))
+
+    def sendEvent(self, event: StreamEvent) -> None:
+        self.writeMessage(MessageType.EVENT, event.sequence, event.timestamp, encodeJsonPayload(event.toDict()))
+
+    def close(self) -> None:
+        if self.client_socket:
+            self.client_socket.close()
+
+    @pyqtSlot()
+    def onDataReceived(self) -> None:
+        self.receivedData += bytes(self.getSocket().readAll())
+        while len(self.receivedData) >= HEADER_SIZE:
+            try:
+                header = unpackHeader(self.receivedData[:HEADER_SIZE])
+                if header.length > MAX_CLIENT_MESSAGE_SIZE:
+                    raise ProtocolError(f"Message of {header.length} bytes is too large")
+            except ProtocolError as e:
+                logger.warning("Invalid message from streaming client: %s, error details: %s", self.id, e)
+                self.receivedData = b""
+                self.getSocket().disconnectFromHost()
+                return
+            if len(self.receivedData) < HEADER_SIZE + header.length:
+                return
+            payload = self.receivedData[HEADER_SIZE:HEADER_SIZE + header.length]
+            self.receivedData = self.receivedData[HEADER_SIZE + header.length:]
+            if header.messageType != MessageType.HELLO:
+                continue
+            try:
+                hello = decodeJsonPayload(payload)
+            except ValueError as e:
+                logger.warning("Invalid hello from streaming client: %s, error details: %s", self.id, e)
+                continue
+            self.onClientHelloReceived(hello)
+
+    def onClientHelloReceived(self, hello: Dict) -> None:
+        if "profile" in hello:
+            self.selectProfile(str(hello["profile"]))
+
+    @pyqtSlot("qint64")
+    def onBytesWritten(self, bytes_count: int) -> None:
+        pass
+
+    def getSocket(self) -> QTcpSocket:
+        if self.client_socket is None:
+            raise RuntimeError(f"Socket of streaming client: {self.id} is not open")
+        return self.client_socket
+
+    def updatePendingBytes(self) -> int:
+        pendingBytes = self.getSocket().bytesToWrite()
+        with QMutexLocker(self.statsMutex):
+            self.stats.pendingBytes = pendingBytes
+        return pendingBytes
+
+    def writeMessage(self, messageType: MessageType, sequence: int, timestamp: float, payload: bytes, flags: MessageFlag = MessageFlag.NONE) -> int:
+        bytes_written = self.writeDataToSocket(packHeader(messageType, sequence, timestamp, len(payload), flags))
+        return bytes_written + self.writeDataToSocket(payload)
+
+    def writeDataToSocket(self, content:Union[bytes, bytearray]) -> int:
+        bytes_written = self.getSocket().write(content)
+        if bytes_written < 0:
+            logger.warning("Writing to streaming client: %s failed, error details: %s", self.id, self.getSocket().errorString())
+            return 0
+        return bytes_written
+
+    def countSkippedFrame(self) -> None:
+        with QMutexLocker(self.statsMutex):
+            self.stats.framesSkipped += 1
+
+    def countSentFrame(self, bytes_written: int) -> None:
+        with QMutexLocker(self.statsMutex):
+            self.stats.framesSent += 1
+            self.stats.periodFramesSent += 1
+            self.stats.bytesSent += bytes_written
+            self.stats.periodBytesSent += bytes_written
+        self.reportStatsIfDue()
+
+    def reportStatsIfDue(self) -> None:
+        with QMutexLocker(self.statsMutex):
+            if not self.stats.isReportDue():
+                return
+        stats = self.getStats()
+        with QMutexLocker(self.statsMutex):
+            self.stats.startNewPeriod()
+        logger.info(
+            "Streaming client: %s, %.1f fps, %.0f kbps, skipped %s frames, stream: %s",
+            self.id, stats["fps"], stats["bitrateKbps"], stats["framesSkipped"], self.getStreamDescription()
+        )
+        self.statsUpdated.emit(self.id, stats)
+
+    def getStats(self) -> Dict:
+        with QMutexLocker(self.statsMutex):
+            return self.stats.toDict(self.getStreamDescription())
+
+    @pyqtSlot()
+    def onConnectionTerminated(self) -> None:
+        if self.isTerminated:
+            return
+        logger.info("Connection with remote client, client_id: %s is terminated !", self.id)
+        self.isTerminated = True
+        self.stopStreaming()
+        self.connectionTerminated.emit(self.id)
+
+    def get_id(self) -> str:
+        return self.id
@@ -0,0 +1,68 @@
+from collections import deque
+import logging
+from typing import Deque, Dict, List, Optional, Tuple
+import cv2
+from utils import Frame
+
+logger = logging.getLogger(__name__)
+
+PRE_EVENT_JPEG_QUALITY = 85
+
+def encodeBufferedFrame(frame: Frame) -> Optional[bytes]:
+    isEncoded, encoded = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, PRE_EVENT_JPEG_QUALITY])
+    if not isEncoded:
+        return None
+    return encoded.tobytes()
+
+class PreEventBuffer:
+    def __init__(self, durationSec: float, maxMemoryBytes: int) -> None:
+        self.durationSec = durationSec
+        self.maxMemoryBytes = maxMemoryBytes
+        # Frames are kept as JPEG, raw frames of a few seconds would take hundreds of MB
+        self.frames: Deque[Tuple[float, bytes]] = deque()
+        self.memoryUsage = 0
+        self.framesDropped = 0
+
+    def isEnabled(self) -> bool:
+        return self.durationSec > 0 and self.maxMemoryBytes > 0
+
+    def configure(self, durationSec: float, maxMemoryBytes: int) -> None:
+        self.durationSec = durationSec
+        self.maxMemoryBytes = maxMemoryBytes
+        if not self.isEnabled():
+            self.clear()
+
+    def addFrame(self, frame: Frame, timestamp: float) -> None:
+        if not self.isEnabled():
+            return
+        jpeg = encodeBufferedFrame(frame)
+        if jpeg is not None:
+            self.addEncodedFrame(jpeg, timestamp)
+
+    def addEncodedFrame(self, jpeg: bytes, timestamp: float) -> None:
+        self.frames.append((timestamp, jpeg))
+        self.memoryUsage += len(jpeg)
+        while self.frames and timestamp - self.frames[0][0] > self.durationSec:
+            self.memoryUsage -= len(self.frames.popleft()[1])
+        # Frames pushed out by the memory limit are lost before their time, unlike the ones that aged out
+        while self.frames and self.memoryUsage > self.maxMemoryBytes:
+            self.memoryUsage -= len(self.frames.popleft()[1])
+            self.framesDropped += 1
+
+    def drain(self) -> List[Tuple[float, bytes]]:
+        frames = list(self.frames)
+        self.clear()
+        return frames
+
+    def clear(self) -> None:
+        self.frames.clear()
+        self.memoryUsage = 0
+
+    def getStats(self) -> Dict:
+        return {
+            "frames": len(self.frames),
+            "durationSec": self.frames[-1][0] - self.frames[0][0] if self.frames else 0.0,
+            "memoryUsageBytes": self.memoryUsage,
+            "framesDropped": self.framesDropped,
+            "maxMemoryBytes": self.maxMemoryBytes
+        }
@@ -0,0 +1,251 @@
+import enum
+import fractions
+import json
+import logging
+import math
+import os
+import queue
+import threading
+from typing import Dict, List, Optional, Tuple
+from typing_extensions import Protocol
+import cv2
+import numpy as np
+from h264StreamEncoder import av, isH264EncodingAvailable
+from preEventBuffer import PreEventBuffer, encodeBufferedFrame
+from utils import Frame
+
+logger = logging.getLogger(__name__)
+
+# Frames waiting for the writer thread, about three seconds of recording
+RECORDING_QUEUE_SIZE = 60
+H264_RECORDING_PRESET = "veryfast"
+H264_RECORDING_CRF = "23"
+# Longest gap in the capture, in seconds, that is filled by repeating the last frame
+MAX_REPEATED_DURATION = 2.0
+
+class RecordingCodec(enum.Enum):
+    MJPG = "mjpg"
+    MP4V = "mp4v"
+    H264 = "h264"
+    I420 = "i420"
+
+class RecordingWriter(Protocol):
+    extension: str
+
+    def open(self, path: str, fps: float, resolution: Tuple[int, int]) -> bool:
+        ...
+
+    def write(self, frame: Frame, timestamp: float) -> None:
+        ...
+
+    def close(self) -> None:
+        ...
+
+class OpenCVRecordingWriter:
+    def __init__(self, fourcc: str, extension: str) -> None:
+        self.fourcc = fourcc
+        self.extension = extension
+        self.videoWriter: Optional[cv2.VideoWriter] = None
+        self.fps = 0.0
+        self.startTimestamp: Optional[float] = None
+        self.containerFrames = 0
+
+    def open(self, path: str, fps: float, resolution: Tuple[int, int]) -> bool:
+        self.videoWriter = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*self.fourcc), fps, resolution)
+        self.fps = fps
+        self.startTimestamp = None
+        self.containerFrames = 0
+        return self.videoWriter.isOpened()
+
+    def write(self, frame: Frame, timestamp: float) -> None:
+        if self.startTimestamp is None:
+            self.startTimestamp = timestamp
+        # The container has a constant frame rate, frames are repeated or skipped so playback follows the capture timestamps
+        targetFrames = int(round((timestamp - self.startTimestamp) * self.fps)) + 1
+        repeats = min(targetFrames - self.containerFrames, int(MAX_REPEATED_DURATION * self.fps) + 1)
+        for _ in range(repeats):
+            self.videoWriter.write(frame)
+        self.containerFrames = max(self.containerFrames, targetFrames)
+
+    def close(self) -> None:
+        if self.videoWriter:
+            self.videoWriter.release()
+        self.videoWriter = None
+
+class H264RecordingWriter:
+    extension = ".mp4"
+
+    def __init__(self) -> None:
+        self.container = None
+        self.videoStream = None
+        self.startTimestamp: Optional[float] = None
+
+    def open(self, path: str, fps: float, resolution: Tuple[int, int]) -> bool:
+        try:
+            self.container = av.open(path, mode = "w")
+            self.videoStream = self.container.add_stream("libx264", rate = int(fps))
+        except Exception as e:
+            logger.warning("H.264 recording could not be opened, error details: %s", e)
+            return False
+        self.videoStream.width, self.videoStream.height = resolution
+        self.videoStream.pix_fmt = "yuv420p"
+        # Frames keep their capture timestamps, so the playback speed matches reality whatever the camera rate was
+        self.videoStream.codec_context.time_base = fractions.Fraction(1, 1000)
+        self.videoStream.options = {"preset": H264_RECORDING_PRESET, "crf": H264_RECORDING_CRF}
+        self.startTimestamp = None
+        return True
+
+    def write(self, frame: Frame, timestamp: float) -> None:
+        if self.startTimestamp is None:
+            self.startTimestamp = timestamp
+        videoFrame = av.VideoFrame.from_ndarray(frame, format = "bgr24")
+        videoFrame.pts = int(1000 * (timestamp - self.startTimestamp))
+        videoFrame.time_base = fractions.Fraction(1, 1000)
+        self.container.mux(self.videoStream.encode(videoFrame))
+
+    def close(self) -> None:
+        if self.container:
+            self.container.mux(self.videoStream.encode())
+            self.container.close()
+        self.container = None
+        self.videoStream = None
+
+class RecordingWriterFactory:
+
+    @classmethod
+    def createRecordingWriter(cls, codec: RecordingCodec) -> RecordingWriter:
+        if codec == RecordingCodec.H264:
+            if isH264EncodingAvailable():
+                return H264RecordingWriter()
+            logger.warning("PyAV with libx264 is not available, recording with %s instead", RecordingCodec.MJPG.value)
+            codec = RecordingCodec.MJPG
+        if codec == RecordingCodec.MP4V:
+            return OpenCVRecordingWriter("mp4v", ".mp4")
+        if codec == RecordingCodec.I420:
+            return OpenCVRecordingWriter("I420", ".avi")
+        return OpenCVRecordingWriter("MJPG", ".avi")
+
+class BackgroundRecordingWriter:
+    def __init__(
+        self,
+        writer: RecordingWriter,
+        path: str,
+        fps: float,
+        resolution: Tuple[int, int],
+        preEventFrames: Optional[List[Tuple[float, bytes]]] = None,
+        overflowMaxMemoryBytes: int = 0
+        ) -> None:
+        self.writer = writer
+        # JPEG frames from before the recording started, decoded on the writer thread ahead of the queued frames
+        self.preEventFrames = preEventFrames or []
+        self.preEventFrameCount = len(self.preEventFrames)
+        # Live frames arriving while the pre-event frames are written would overflow the queue,
+        # they are kept as JPEG in a memory capped buffer until the writer catches up
+        self.overflowMutex = threading.Lock()
+        self.overflowBuffer = PreEventBuffer(math.inf, overflowMaxMemoryBytes)
+        self.flushingPreEvent = bool(self.preEventFrames) and overflowMaxMemoryBytes > 0
+        self.overflowFrameCount = 0
+        self.path = path
+        self.fps = fps
+        self.resolution = resolution
+        self.frameQueue: queue.Queue = queue.Queue(maxsize = RECORDING_QUEUE_SIZE)
+        self.framesWritten = 0
+        self.framesDropped = 0
+        self.firstFrameTimestamp: Optional[float] = None
+        self.lastFrameTimestamp: Optional[float] = None
+        self.writerThread = threading.Thread(target = self.writeFrames, name = "recordingWriter", daemon = True)
+
+    def start(self) -> bool:
+        if not self.writer.open(self.path, self.fps, self.resolution):
+            logger.warning("Recording file: %s could not be opened", self.path)
+            return False
+        self.writerThread.start()
+        return True
+
+    def isFlushingPreEvent(self) -> bool:
+        with self.overflowMutex:
+            return self.flushingPreEvent
+
+    def addFrame(self, frame: Frame, timestamp: float) -> None:
+        if self.isFlushingPreEvent():
+            jpeg = encodeBufferedFrame(frame)
+            with self.overflowMutex:
+                # The flush may have finished while encoding, then the frame goes to the queue as usual
+                if self.flushingPreEvent and jpeg is not None:
+                    self.overflowBuffer.addEncodedFrame(jpeg, timestamp)
+                    self.overflowFrameCount += 1
+                    return
+        # Never blocks the recording slot, frames are dropped while the disk can not keep up
+        try:
+            self.frameQueue.put_nowait((frame, timestamp))
+        except queue.Full:
+            self.framesDropped += 1
+
+    def stop(self) -> Dict:
+        self.frameQueue.put(None)
+        self.writerThread.join()
+        self.writer.close()
+        stats = self.getStats()
+        logger.info(
+            "Recording %s finished: %s frames, %.1f fps achieved, %.0f kbps, %s frames dropped, %s dropped while writing pre-event frames",
+            self.path, stats["framesWritten"], stats["achievedFps"], stats["bitrateKbps"], stats["framesDropped"], stats["overflowFramesDropped"]
+        )
+        with open(os.path.splitext(self.path)[0] + ".json", "w") as statsFile:
+            json.dump(stats, statsFile, indent = 2)
+        return stats
+
+    def writeFrames(self) -> None:
+        self.writeEncodedFrames(self.preEventFrames)
+        self.preEventFrames = []
+        while True:
+            with self.overflowMutex:
+                overflowFrames = self.overflowBuffer.drain()
+                if not overflowFrames:
+                    self.flushingPreEvent = False
+                    break
+            self.writeEncodedFrames(overflowFrames)
+        while True:
+            item = self.frameQueue.get()
+            if item is None:
+                return
+            self.writeFrame(*item)
+
+    def writeEncodedFrames(self, frames: List[Tuple[float, bytes]]) -> None:
+        for timestamp, jpeg in frames:
+            frame = cv2.imdecode(np.frombuffer(jpeg, np.uint8), cv2.IMREAD_COLOR)
+            if frame is not None:
+                self.writeFrame(frame, timestamp)
+
+    def writeFrame(self, frame: Frame, timestamp: float) -> None:
+        # Frames already at the recording resolution, the native one by default, are written untouched
+        if (frame.shape[1], frame.shape[0]) != self.resolution:
+            interpolation = cv2.INTER_AREA if frame.shape[1] > self.resolution[0] else cv2.INTER_LINEAR
+            frame = cv2.resize(frame, self.resolution, interpolation = interpolation)
+        try:
+            self.writer.write(frame, timestamp)
+        except Exception as e:
+            logger.warning("Frame could not be written to recording: %s, error details: %s", self.path, e)
+            return
+        if self.firstFrameTimestamp is None:
+            self.firstFrameTimestamp = timestamp
+        self.lastFrameTimestamp = timestamp
+        self.framesWritten += 1
+
+    def getStats(self) -> Dict:
+        duration = 0.0
+        if self.firstFrameTimestamp is not None:
+            duration = self.lastFrameTimestamp - self.firstFrameTimestamp
+        fileSize = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+        return {
+            "path": self.path,
+            "framesWritten": self.framesWritten,
+            "preEventFrames": self.preEventFrameCount,
+            "framesDropped": self.framesDropped,
+            "overflowFrames": self.overflowFrameCount,
+            "overflowFramesDropped": self.overflowBuffer.framesDropped,
+            "durationSec": duration,
+            "achievedFps": (self.framesWritten - 1) / duration if duration > 0 else 0.0,
+            "containerFps": self.fps,
+            "fileSizeBytes": fileSize,
+            "bitrateKbps": 8 * fileSize / duration / 1000 if duration > 0 else 0.0
+        }
@@ -1,4 +1,4 @@
-from typing import Dict, List
+from typing import Any, Dict, List
 from PyQt5.QtCore import QObject, pyqtSignal, QSettings, QVariant
 from utils import AlgorithmType, createFolderIfNoExisting
 import os
@@ -33,7 +33,11 @@ defaultSettings = {
     "movementRecorderSettings":{
         "movementPresentThreshold": 10000,
         "movementAbsenceThreshold": 3000,
-        "recordingsDir": os.path.join(os.getcwd(),'recordings')
+        "recordingsDir": os.path.join(os.getcwd(),'recordings'),
+        "recordingCodec": "mjpg",
+        "preEventBufferSeconds": 10,
+        "preEventBufferMaxMemoryMb": 64,
+        "recordingWidth": 0
     },
     "soundDetectorSettings":{
         "soundDetectionEnabled":True,
@@ -49,9 +53,27 @@ defaultSettings = {
     "cameraSettings":{
         "cameraIndex":0
     },
+    "displaySettings":{
+        "maxRefreshRate": 25
+    },
+    "streamingSettings":{
+        "h264BitrateKbps": 800,
+        "h264Gop": 60,
+        "maxClientFrameRate": 0,
+        "jpegEncoder": "opencv",
+        "jpegChromaSubsampling": "420"
+    },
     "objectDetectionSettings":{
         "detectionEnabled": False,
-        "confidenceThreshold": 0.5
+        "confidenceThreshold": 0.5,
+        "roiInferenceEnabled": False,
+        "detectionInterval": 1,
+        "maxDetectionRate": 0.0,
+        "inferenceBackend": "opencv",
+        "inputSize": 320,
+        "allowedLabels": [],
+        "classConfidenceThresholds": {},
+        "profilingEnabled": False
     },
     "subscriberSettings":{
         "emailSubscribers": {
@@ -61,6 +83,9 @@ defaultSettings = {
 
 }
 
+def isTrueValue(value: Any) -> bool:
+    return value in [True, 'true', 'True']
+
 class MotionDetectorSettings(QSettings):
     def value(self, key, raise_error = True):
         value = super().value(key)
@@ -74,6 +99,7 @@ class SettingsManager(QObject):
     soundDetectionSettingsSet = pyqtSignal(dict)
     movementLoggerSettingsSet = pyqtSignal(dict)
     cameraSettingsSet = pyqtSignal(dict)
+    displaySettingsSet = pyqtSignal(dict)
     objectDetectionSettingsSet = pyqtSignal(dict)
     emailSubscriberAdded = pyqtSignal(dict)
     emailNotificatioToggle = pyqtSignal(bool)
@@ -139,6 +165,12 @@ class SettingsManager(QObject):
     def getCameraSettings(self) -> Dict:
         return self.currentSettings["cameraSettings"]
     
+    def getDisplaySettings(self) -> Dict:
+        return self.currentSettings["displaySettings"]
+
+    def getStreamingSettings(self) -> Dict:
+        return self.currentSettings["streamingSettings"]
+
     def getObjectDetectionSettings(self, default: bool = False) -> Dict:
         if default:
             return defaultSettings["objectDetectionSettings"]  
@@ -167,6 +199,10 @@ class SettingsManager(QObject):
         self.currentSettings["cameraSettings"] = cameraSettings
         self.cameraSettingsSet.emit(cameraSettings)
     
+    def setDisplaySettings(self, displaySettings: Dict) -> None:
+        self.currentSettings["displaySettings"] = displaySettings
+        self.displaySettingsSet.emit(displaySettings)
+
     def setObjectDetectionSettings(self, objectDetectionSettings: Dict) -> None:
         self.currentSettings["objectDetectionSettings"] = objectDetectionSettings
         self.objectDetectionSettingsSet.emit(objectDetectionSettings)
@@ -216,6 +252,10 @@ class SettingsManager(QObject):
         self.settings.setValue("movementPresentThreshold", self.currentSettings['movementRecorderSettings']['movementPresentThreshold'])
         self.settings.setValue("movementAbsenceThreshold", self.currentSettings['movementRecorderSettings']['movementAbsenceThreshold'])
         self.settings.setValue("recordingsDir",self.currentSettings['movementRecorderSettings']['recordingsDir'])
+        self.settings.setValue("recordingCodec",self.currentSettings['movementRecorderSettings']['recordingCodec'])
+        self.settings.setValue("preEventBufferSeconds",self.currentSettings['movementRecorderSettings']['preEventBufferSeconds'])
+        self.settings.setValue("preEventBufferMaxMemoryMb",self.currentSettings['movementRecorderSettings']['preEventBufferMaxMemoryMb'])
+        self.settings.setValue("recordingWidth",self.currentSettings['movementRecorderSettings']['recordingWidth'])
         self.settings.setValue("volumeThreshold",self.currentSettings['soundDetectorSettings']['volumeThreshold'])
         self.settings.setValue("soundDetectionEnabled",self.currentSettings['soundDetectorSettings']['soundDetectionEnabled'])
         self.settings.setValue("loggingInterval",self.currentSettings["movementLoggerSettings"]['loggingInterval'])
@@ -224,8 +264,22 @@ class SettingsManager(QObject):
         self.settings.setValue("loggingPath",self.currentSettings["movementLoggerSettings"]['loggingPath'])
         self.settings.setValue("oneLineLog",self.currentSettings["movementLoggerSettings"]['oneLineLog'])
         self.settings.setValue("cameraIndex",self.currentSettings["cameraSettings"]['cameraIndex'])
+        self.settings.setValue("maxRefreshRate",self.currentSettings["displaySettings"]['maxRefreshRate'])
+        self.settings.setValue("h264BitrateKbps",self.currentSettings["streamingSettings"]['h264BitrateKbps'])
+        self.settings.setValue("h264Gop",self.currentSettings["streamingSettings"]['h264Gop'])
+        self.settings.setValue("maxClientFrameRate",self.currentSettings["streamingSettings"]['maxClientFrameRate'])
+        self.settings.setValue("jpegEncoder",self.currentSettings["streamingSettings"]['jpegEncoder'])
+        self.settings.setValue("jpegChromaSubsampling",self.currentSettings["streamingSettings"]['jpegChromaSubsampling'])
         self.settings.setValue("detectionEnabled",self.currentSettings["objectDetectionSettings"]['detectionEnabled'])
         self.settings.setValue("confidenceThreshold",self.currentSettings["objectDetectionSettings"]['confidenceThreshold'])
+        self.settings.setValue("roiInferenceEnabled",self.currentSettings["objectDetectionSettings"]['roiInferenceEnabled'])
+        self.settings.setValue("detectionInterval",self.currentSettings["objectDetectionSettings"]['detectionInterval'])
+        self.settings.setValue("maxDetectionRate",self.currentSettings["objectDetectionSettings"]['maxDetectionRate'])
+        self.settings.setValue("inferenceBackend",self.currentSettings["objectDetectionSettings"]['inferenceBackend'])
+        self.settings.setValue("inputSize",self.currentSettings["objectDetectionSettings"]['inputSize'])
+        self.settings.setValue("allowedLabels",",".join(self.currentSettings["objectDetectionSettings"]['allowedLabels']))
+        self.settings.setValue("profilingEnabled",self.currentSettings["objectDetectionSettings"]['profilingEnabled'])
+        self.settings.setValue("classConfidenceThresholds",",".join(f"{label}:{threshold}" for label, threshold in self.currentSettings["objectDetectionSettings"]['classConfidenceThresholds'].items()))
         self.settings.setValue("emailSubscribers", self.currentSettings["subscriberSettings"]["emailSubscribers"])
         self.settings.setValue("broadcastToSubscribers", self.currentSettings["subscriberSettings"]["broadcastToSubscribers"])
         self.settings.setValue("configExists", True)
@@ -255,7 +309,11 @@ class SettingsManager(QObject):
             "movementRecorderSettings":{
                 "movementPresentThreshold": self.settings.value("movementPresentThreshold"),
                 "movementAbsenceThreshold": self.settings.value("movementAbsenceThreshold"),
-                "recordingsDir": self.settings.value("recordingsDir")
+                "recordingsDir": self.settings.value("recordingsDir"),
+                "recordingCodec": self.loadValueOrDefault("recordingCodec", "movementRecorderSettings"),
+                "preEventBufferSeconds": int(self.loadValueOrDefault("preEventBufferSeconds", "movementRecorderSettings")),
+                "preEventBufferMaxMemoryMb": int(self.loadValueOrDefault("preEventBufferMaxMemoryMb", "movementRecorderSettings")),
+                "recordingWidth": int(self.loadValueOrDefault("recordingWidth", "movementRecorderSettings"))
             },
             "soundDetectorSettings":{
                 "soundDetectionEnabled": True if self.settings.value('soundDetectionEnabled') in ['true','True'] else False,
@@ -271,9 +329,27 @@ class SettingsManager(QObject):
             "cameraSettings":{
                 "cameraIndex": self.settings.value("cameraIndex")
             },
+            "displaySettings":{
+                "maxRefreshRate": float(self.loadValueOrDefault("maxRefreshRate", "displaySettings"))
+            },
+            "streamingSettings":{
+                "h264BitrateKbps": int(self.loadValueOrDefault("h264BitrateKbps", "streamingSettings")),
+                "h264Gop": int(self.loadValueOrDefault("h264Gop", "streamingSettings")),
+                "maxClientFrameRate": float(self.loadValueOrDefault("maxClientFrameRate", "streamingSettings")),
+                "jpegEncoder": self.loadValueOrDefault("jpegEncoder", "streamingSettings"),
+                "jpegChromaSubsampling": str(self.loadValueOrDefault("jpegChromaSubsampling", "streamingSettings"))
+            },
             "objectDetectionSettings":{
                 "detectionEnabled": True if self.settings.value('detectionEnabled') in ['true','True'] else False,
-                "confidenceThreshold": float(self.settings.value("confidenceThreshold"))
+                "confidenceThreshold": float(self.settings.value("confidenceThreshold")),
+                "roiInferenceEnabled": isTrueValue(self.loadValueOrDefault("roiInferenceEnabled", "objectDetectionSettings")),
+                "detectionInterval": int(self.loadValueOrDefault("detectionInterval", "objectDetectionSettings")),
+                "maxDetectionRate": float(self.loadValueOrDefault("maxDetectionRate", "objectDetectionSettings")),
+                "inferenceBackend": self.loadValueOrDefault("inferenceBackend", "objectDetectionSettings"),
+                "inputSize": int(self.loadValueOrDefault("inputSize", "objectDetectionSettings")),
+                "allowedLabels": self.loadValueAsList("allowedLabels"),
+                "classConfidenceThresholds": self.loadClassConfidenceThresholds(),
+                "profilingEnabled": isTrueValue(self.loadValueOrDefault("profilingEnabled", "objectDetectionSettings"))
             },
             "subscriberSettings": {
                 "emailSubscribers": self.settings.value("emailSubscribers"),
@@ -281,6 +357,26 @@ class SettingsManager(QObject):
             }      
         }
     
+    def loadValueOrDefault(self, key: str, settingsGroup: str) -> Any:
+        value = self.settings.value(key, raise_error = False)
+        if value is None:
+            return defaultSettings[settingsGroup][key]
+        return value
+
+    def loadValueAsList(self, key: str) -> List[str]:
+        value = self.settings.value(key, raise_error = False) or ""
+        if isinstance(value, list):
+            value = ",".join(value)
+        return [entry.strip() for entry in value.split(",") if entry.strip()]
+
+    def loadClassConfidenceThresholds(self) -> Dict[str, float]:
+        thresholds = {}
+        for entry in self.loadValueAsList("classConfidenceThresholds"):
+            label, _, threshold = entry.rpartition(":")
+            if label:
+                thresholds[label] = float(threshold)
+        return thresholds
+
     def reloadRecordingPathIfNeeded(self) -> None:
         if not os.path.exists(self.currentSettings["movementRecorderSettings"]["recordingsDir"]):
             self.currentSettings["movementRecorderSettings"]["recordingsDir"] = defaultSettings["movementRecorderSettings"]["recordingsDir"]
@@ -0,0 +1,153 @@
+import argparse
+import logging
+import socket
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+import cv2
+import numpy as np
+from streamProtocol import (
+    HEADER_SIZE,
+    MAX_SEQUENCE_NUMBER,
+    MessageHeader,
+    MessageType,
+    decodeJsonPayload,
+    encodeJsonPayload,
+    packHeader,
+    unpackHeader
+)
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 9500
+CONNECTION_TIMEOUT = 5.0
+STATS_PRINT_INTERVAL = 1.0
+
+@dataclass
+class StreamClientStats:
+    startTime: float = field(default_factory=time.monotonic)
+    framesReceived: int = 0
+    framesMissed: int = 0
+    bytesReceived: int = 0
+    eventsReceived: int = 0
+    latenciesMs: List[float] = field(default_factory=list)
+    lastSequence: Optional[int] = None
+    # Rate limited profiles skip source frames on purpose, gaps in their sequence numbers are not losses
+    countMissedFrames: bool = True
+
+    def onFrameReceived(self, header: MessageHeader) -> None:
+        self.framesReceived += 1
+        # Server and client are expected to share the clock, which holds for local load tests
+        self.latenciesMs.append(1000 * (time.time() - header.timestamp))
+        if self.countMissedFrames and self.lastSequence is not None:
+            self.framesMissed += max((header.sequence - self.lastSequence) % MAX_SEQUENCE_NUMBER - 1, 0)
+        self.lastSequence = header.sequence
+
+    def toDict(self) -> Dict:
+        elapsed = max(time.monotonic() - self.startTime, 1e-6)
+        latencies = np.array(self.latenciesMs) if self.latenciesMs else np.zeros(1)
+        return {
+            "framesReceived": self.framesReceived,
+            "framesMissed": self.framesMissed,
+            "eventsReceived": self.eventsReceived,
+            "fps": self.framesReceived / elapsed,
+            "bitrateKbps": 8 * self.bytesReceived / elapsed / 1000,
+            "meanLatencyMs": float(np.mean(latencies)),
+            "p95LatencyMs": float(np.percentile(latencies, 95)),
+            "maxLatencyMs": float(np.max(latencies))
+        }
+
+class StreamClient:
+    def __init__(self, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT, timeout: float = CONNECTION_TIMEOUT) -> None:
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.socket: Optional[socket.socket] = None
+        self.hello: Dict = {}
+        self.stats = StreamClientStats()
+
+    def connect(self, profile: Optional[str] = None) -> Dict:
+        self.socket = socket.create_connection((self.host, self.port), timeout = self.timeout)
+        header, payload = self.readMessage()
+        if header.messageType != MessageType.HELLO:
+            raise ConnectionError(f"Expected hello message, received: {header.messageType.name}")
+        self.hello = decodeJsonPayload(payload)
+        if profile and self.hello.get("profile") != profile:
+            self.selectProfile(profile)
+        self.stats = StreamClientStats(countMissedFrames = not self.hello.get("maxFrameRate"))
+        return self.hello
+
+    def selectProfile(self, profile: str) -> None:
+        hello = encodeJsonPayload({"profile": profile})
+        self.socket.sendall(packHeader(MessageType.HELLO, 0, time.time(), len(hello)) + hello)
+        # Frames of the previous profile may still arrive until the server confirms the switch
+        while True:
+            header, payload = self.readMessage()
+            if header.messageType == MessageType.HELLO:
+                self.hello = decodeJsonPayload(payload)
+                if self.hello.get("profile") == profile:
+                    return
+
+    def close(self) -> None:
+        if self.socket:
+            self.socket.close()
+            self.socket = None
+
+    def readMessage(self) -> Tuple[MessageHeader, bytes]:
+        header = unpackHeader(self.readExactly(HEADER_SIZE))
+        payload = self.readExactly(header.length)
+        self.stats.bytesReceived += HEADER_SIZE + header.length
+        if header.messageType == MessageType.FRAME:
+            self.stats.onFrameReceived(header)
+        elif header.messageType == MessageType.EVENT:
+            self.stats.eventsReceived += 1
+        return header, payload
+
+    def readExactly(self, size: int) -> bytes:
+        buffer = bytearray(size)
+        view = memoryview(buffer)
+        received = 0
+        while received < size:
+            chunkSize = self.socket.recv_into(view[received:], size - received)
+            if chunkSize == 0:
+                raise ConnectionError("Connection closed by the server")
+            received += chunkSize
+        return bytes(buffer)
+
+def parseArguments() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description = "Reference client for the MotionDetector TCP stream")
+    parser.add_argument("--host", default = DEFAULT_HOST, help = "Streaming server address")
+    parser.add_argument("--port", type = int, default = DEFAULT_PORT, help = "9500 overlay stream, 9501 raw stream with metadata, 9502 H.264 stream")
+    parser.add_argument("--profile", default = None, help = "Stream profile to request: main, sub or thumbnail")
+    parser.add_argument("--duration", type = float, default = 0, help = "Seconds to stay connected, 0 means until interrupted")
+    parser.add_argument("--show", action = "store_true", help = "Display received JPEG frames")
+    return parser.parse_args()
+
+def main():
+    logging.basicConfig(level = logging.INFO)
+    args = parseArguments()
+    client = StreamClient(args.host, args.port)
+    logger.info("Connected, stream: %s", client.connect(args.profile))
+    lastPrint = time.monotonic()
+    try:
+        while not args.duration or time.monotonic() - client.stats.startTime < args.duration:
+            header, payload = client.readMessage()
+            if header.messageType in [MessageType.EVENT, MessageType.METADATA]:
+                logger.debug("%s #%s: %s", header.messageType.name, header.sequence, decodeJsonPayload(payload))
+            if header.messageType == MessageType.EVENT:
+                logger.info("Event: %s", decodeJsonPayload(payload))
+            if args.show and header.messageType == MessageType.FRAME and client.hello.get("codec") == "jpeg":
+                cv2.imshow("stream", cv2.imdecode(np.frombuffer(payload, np.uint8), cv2.IMREAD_COLOR))
+                cv2.waitKey(1)
+            if time.monotonic() - lastPrint >= STATS_PRINT_INTERVAL:
+                lastPrint = time.monotonic()
+                logger.info("Stats: %s", client.stats.toDict())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        client.close()
+    logger.info("Final stats: %s", client.stats.toDict())
+
+if __name__ == "__main__":
+    main()
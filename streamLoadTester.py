@@ -0,0 +1,96 @@
+import argparse
+import json
+import logging
+import threading
+import time
+from typing import Dict, List, Optional
+from streamClient import DEFAULT_HOST, DEFAULT_PORT, StreamClient
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+logger = logging.getLogger(__name__)
+
+CPU_SAMPLING_INTERVAL = 1.0
+
+def runClient(host: str, port: int, profile: Optional[str], duration: float, results: List[Dict], index: int) -> None:
+    client = StreamClient(host, port)
+    try:
+        client.connect(profile)
+        while time.monotonic() - client.stats.startTime < duration:
+            client.readMessage()
+    except (ConnectionError, OSError) as e:
+        logger.warning("Client %s stopped early, error details: %s", index, e)
+    finally:
+        client.close()
+    results[index] = client.stats.toDict()
+
+def sampleServerCpu(serverPid: int, stopEvent: threading.Event, samples: List[float]) -> None:
+    process = psutil.Process(serverPid)
+    process.cpu_percent()
+    while not stopEvent.wait(CPU_SAMPLING_INTERVAL):
+        samples.append(process.cpu_percent())
+
+def runLoadTest(
+    host: str,
+    port: int,
+    clientCount: int,
+    duration: float,
+    serverPid: Optional[int] = None,
+    profile: Optional[str] = None
+    ) -> Dict:
+    results: List[Dict] = [{} for _ in range(clientCount)]
+    threads = [threading.Thread(target = runClient, args = (host, port, profile, duration, results, index)) for index in range(clientCount)]
+    cpuSamples: List[float] = []
+    stopEvent = threading.Event()
+    cpuThread = None
+    if serverPid is not None:
+        if psutil is None:
+            logger.warning("psutil is not installed, server CPU usage is not measured")
+        else:
+            cpuThread = threading.Thread(target = sampleServerCpu, args = (serverPid, stopEvent, cpuSamples))
+            cpuThread.start()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    stopEvent.set()
+    if cpuThread:
+        cpuThread.join()
+    return {
+        "clients": results,
+        "serverCpuPercent": sum(cpuSamples) / len(cpuSamples) if cpuSamples else None
+    }
+
+def parseArguments() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description = "Open N local stream clients and report per-client fps, latency and server CPU")
+    parser.add_argument("--host", default = DEFAULT_HOST, help = "Streaming server address")
+    parser.add_argument("--port", type = int, default = DEFAULT_PORT, help = "Streaming server port")
+    parser.add_argument("--profile", default = None, help = "Stream profile requested by every client: main, sub or thumbnail")
+    parser.add_argument("--clients", type = int, default = 10, help = "Number of concurrent clients")
+    parser.add_argument("--duration", type = float, default = 30, help = "Test duration in seconds")
+    parser.add_argument("--server-pid", dest = "serverPid", type = int, default = None, help = "Process id of the server, used to sample its CPU usage")
+    parser.add_argument("--output", default = None, help = "Store the results as JSON in this file")
+    return parser.parse_args()
+
+def main():
+    logging.basicConfig(level = logging.INFO)
+    args = parseArguments()
+    report = runLoadTest(args.host, args.port, args.clients, args.duration, args.serverPid, args.profile)
+    for index, stats in enumerate(report["clients"]):
+        if not stats:
+            continue
+        logger.info(
+            "Client %s: %.1f fps, %.0f kbps, latency mean %.1f ms, p95 %.1f ms, missed %s frames",
+            index, stats["fps"], stats["bitrateKbps"], stats["meanLatencyMs"], stats["p95LatencyMs"], stats["framesMissed"]
+        )
+    if report["serverCpuPercent"] is not None:
+        logger.info("Server CPU usage: %.1f %%", report["serverCpuPercent"])
+    if args.output:
+        with open(args.output, "w") as outputFile:
+            json.dump(report, outputFile, indent = 2)
+
+if __name__ == "__main__":
+    main()
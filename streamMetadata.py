@@ -0,0 +1,97 @@
+from dataclasses import dataclass
+import time
+from typing import Dict, List, Optional
+import cv2
+from PyQt5.QtCore import QMutex, QMutexLocker, QObject, pyqtSignal, pyqtSlot
+from frame_processors.frameTransformator import ContoursInfo
+from utils import Contour, PointCoords
+
+CONTOUR_APPROXIMATION_RATIO = 0.01
+
+def simplifyContour(contour: Contour) -> List[List[int]]:
+    epsilon = CONTOUR_APPROXIMATION_RATIO * cv2.arcLength(contour, True)
+    return cv2.approxPolyDP(contour, epsilon, True).reshape(-1, 2).tolist()
+
+@dataclass(frozen=True)
+class StreamEvent:
+    sequence: int
+    timestamp: float
+    name: str
+    active: bool
+
+    def toDict(self) -> Dict:
+        return {"event": self.name, "active": self.active}
+
+class StreamMetadataCollector(QObject):
+    eventOccurred = pyqtSignal(StreamEvent)
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.mutex = QMutex()
+        self.eventSequence = 0
+        self.isMovementPresent = False
+        self.contours: List[List[List[int]]] = []
+        self.centerOfTheMass: Optional[PointCoords] = None
+        self.objects: List[Dict] = []
+        self.isRecording = False
+        self.isSoundDetected = False
+
+    @pyqtSlot(ContoursInfo)
+    def onContoursReceived(self, contours_info: ContoursInfo) -> None:
+        contours = [simplifyContour(contour) for contour in contours_info.contour_list]
+        with QMutexLocker(self.mutex):
+            self.contours = contours
+            self.centerOfTheMass = contours_info.center_of_the_mass
+
+    @pyqtSlot(bool)
+    def onMovementPresentToggled(self, movementPresent: bool) -> None:
+        if movementPresent != self.isMovementPresent:
+            self.isMovementPresent = movementPresent
+            self.emitEvent("movement", movementPresent)
+        if movementPresent:
+            return
+        with QMutexLocker(self.mutex):
+            self.contours = []
+            self.centerOfTheMass = None
+
+    @pyqtSlot(list)
+    def onObjectsDetected(self, objects: List[Dict]) -> None:
+        compactObjects = [
+            {"label": obj["label"], "confidence": round(obj["confidence"], 3), "box": [obj["x"], obj["y"], obj["w"], obj["h"]]}
+            for obj in objects
+        ]
+        with QMutexLocker(self.mutex):
+            self.objects = compactObjects
+
+    @pyqtSlot(bool)
+    def onRecordingToggled(self, isRecording: bool) -> None:
+        with QMutexLocker(self.mutex):
+            changed = self.isRecording != isRecording
+            self.isRecording = isRecording
+        if changed:
+            self.emitEvent("recording", isRecording)
+
+    @pyqtSlot(bool, int)
+    def onSoundDetected(self, isSoundDetected: bool, sound_intensity: int) -> None:
+        with QMutexLocker(self.mutex):
+            changed = self.isSoundDetected != isSoundDetected
+            self.isSoundDetected = isSoundDetected
+        if changed:
+            self.emitEvent("sound", isSoundDetected)
+
+    def emitEvent(self, name: str, active: bool) -> None:
+        self.eventSequence += 1
+        self.eventOccurred.emit(StreamEvent(self.eventSequence, time.time(), name, active))
+
+    def getMetadata(self, width: int, height: int) -> Dict:
+        with QMutexLocker(self.mutex):
+            return {
+                "timestamp": time.time(),
+                "width": width,
+                "height": height,
+                "contours": self.contours,
+                "centerOfMass": list(self.centerOfTheMass) if self.centerOfTheMass else None,
+                "objects": self.objects,
+                "recording": self.isRecording,
+                "soundDetected": self.isSoundDetected
+            }
@@ -0,0 +1,60 @@
+import enum
+import json
+import struct
+from dataclasses import dataclass
+from typing import Dict
+
+PROTOCOL_VERSION = 1
+# version, message type, flags, sequence number, timestamp in microseconds, payload length
+HEADER_FORMAT = "!BBHIQI"
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+MAX_SEQUENCE_NUMBER = 2 ** 32
+
+class MessageType(enum.IntEnum):
+    HELLO = 1
+    FRAME = 2
+    METADATA = 3
+    EVENT = 4
+
+class MessageFlag(enum.IntFlag):
+    NONE = 0
+    KEYFRAME = 1
+
+class ProtocolError(Exception):
+    pass
+
+@dataclass(frozen=True)
+class MessageHeader:
+    version: int
+    messageType: MessageType
+    flags: MessageFlag
+    sequence: int
+    timestamp: float
+    length: int
+
+def packHeader(messageType: MessageType, sequence: int, timestamp: float, length: int, flags: MessageFlag = MessageFlag.NONE) -> bytes:
+    return struct.pack(
+        HEADER_FORMAT,
+        PROTOCOL_VERSION,
+        messageType,
+        flags,
+        sequence % MAX_SEQUENCE_NUMBER,
+        int(timestamp * 1000000),
+        length
+    )
+
+def unpackHeader(data: bytes) -> MessageHeader:
+    version, messageType, flags, sequence, timestamp, length = struct.unpack(HEADER_FORMAT, data)
+    if version != PROTOCOL_VERSION:
+        raise ProtocolError(f"Unsupported protocol version: {version}")
+    try:
+        messageType = MessageType(messageType)
+    except ValueError:
+        raise ProtocolError(f"Unknown message type: {messageType}")
+    return MessageHeader(version, messageType, MessageFlag(flags), sequence, timestamp / 1000000, length)
+
+def encodeJsonPayload(content: Dict) -> bytes:
+    return json.dumps(content, separators=(",", ":")).encode("utf-8")
+
+def decodeJsonPayload(payload: bytes) -> Dict:
+    return json.loads(payload.decode("utf-8"))
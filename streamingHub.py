@@ -0,0 +1,142 @@
+import enum
+import logging
+from typing import Dict, Optional
+from PyQt5.QtCore import QMutex, QMutexLocker, QObject, pyqtSignal, pyqtSlot
+from PyQt5.QtNetwork import QTcpSocket
+from PyQt5.sip import voidptr
+from frameStreamEncoder import EncodedFrame, FrameStreamEncoder
+from frameToNetworkStreamer import FrameToNetworkStreamer
+from h264NetworkStreamer import H264NetworkStreamer
+from h264StreamEncoder import EncodedPacket, H264StreamEncoder
+from mjpegHttpClient import MjpegHttpClient
+from networkStreamingClient import NetworkStreamingClient
+from streamMetadata import StreamEvent, StreamMetadataCollector
+from tcpServer import TcpServer
+
+logger = logging.getLogger(__name__)
+
+class StreamType(enum.Enum):
+    OVERLAY = 0
+    METADATA = 1
+    H264 = 2
+
+class StreamingHub(QObject):
+    clientConnectionReceived = pyqtSignal(int, StreamType)
+    clientCountChanged = pyqtSignal(int)
+
+    def __init__(
+        self,
+        overlayStreamEncoder: FrameStreamEncoder,
+        rawStreamEncoder: FrameStreamEncoder,
+        metadataCollector: StreamMetadataCollector,
+        httpPort: int,
+        h264Encoder: Optional[H264StreamEncoder] = None,
+        maxClientFrameRate: float = 0
+        ) -> None:
+        super().__init__()
+        self.maxClientFrameRate = maxClientFrameRate
+        self.h264Encoder = h264Encoder
+        self.httpPort = httpPort
+        self.httpServer: Optional[TcpServer] = None
+        self.encoders = {
+            StreamType.OVERLAY: overlayStreamEncoder,
+            StreamType.METADATA: rawStreamEncoder
+        }
+        self.metadataCollector = metadataCollector
+        # All client sockets are served from the hub thread, clients are looked up by id
+        self.clients: Dict[str, NetworkStreamingClient] = {}
+        self.clientStats: Dict[str, Dict] = {}
+        self.clientStatsMutex = QMutex()
+        self.clientConnectionReceived.connect(self.onClientConnectionReceived)
+
+    @pyqtSlot()
+    def onStart(self) -> None:
+        for streamType, encoder in self.encoders.items():
+            encoder.frameEncoded.connect(self.onOverlayFrameEncoded if streamType == StreamType.OVERLAY else self.onRawFrameEncoded)
+        if self.h264Encoder:
+            self.h264Encoder.packetEncoded.connect(self.onH264PacketEncoded)
+        self.metadataCollector.eventOccurred.connect(self.onStreamEventOccurred)
+        # The HTTP server is created here so that its sockets belong to the hub thread
+        self.httpServer = TcpServer(self.httpPort, self)
+        self.httpServer.connectionToServerMade.connect(self.onHttpConnectionReceived)
+        self.httpServer.startListening()
+
+    @pyqtSlot()
+    def onStop(self) -> None:
+        if self.httpServer:
+            self.httpServer.onClose()
+        for client in list(self.clients.values()):
+            client.close()
+
+    @pyqtSlot(int, StreamType)
+    def onClientConnectionReceived(self, handle: int, streamType: StreamType) -> None:
+        if streamType == StreamType.H264:
+            if self.h264Encoder is None:
+                logger.warning("Refused H.264 streaming client, H.264 encoding is not available")
+                refusedSocket = QTcpSocket(self)
+                refusedSocket.setSocketDescriptor(voidptr(handle))
+                refusedSocket.close()
+                refusedSocket.deleteLater()
+                return
+            self.addClient(H264NetworkStreamer(handle, self.h264Encoder, self))
+            return
+        metadataCollector = self.metadataCollector if streamType == StreamType.METADATA else None
+        self.addClient(FrameToNetworkStreamer(handle, self.encoders[streamType], metadataCollector, self, self.maxClientFrameRate))
+
+    @pyqtSlot(voidptr)
+    def onHttpConnectionReceived(self, handle: voidptr) -> None:
+        self.addClient(MjpegHttpClient(int(handle), self.encoders[StreamType.OVERLAY], self, self.maxClientFrameRate))
+
+    def addClient(self, client: NetworkStreamingClient) -> None:
+        if not client.onStart():
+            client.deleteLater()
+            return
+        client.connectionTerminated.connect(self.onClientConnectionTerminated)
+        client.statsUpdated.connect(self.onClientStatsUpdated)
+        self.clients[client.get_id()] = client
+        logger.info("Streaming client: %s connected, %s clients in total", client.get_id(), len(self.clients))
+        self.clientCountChanged.emit(len(self.clients))
+
+    @pyqtSlot(str)
+    def onClientConnectionTerminated(self, client_id: str) -> None:
+        client = self.clients.pop(client_id, None)
+        if client is None:
+            return
+        client.deleteLater()
+        with QMutexLocker(self.clientStatsMutex):
+            self.clientStats.pop(client_id, None)
+        self.clientCountChanged.emit(len(self.clients))
+
+    @pyqtSlot(str, dict)
+    def onClientStatsUpdated(self, client_id: str, stats: Dict) -> None:
+        with QMutexLocker(self.clientStatsMutex):
+            self.clientStats[client_id] = stats
+
+    def getClientStats(self) -> Dict[str, Dict]:
+        with QMutexLocker(self.clientStatsMutex):
+            return dict(self.clientStats)
+
+    @pyqtSlot(EncodedFrame)
+    def onOverlayFrameEncoded(self, encodedFrame: EncodedFrame) -> None:
+        self.dispatchEncodedFrame(StreamType.OVERLAY, encodedFrame)
+
+    @pyqtSlot(EncodedFrame)
+    def onRawFrameEncoded(self, encodedFrame: EncodedFrame) -> None:
+        self.dispatchEncodedFrame(StreamType.METADATA, encodedFrame)
+
+    @pyqtSlot(EncodedPacket)
+    def onH264PacketEncoded(self, encodedPacket: EncodedPacket) -> None:
+        for client in self.clients.values():
+            if isinstance(client, H264NetworkStreamer):
+                client.onPacketEncoded(encodedPacket)
+
+    @pyqtSlot(StreamEvent)
+    def onStreamEventOccurred(self, event: StreamEvent) -> None:
+        for client in self.clients.values():
+            client.sendEvent(event)
+
+    def dispatchEncodedFrame(self, streamType: StreamType, encodedFrame: EncodedFrame) -> None:
+        encoder = self.encoders[streamType]
+        for client in self.clients.values():
+            if isinstance(client, FrameToNetworkStreamer) and client.streamEncoder is encoder:
+                client.onFrameEncoded(encodedFrame)
@@ -14,6 +14,7 @@ logger = logging.getLogger(__name__)
 Frame = np.ndarray
 Contour = np.ndarray
 PointCoords  = tuple
+Region = Tuple[int, int, int, int]
 
 @dataclass
 class PreviewFrames:
@@ -58,6 +59,11 @@ def convertCvFrameToQImage(frame: Frame) -> QImage:
     bytesPerLine = ch * w	
     return QImage(rgbImage.data, w, h, bytesPerLine, QImage.Format_RGB888)
 
+def wrapBgrFrameInQImage(frame: Frame) -> QImage:
+    # No copy is made, the caller has to keep the (row contiguous) frame alive while the image is in use
+    h, w, ch = frame.shape
+    return QImage(frame.data, w, h, frame.strides[0], QImage.Format_BGR888)
+
 @lru_cache(maxsize=1)
 def get_aspect_ratio_from_resolution(width: int, height: int) -> Tuple[int, int]:
     gcd_value = math.gcd(width, height)
@@ -0,0 +1,32 @@
+from typing import Optional
+import numpy as np
+from PyQt5 import QtWidgets
+from PyQt5.QtCore import Qt
+from PyQt5.QtGui import QImage, QPainter, QPaintEvent
+from utils import Frame, wrapBgrFrameInQImage
+
+class FrameCanvas(QtWidgets.QWidget):
+    def __init__(self, parent: Optional[QtWidgets.QWidget] = None) -> None:
+        super().__init__(parent)
+        # The QImage only wraps the frame buffer, so the frame is kept alive for as long as the image is painted
+        self.frame: Optional[Frame] = None
+        self.image: Optional[QImage] = None
+        self.setAttribute(Qt.WA_OpaquePaintEvent)
+
+    def setFrame(self, frame: Frame) -> None:
+        frame = np.ascontiguousarray(frame)
+        self.image = wrapBgrFrameInQImage(frame)
+        self.frame = frame
+        self.update()
+
+    def clear(self) -> None:
+        self.image = None
+        self.frame = None
+        self.update()
+
+    def paintEvent(self, event: QPaintEvent) -> None:
+        painter = QPainter(self)
+        if self.image is None:
+            painter.fillRect(self.rect(), Qt.black)
+            return
+        painter.drawImage(self.rect(), self.image)
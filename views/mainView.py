@@ -1,10 +1,12 @@
 from enum import Enum
+import os
 from typing import Any, Dict, List
 from PyQt5 import QtWidgets, uic
-from PyQt5.QtCore import  pyqtSlot, pyqtSignal, QObject
+from PyQt5.QtCore import  pyqtSlot, pyqtSignal, QEvent, QObject
 from PyQt5.QtGui import QIcon, QImage, QPixmap
 from views.addEmailSubscriberDialog import AddEmailSubscriberDialog
 from views.cameraSelectorDialog import SelectCameraDialog
+from views.frameCanvas import FrameCanvas
 from views.motionDetectionSettingsDialog import MotionDetectionSettingsDialog
 import logging
 from views.motionRecordingSettingsDialog import MotionRecordingSettingsDialog
@@ -12,10 +14,14 @@ from views.movementLoggerSettingsDialog import MotionLoggingSettingsDialog
 from settingsManager import SettingsManager
 from views.objectionDetectionSettingsDialog import ObjectDetectionSettingsDialog
 from views.soundDetectionSettingsDialog import SoundDetectionSettingsDialog
-from utils import MovementPresentationType
+from utils import Frame, MovementPresentationType
 
 logger = logging.getLogger(__name__)
 
+DISPLAY_REFRESH_RATES = [5, 10, 15, 25, 30, 0]
+LAYER_TIMINGS_SHOWN = 3
+STATUS_MESSAGE_TIMEOUT = 10000
+
 class StackWidgetPage(Enum):
   CAMERA = 0
   PREVIEW_FRAMES = 2
@@ -28,17 +34,20 @@ class MainView(QtWidgets.QMainWindow):
     startFetchingCameraInfo = pyqtSignal()
     toggleMovementDisplayType = pyqtSignal(MovementPresentationType, bool)
     toggleEmailNotifications = pyqtSignal(bool)
+    displayActiveToggled = pyqtSignal(bool)
+    layerTimingsDumpRequested = pyqtSignal()
 
     def __init__(self, settingsManger: SettingsManager):
         super(MainView, self).__init__()
         self.settingsManger = settingsManger
+        self.displayActive = True
         self.setupUI()
         self.loadNotificationEnablement()
 
     def setupUI(self) -> None:
         self.setWindowIcon(QIcon('resources/icon.png')) 
         uic.loadUi('ui/mainwindow.ui', self)
-        self.cameraCanvasLabel = self.getUiElement(QtWidgets.QLabel, 'cameraCanvas')
+        self.cameraCanvas = self.getUiElement(FrameCanvas, 'cameraCanvas')
         self.viewFramesAction = self.getUiElement(QtWidgets.QAction, 'actionFrameChangeProcess')
         self.stackWidget = self.getUiElement(QtWidgets.QStackedWidget, 'stackedWidget')
         self.cameraAction = self.getUiElement(QtWidgets.QAction, 'actionCamera')
@@ -57,8 +66,10 @@ class MainView(QtWidgets.QMainWindow):
         self.rectangleAction = self.findChild(QtWidgets.QAction, 'actionRectangles')
         self.contourAction = self.findChild(QtWidgets.QAction, 'actionContours')
         self.crosshairAction = self.findChild(QtWidgets.QAction, 'actionCrosshair')
+        self.showMenu = self.findChild(QtWidgets.QMenu, 'menuShow')
+        self.setupRefreshRateMenu()
+        self.setupLayerTimingsAction()
 
-        self.cameraCanvasLabel.setScaledContents(True)
         self.originalFrameLabel.setScaledContents(True)
         self.grayBluredFrameLabel.setScaledContents(True)
         self.subAndThresholdFrameLabel.setScaledContents(True)
@@ -76,16 +87,57 @@ class MainView(QtWidgets.QMainWindow):
         self.crosshairAction.triggered.connect(self.onCrosshairActionToggled)
         self.actionEnableEmailNotifications.triggered.connect(self.onEnableEmailNotificationActionToggled)
 
+    def setupRefreshRateMenu(self) -> None:
+        refreshRateMenu = self.showMenu.addMenu("Display refresh rate")
+        refreshRateGroup = QtWidgets.QActionGroup(self)
+        currentRefreshRate = self.settingsManger.getDisplaySettings()["maxRefreshRate"]
+        for refreshRate in DISPLAY_REFRESH_RATES:
+            action = refreshRateMenu.addAction(f"{refreshRate} fps" if refreshRate else "Unlimited")
+            action.setCheckable(True)
+            action.setChecked(refreshRate == currentRefreshRate)
+            action.setData(refreshRate)
+            refreshRateGroup.addAction(action)
+        refreshRateGroup.triggered.connect(self.onRefreshRateActionTriggered)
+
+    def setupLayerTimingsAction(self) -> None:
+        optionsMenu = self.getUiElement(QtWidgets.QMenu, 'menuOptions')
+        self.actionDumpLayerTimings = QtWidgets.QAction("Log Object Detection Layer Timings", self)
+        optionsMenu.insertAction(self.actionSoundDetectionParams, self.actionDumpLayerTimings)
+        self.actionDumpLayerTimings.triggered.connect(self.onDumpLayerTimingsActionClicked)
+
+    @pyqtSlot()
+    def onDumpLayerTimingsActionClicked(self) -> None:
+        # Timings are taken from the next detection pass and arrive in onLayerTimingsReceived
+        self.statusBar().showMessage("Waiting for the next object detection pass...", STATUS_MESSAGE_TIMEOUT)
+        self.layerTimingsDumpRequested.emit()
+
+    @pyqtSlot(list)
+    def onLayerTimingsReceived(self, layerTimings: List[Dict]) -> None:
+        if not layerTimings:
+            self.statusBar().showMessage("Layer timings are available only with the OpenCV object detection backend", STATUS_MESSAGE_TIMEOUT)
+            return
+        total, slowestLayers = layerTimings[0], layerTimings[1:LAYER_TIMINGS_SHOWN + 1]
+        self.statusBar().showMessage(
+            f"Detection pass {total['timeMs']:.1f} ms, slowest layers: "
+            + ", ".join(f"{timing['layer']} {timing['timeMs']:.1f} ms" for timing in slowestLayers)
+            + " (full list in the log)",
+            STATUS_MESSAGE_TIMEOUT
+        )
+
+    @pyqtSlot(QtWidgets.QAction)
+    def onRefreshRateActionTriggered(self, action: QtWidgets.QAction) -> None:
+        self.settingsManger.setDisplaySettings({"maxRefreshRate": action.data()})
+
     def loadNotificationEnablement(self) -> None:
         val = self.settingsManger.getEmailSubscriberSettings()["broadcastToSubscribers"]
         self.actionEnableEmailNotifications.setChecked(
             self.settingsManger.getEmailSubscriberSettings()["broadcastToSubscribers"]
         )
 
-    @pyqtSlot(QImage)
-    def onImageReceived(self, frame: QImage) -> None:
+    @pyqtSlot(Frame)
+    def onImageReceived(self, frame: Frame) -> None:
         if self.stackWidget.currentIndex() == StackWidgetPage.CAMERA.value:
-            self.cameraCanvasLabel.setPixmap(QPixmap.fromImage(frame))
+            self.cameraCanvas.setFrame(frame)
     
     @pyqtSlot(dict)
     def onPreviewImagesReceived(self, preview_imgs_dict: Dict[str, QImage] ) -> None:
@@ -103,6 +155,26 @@ class MainView(QtWidgets.QMainWindow):
         else:
             self.stackWidget.setCurrentIndex(StackWidgetPage.CAMERA.value)
 
+    def changeEvent(self, event: QEvent) -> None:
+        if event.type() == QEvent.WindowStateChange:
+            self.updateDisplayActive()
+        super().changeEvent(event)
+
+    def showEvent(self, event) -> None:
+        super().showEvent(event)
+        self.updateDisplayActive()
+
+    def hideEvent(self, event) -> None:
+        super().hideEvent(event)
+        self.updateDisplayActive()
+
+    def updateDisplayActive(self) -> None:
+        # Frames are not prepared for display while nobody can see them
+        displayActive = self.isVisible() and not self.isMinimized()
+        if displayActive != self.displayActive:
+            self.displayActive = displayActive
+            self.displayActiveToggled.emit(displayActive)
+
     def closeEvent(self, event):
         self.closingWindow.emit()
         event.accept()
@@ -169,7 +241,7 @@ class MainView(QtWidgets.QMainWindow):
         self.settingsManger.setCameraSettings(settings)
 
     def clearImages(self) -> None:
-        self.cameraCanvasLabel.clear()
+        self.cameraCanvas.clear()
         self.originalFrameLabel.clear() 
         self.grayBluredFrameLabel.clear() 
         self.subAndThresholdFrameLabel.clear() 
@@ -204,6 +276,41 @@ class MainView(QtWidgets.QMainWindow):
         msg.setWindowTitle("Input error")
         msg.exec_()
 
+    @pyqtSlot()
+    def onObjectDetectionModelLoading(self) -> None:
+        # Shown until the model is ready, loading can take several seconds
+        self.actionObjectDetectionParameters.setText("Object Detection Parameters (loading model...)")
+        self.statusBar().showMessage("Loading object detection model...")
+
+    @pyqtSlot(bool)
+    def onObjectDetectionModelReady(self, ready: bool) -> None:
+        self.actionObjectDetectionParameters.setText("Object Detection Parameters")
+        self.statusBar().showMessage(
+            "Object detection model loaded" if ready else "Object detection model unloaded",
+            STATUS_MESSAGE_TIMEOUT
+        )
+
+    @pyqtSlot(str)
+    def onObjectDetectionModelError(self, msgStr: str) -> None:
+        self.statusBar().showMessage("Object detection model could not be loaded", STATUS_MESSAGE_TIMEOUT)
+        msg = QtWidgets.QMessageBox()
+        msg.setIcon(QtWidgets.QMessageBox.Information)
+        msg.setText("Object detection error")
+        msg.setInformativeText(f"Object detection model could not be loaded: {msgStr}")
+        msg.setWindowTitle("Model error")
+        msg.exec_()
+
+    @pyqtSlot(dict)
+    def onRecordingFinished(self, stats: Dict) -> None:
+        self.statusBar().showMessage(
+            f"Recording saved: {os.path.basename(stats['path'])}, {stats['durationSec']:.0f} s, "
+            f"{stats['achievedFps']:.1f} fps, {stats['fileSizeBytes'] / 1024 / 1024:.1f} MB, "
+            f"{stats['framesDropped'] + stats['overflowFramesDropped']} frames dropped, "
+            f"{stats['preEventBuffer']['frames']} pre-event frames ({stats['preEventBuffer']['durationSec']:.1f} s), "
+            f"{stats['preEventBuffer']['framesSkipped']} camera frames skipped",
+            STATUS_MESSAGE_TIMEOUT
+        )
+
     @pyqtSlot(bool)
     def onContourActionToggled(self, toggled: bool) -> None:
         self.toggleMovementDisplayType.emit(MovementPresentationType.CONTOUR, toggled)           
@@ -1,6 +1,14 @@
 from typing import Any, Dict, Optional
 from PyQt5 import QtWidgets, uic
 from PyQt5.QtWidgets import QWidget
+from recordingWriters import RecordingCodec
+
+RECORDING_CODEC_NAMES = {
+    RecordingCodec.MJPG.value: "MJPG (Motion JPEG)",
+    RecordingCodec.MP4V.value: "MPEG-4 Part 2 (mp4v)",
+    RecordingCodec.H264.value: "H.264 (requires PyAV)",
+    RecordingCodec.I420.value: "Uncompressed (I420)"
+}
 
 class MotionRecordingSettingsDialog(QtWidgets.QDialog):
     def __init__(
@@ -14,6 +22,12 @@ class MotionRecordingSettingsDialog(QtWidgets.QDialog):
         self.movementPresentThresholdSpinBox = self.findChild(QtWidgets.QSpinBox, 'MovementPresentThresholdSpinBox')
         self.movementAbsenceThresholdSpinBox = self.findChild(QtWidgets.QSpinBox, 'MovementAbsenceThresholdSpinBox')
         self.recordingLocationLineEdit = self.findChild(QtWidgets.QLineEdit, 'RecordingLocationLineEdit')
+        self.recordingCodecComboBox = self.findChild(QtWidgets.QComboBox, 'RecordingCodecComboBox')
+        self.preEventBufferSecondsSpinBox = self.findChild(QtWidgets.QSpinBox, 'PreEventBufferSecondsSpinBox')
+        self.preEventBufferMemorySpinBox = self.findChild(QtWidgets.QSpinBox, 'PreEventBufferMemorySpinBox')
+        self.recordingWidthSpinBox = self.findChild(QtWidgets.QSpinBox, 'RecordingWidthSpinBox')
+        for codec, codecName in RECORDING_CODEC_NAMES.items():
+            self.recordingCodecComboBox.addItem(codecName, codec)
         self.applyChangesBtn = self.findChild(QtWidgets.QPushButton, 'applyChangesBtn')
         self.cancelBtn = self.findChild(QtWidgets.QPushButton, 'cancelBtn')
         self.browseRecordingFileBtn = self.findChild(QtWidgets.QPushButton, 'BrowseFoldersBtn')
@@ -31,12 +45,20 @@ class MotionRecordingSettingsDialog(QtWidgets.QDialog):
         self.movementPresentThresholdSpinBox.setValue(int(config['movementPresentThreshold'] / 1000))
         self.movementAbsenceThresholdSpinBox.setValue(int(config['movementAbsenceThreshold'] / 1000))
         self.recordingLocationLineEdit.setText(config['recordingsDir'])
+        self.recordingCodecComboBox.setCurrentIndex(max(self.recordingCodecComboBox.findData(config['recordingCodec']), 0))
+        self.preEventBufferSecondsSpinBox.setValue(config['preEventBufferSeconds'])
+        self.preEventBufferMemorySpinBox.setValue(config['preEventBufferMaxMemoryMb'])
+        self.recordingWidthSpinBox.setValue(config['recordingWidth'])
     
     def getData(self) -> Dict:
         return {
             "movementPresentThreshold": self.movementPresentThresholdSpinBox.value() * 1000,
             "movementAbsenceThreshold": self.movementAbsenceThresholdSpinBox.value() * 1000,
-            "recordingsDir": self.recordingLocationLineEdit.text()
+            "recordingsDir": self.recordingLocationLineEdit.text(),
+            "recordingCodec": self.recordingCodecComboBox.currentData(),
+            "preEventBufferSeconds": self.preEventBufferSecondsSpinBox.value(),
+            "preEventBufferMaxMemoryMb": self.preEventBufferMemorySpinBox.value(),
+            "recordingWidth": self.recordingWidthSpinBox.value()
         }
     
     def onApplyChanges(self) -> None:
@@ -57,10 +79,20 @@ class MotionRecordingSettingsDialog(QtWidgets.QDialog):
         movementDetectionIntervalInfo = "If the movement is contuously present during this time interval (in seconds), even with short breaks, the application will start recording stream from camera on disc."
         recordingTimerInfo = 'After the recording has started, if the movement is not present during this time interval, the app would stop recording.'
         recordingLocationINfo = 'The location on disc on which the app will use for storing the recordings.'
+        preEventBufferInfo = 'Seconds of video before the recording started that are added to its beginning, 0 disables it. The frames are kept in memory as JPEG, up to the memory limit in MB.'
+        recordingWidthInfo = 'Width of the recorded video in pixels, the height follows the aspect ratio of the camera. Native records frames exactly as the camera captures them, without any resizing.'
+        recordingCodecInfo = 'Video codec of the recordings. Compressed codecs need far less disc space, H.264 is the smallest but needs PyAV and falls back to MJPG without it.'
         self.findChild(QtWidgets.QLabel, 'MovementPresentLabel').setWhatsThis(movementDetectionIntervalInfo)
         self.findChild(QtWidgets.QSpinBox, 'MovementPresentThresholdSpinBox').setWhatsThis(movementDetectionIntervalInfo)
         self.findChild(QtWidgets.QLabel, 'MovementAbsentThresholdLabel').setWhatsThis(recordingTimerInfo)
         self.findChild(QtWidgets.QSpinBox, 'MovementAbsenceThresholdSpinBox').setWhatsThis(recordingTimerInfo)
         self.findChild(QtWidgets.QLabel, 'RecordingLocationLabel').setWhatsThis(recordingLocationINfo)
         self.findChild(QtWidgets.QLineEdit, 'RecordingLocationLineEdit').setWhatsThis(recordingLocationINfo)
+        self.findChild(QtWidgets.QLabel, 'RecordingCodecLabel').setWhatsThis(recordingCodecInfo)
+        self.findChild(QtWidgets.QComboBox, 'RecordingCodecComboBox').setWhatsThis(recordingCodecInfo)
+        self.findChild(QtWidgets.QLabel, 'PreEventBufferLabel').setWhatsThis(preEventBufferInfo)
+        self.findChild(QtWidgets.QSpinBox, 'PreEventBufferSecondsSpinBox').setWhatsThis(preEventBufferInfo)
+        self.findChild(QtWidgets.QSpinBox, 'PreEventBufferMemorySpinBox').setWhatsThis(preEventBufferInfo)
+        self.findChild(QtWidgets.QLabel, 'RecordingWidthLabel').setWhatsThis(recordingWidthInfo)
+        self.findChild(QtWidgets.QSpinBox, 'RecordingWidthSpinBox').setWhatsThis(recordingWidthInfo)
             
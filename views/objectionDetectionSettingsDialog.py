@@ -1,6 +1,26 @@
-from typing import Any, Dict, Optional
+from typing import Any, Dict, List, Optional, Tuple
 from PyQt5 import QtWidgets, uic
 from PyQt5.QtWidgets import QWidget
+from frame_processors.inferenceBackends import SUPPORTED_INPUT_SIZES, InferenceBackendType, loadLabels
+
+def parseClassFilter(text: str) -> Tuple[List[str], Dict[str, float]]:
+    labels = []
+    thresholds = {}
+    for entry in text.split(","):
+        label, _, threshold = entry.partition(":")
+        label = label.strip()
+        if not label:
+            continue
+        labels.append(label)
+        try:
+            if threshold.strip():
+                thresholds[label] = float(threshold)
+        except ValueError:
+            pass
+    return labels, thresholds
+
+def formatClassFilter(labels: List[str], thresholds: Dict[str, float]) -> str:
+    return ", ".join(f"{label}:{thresholds[label]}" if label in thresholds else label for label in labels)
 
 class ObjectDetectionSettingsDialog(QtWidgets.QDialog):
     def __init__(
@@ -13,6 +33,17 @@ class ObjectDetectionSettingsDialog(QtWidgets.QDialog):
         self.setWindowTitle("Configure Object Detection Parameters")
         self.confidenceThresholdSpinBox = self.findChild(QtWidgets.QDoubleSpinBox, 'ConfidenceThresholdSpinBox')
         self.enableObjectDetectionCheckBox = self.findChild(QtWidgets.QCheckBox, 'EnableObjectDetectionCheckBox')
+        self.roiInferenceCheckBox = self.findChild(QtWidgets.QCheckBox, 'RoiInferenceCheckBox')
+        self.detectionIntervalSpinBox = self.findChild(QtWidgets.QSpinBox, 'DetectionIntervalSpinBox')
+        self.maxDetectionRateSpinBox = self.findChild(QtWidgets.QDoubleSpinBox, 'MaxDetectionRateSpinBox')
+        self.inferenceBackendComboBox = self.findChild(QtWidgets.QComboBox, 'InferenceBackendComboBox')
+        self.inputSizeComboBox = self.findChild(QtWidgets.QComboBox, 'InputSizeComboBox')
+        self.classFilterLineEdit = self.findChild(QtWidgets.QLineEdit, 'ClassFilterLineEdit')
+        self.profilingCheckBox = self.findChild(QtWidgets.QCheckBox, 'ProfilingCheckBox')
+        for backendType in InferenceBackendType:
+            self.inferenceBackendComboBox.addItem(backendType.value, backendType.value)
+        for inputSize in SUPPORTED_INPUT_SIZES:
+            self.inputSizeComboBox.addItem(f"{inputSize} x {inputSize}", inputSize)
         self.applyChangesBtn = self.findChild(QtWidgets.QPushButton, 'applyChangesBtn')
         self.cancelBtn = self.findChild(QtWidgets.QPushButton, 'cancelBtn')
         self.loadDefaultBtn = self.findChild(QtWidgets.QPushButton, 'loadDefaultBtn')
@@ -27,26 +58,80 @@ class ObjectDetectionSettingsDialog(QtWidgets.QDialog):
     def updateWidgetValues(self, config: Dict) -> None:
         self.confidenceThresholdSpinBox.setValue(config['confidenceThreshold'])
         self.enableObjectDetectionCheckBox.setChecked(config['detectionEnabled'])
+        self.roiInferenceCheckBox.setChecked(config['roiInferenceEnabled'])
+        self.detectionIntervalSpinBox.setValue(config['detectionInterval'])
+        self.maxDetectionRateSpinBox.setValue(config['maxDetectionRate'])
+        self.inferenceBackendComboBox.setCurrentIndex(self.inferenceBackendComboBox.findData(config['inferenceBackend']))
+        self.inputSizeComboBox.setCurrentIndex(self.inputSizeComboBox.findData(config['inputSize']))
+        self.classFilterLineEdit.setText(formatClassFilter(config['allowedLabels'], config['classConfidenceThresholds']))
+        self.profilingCheckBox.setChecked(config['profilingEnabled'])
 
     def getData(self) -> Dict:
+        allowedLabels, classConfidenceThresholds = parseClassFilter(self.classFilterLineEdit.text())
         return {
             "confidenceThreshold": self.confidenceThresholdSpinBox.value(),
-            "detectionEnabled": self.enableObjectDetectionCheckBox.isChecked()
+            "detectionEnabled": self.enableObjectDetectionCheckBox.isChecked(),
+            "roiInferenceEnabled": self.roiInferenceCheckBox.isChecked(),
+            "detectionInterval": self.detectionIntervalSpinBox.value(),
+            "maxDetectionRate": self.maxDetectionRateSpinBox.value(),
+            "inferenceBackend": self.inferenceBackendComboBox.currentData(),
+            "inputSize": self.inputSizeComboBox.currentData(),
+            "allowedLabels": allowedLabels,
+            "classConfidenceThresholds": classConfidenceThresholds,
+            "profilingEnabled": self.profilingCheckBox.isChecked()
         }
 
     def onApplyChanges(self) -> None:
+        unknownLabels = self.getUnknownLabels()
+        if unknownLabels:
+            QtWidgets.QMessageBox.warning(
+                self,
+                "Unknown object classes",
+                f"These object classes are not known to the detection model: {', '.join(unknownLabels)}"
+            )
+            return
         self.accept()
 
+    def getUnknownLabels(self) -> List[str]:
+        allowedLabels, _ = parseClassFilter(self.classFilterLineEdit.text())
+        try:
+            labels = loadLabels()
+        except OSError:
+            # Without the labels file the model can not be loaded either, the filter is kept as entered
+            return []
+        return [label for label in allowedLabels if label not in labels]
+
     def onCancelBtnClicked(self) -> None:
         self.reject()
     
     def onLoadDefaultBtnClicked(self) -> None:
-        self.updaconfidenceThresholdteWidgetValues(self.defaultConfig)
+        self.updateWidgetValues(self.defaultConfig)
     
     def setWhatsThisTips(self) -> None:
         enableObjectDetectionInfo = 'Turning on or off the object detection. If turned on, object detection would be activated when continuous motion is detected'
         confidenceThresholdInfo = 'Only objects for which the algorithm calculated confidence higher or equal to this probability value would be displayed'
+        detectionIntervalInfo = 'Object detection runs only on every N-th frame, in between the detected boxes follow the detected motion'
+        maxDetectionRateInfo = 'Upper limit on how many times per second object detection can run. Zero means no limit'
+        inferenceBackendInfo = 'Library used for running the detection network on the CPU. Auto measures all installed backends and picks the fastest one'
+        inputSizeInfo = 'Resolution the frame is scaled to before detection. Smaller sizes are faster, larger sizes find smaller objects'
+        classFilterInfo = 'Comma separated list of object classes to detect, optionally with their own confidence threshold, e.g. "person:0.4, car". Other classes are ignored, empty list means all classes'
+        profilingInfo = 'If turned on, time spent in each detection stage (preprocessing, network, decoding, non-maximum suppression) is measured and logged periodically'
+        roiInferenceInfo = 'If turned on, object detection runs only on the regions of the frame where motion is detected, which finds small objects more reliably and skips detection when nothing moves'
         self.findChild(QtWidgets.QLabel, 'EnableObjectDetectionLabel').setWhatsThis(enableObjectDetectionInfo)
         self.findChild(QtWidgets.QCheckBox, 'EnableObjectDetectionCheckBox').setWhatsThis(enableObjectDetectionInfo)
         self.findChild(QtWidgets.QLabel, 'ConfidenceThresholdLabel').setWhatsThis(confidenceThresholdInfo)
-        self.findChild(QtWidgets.QDoubleSpinBox, 'ConfidenceThresholdSpinBox').setWhatsThis(confidenceThresholdInfo)
\ No newline at end of file
+        self.findChild(QtWidgets.QDoubleSpinBox, 'ConfidenceThresholdSpinBox').setWhatsThis(confidenceThresholdInfo)
+        self.findChild(QtWidgets.QLabel, 'RoiInferenceLabel').setWhatsThis(roiInferenceInfo)
+        self.findChild(QtWidgets.QCheckBox, 'RoiInferenceCheckBox').setWhatsThis(roiInferenceInfo)
+        self.findChild(QtWidgets.QLabel, 'DetectionIntervalLabel').setWhatsThis(detectionIntervalInfo)
+        self.findChild(QtWidgets.QSpinBox, 'DetectionIntervalSpinBox').setWhatsThis(detectionIntervalInfo)
+        self.findChild(QtWidgets.QLabel, 'MaxDetectionRateLabel').setWhatsThis(maxDetectionRateInfo)
+        self.findChild(QtWidgets.QDoubleSpinBox, 'MaxDetectionRateSpinBox').setWhatsThis(maxDetectionRateInfo)
+        self.findChild(QtWidgets.QLabel, 'InferenceBackendLabel').setWhatsThis(inferenceBackendInfo)
+        self.findChild(QtWidgets.QComboBox, 'InferenceBackendComboBox').setWhatsThis(inferenceBackendInfo)
+        self.findChild(QtWidgets.QLabel, 'InputSizeLabel').setWhatsThis(inputSizeInfo)
+        self.findChild(QtWidgets.QComboBox, 'InputSizeComboBox').setWhatsThis(inputSizeInfo)
+        self.findChild(QtWidgets.QLabel, 'ClassFilterLabel').setWhatsThis(classFilterInfo)
+        self.findChild(QtWidgets.QLineEdit, 'ClassFilterLineEdit').setWhatsThis(classFilterInfo)
+        self.findChild(QtWidgets.QLabel, 'ProfilingLabel').setWhatsThis(profilingInfo)
+        self.findChild(QtWidgets.QCheckBox, 'ProfilingCheckBox').setWhatsThis(profilingInfo)
\ No newline at end of file